@@ -0,0 +1,33 @@
+// Suggestions for inputs rendered by user_app.widgets.TypeaheadInput: as the
+// user types, fetch matching rows from the input's data-typeahead URL and
+// list them in the input's <datalist>. Responses are HTTP-cacheable, so
+// repeated prefixes are served by the browser cache.
+$(document).ready(function () {
+    $('input[data-typeahead]').each(function () {
+        var input = $(this);
+        var datalist = $('#' + input.attr('list'));
+        var timer = null;
+        var latest = null;
+
+        input.on('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var params = {q: input.val()};
+                var filter = input.data('typeahead-filter');
+                if (filter) {
+                    params[filter] = $('[name="' + filter + '"]').val();
+                }
+                var request = latest = $.getJSON(input.data('typeahead'), params);
+                request.done(function (data) {
+                    if (request !== latest) {
+                        return;
+                    }
+                    datalist.empty();
+                    $.each(data.results, function (_, row) {
+                        datalist.append($('<option>').attr('value', row.code).text(row.name));
+                    });
+                });
+            }, 150);
+        });
+    });
+});
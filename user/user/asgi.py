@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'user.settings')
+# Route register, login and change_password to their async views.
+os.environ.setdefault('DJANGO_ASYNC_AUTH_VIEWS', '1')
 
 application = get_asgi_application()
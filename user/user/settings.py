@@ -43,12 +43,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'user_app.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'user_app.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'user.urls'
@@ -57,7 +59,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [(os.path.join( BASE_DIR, 'templates' ))],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -65,10 +66,23 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compiled templates are kept in memory; the dev server's
+            # autoreloader resets this cache when a template changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
+# Seconds the rendered unbound registration form is cached for, per language
+# (see register.html). It lives in the per-process default cache, so a
+# restart after a deploy drops stale markup.
+REGISTER_FORM_CACHE_TIMEOUT = 3600
+
 WSGI_APPLICATION = 'user.wsgi.application'
 
 
@@ -82,6 +96,110 @@ DATABASES = {
     }
 }
 
+# Read replicas (see user_app/routers.py), e.g.
+# DJANGO_DB_REPLICAS=/srv/replica1.sqlite3,/srv/replica2.sqlite3 adds the
+# aliases replica1 and replica2. Staff search, funder reports, exports and
+# admin listings read from a healthy replica; everything else, and a client
+# for REPLICA_PIN_SECONDS after it writes, uses the primary. Replicas are
+# probed at most every REPLICA_HEALTH_CHECK_INTERVAL seconds and skipped
+# when down or (PostgreSQL) more than REPLICA_MAX_LAG seconds behind.
+DATABASE_REPLICAS = []
+for number, name in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['user_app.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 15
+REPLICA_PIN_COOKIE = 'replica_pin'
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+REPLICA_MAX_LAG = 10
+
+
+# SQLite tuning applied to every new connection, and retries of writes that
+# find the database locked (see user_app/sqlite.py). A negative cache_size
+# is in KiB. Retry n waits up to SQLITE_LOCK_RETRY_DELAY * 2 ** n seconds.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+SQLITE_LOCK_RETRIES = 5
+SQLITE_LOCK_RETRY_DELAY = 0.05
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Optional cache shared by all workers, e.g. REDIS_URL=redis://127.0.0.1:6379/1
+if os.environ.get('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# Session user cache used by EmailBackend.get_user (see user_app/user_cache.py).
+# With the per-process locmem cache keep the timeout short, since other
+# workers only notice a changed user once their copy expires.
+USER_CACHE_ALIAS = 'shared' if 'shared' in CACHES else 'default'
+USER_CACHE_TIMEOUT = 300 if 'shared' in CACHES else 60
+
+# In-memory reference data (see user_app/reference.py): how often, in
+# seconds, each process checks whether a reference table has changed.
+REFERENCE_CACHE_CHECK_INTERVAL = 30
+
+# Typeahead API over the reference tables: results per page (a client may
+# ask for up to REFERENCE_TYPEAHEAD_MAX_PAGE_SIZE) and how long browsers and
+# proxies may reuse a response. Responses carry an ETag that changes with
+# the table, so a revalidation after max-age is a 304 unless it changed.
+REFERENCE_TYPEAHEAD_PAGE_SIZE = 20
+REFERENCE_TYPEAHEAD_MAX_PAGE_SIZE = 100
+REFERENCE_TYPEAHEAD_MAX_AGE = 300
+
+# Staff learner search (see user_app/search.py): results per page.
+LEARNER_SEARCH_PAGE_SIZE = 25
+
+# Admin changelists count matching rows exactly up to this many; beyond it
+# they show an estimate (see user_app/admin.py EstimatedCountPaginator).
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Login throttling (see user_app/throttling.py): failed attempts allowed per
+# (attempts, seconds) sliding window, per client IP and per email address.
+LOGIN_THROTTLE_CACHE_ALIAS = USER_CACHE_ALIAS
+LOGIN_THROTTLE_RATES = {
+    'ip': (30, 300),
+    'email': (5, 300),
+}
+# The client IP is REMOTE_ADDR. Behind a reverse proxy or load balancer that
+# is the proxy's address for every client, so one client's failures would
+# throttle everyone's logins: list the proxies' addresses or networks here
+# and requests from them are counted under the client address they append
+# to X-Forwarded-For. Only list proxies that do append it.
+LOGIN_THROTTLE_TRUSTED_PROXIES = list(filter(None, os.environ.get('LOGIN_THROTTLE_TRUSTED_PROXIES', '').split(',')))
+
+# Sessions (see user_app/sessions.py): only written when the data changed
+# or the stored expiry is more than SESSION_EXPIRY_REFRESH_INTERVAL seconds
+# behind. They are read from SESSION_CACHE_ALIAS only when that cache is
+# shared by every worker (SESSION_CACHED): with the per-process locmem cache
+# a logout in one worker would leave the session alive in the others.
+# Expired rows are purged SESSION_PURGE_BATCH_SIZE at a time.
+SESSION_ENGINE = 'user_app.sessions'
+SESSION_CACHE_ALIAS = USER_CACHE_ALIAS
+SESSION_CACHED = 'shared' in CACHES
+SESSION_EXPIRY_REFRESH_INTERVAL = 3600
+SESSION_PURGE_BATCH_SIZE = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -132,11 +250,38 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'user_app.CustomUser'
 
 
+# EmailBackend subclasses ModelBackend (permissions included) and also
+# accepts ``username``, so listing ModelBackend as well would only verify
+# every failed login a second time.
 AUTHENTICATION_BACKENDS = (
     'user_app.authentication.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
 )
 
+# The first hasher is used for new passwords; existing hashes made by the
+# others are re-encoded with it on the next successful login.
+PASSWORD_HASHERS = [
+    'user_app.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 iterations for TunedPBKDF2PasswordHasher; None keeps Django's
+# default. Lowering it makes every login cheaper at the price of offline
+# brute-force resistance. `manage.py benchmark_login_hashers` shows the
+# trade-off.
+PASSWORD_PBKDF2_ITERATIONS = None
+
+# Threads the async views hash passwords on (see user_app/hashers.py);
+# None means one per CPU.
+PASSWORD_HASH_WORKERS = None
+
+# Serve register, login and change_password with the native async views.
+# user/asgi.py turns this on; WSGI deployments keep the sync views, which
+# would otherwise each run in an event loop of their own.
+ASYNC_AUTH_VIEWS = os.environ.get('DJANGO_ASYNC_AUTH_VIEWS') == '1'
+
 #email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -146,6 +291,24 @@ EMAIL_HOST_USER = 'systemsprogramming95@gmail.com'
 EMAIL_HOST_PASSWORD = 'vpwb zhsl jrzk erwo'
 DEFAULT_FROM_EMAIL = 'Welcome to CHIETA <nonereply@systemsprogramming.com>'
 
+#outbound email queue settings (see `manage.py send_queued_mail`)
+EMAIL_QUEUE_BATCH_SIZE = 100
+EMAIL_QUEUE_MAX_ATTEMPTS = 5
+EMAIL_QUEUE_RETRY_BACKOFF = 60  # seconds before the first retry, doubled after each failure
+EMAIL_QUEUE_LEASE = 300  # seconds a claimed batch is hidden from other dispatchers
+
+#temporary password sweeper (see `manage.py expire_temp_passwords`)
+TEMP_PASSWORD_GRACE = 7 * 24 * 3600  # seconds past expiry before a temporary password stops working; until then login asks for a new one
+TEMP_PASSWORD_SWEEP_BATCH_SIZE = 1000
+
+#request profiling (see user_app/profiling.py and `manage.py profile_report`)
+REQUEST_PROFILING = False  # profile every request
+REQUEST_PROFILING_HEADER = 'X-Profile'  # or only requests sending this header (staff users, or DEBUG)
+REQUEST_PROFILING_LOG = os.path.join(BASE_DIR, 'logs', 'profile.jsonl')
+REQUEST_PROFILING_LOG_MAX_BYTES = 10 * 1024 * 1024
+REQUEST_PROFILING_LOG_BACKUPS = 5
+REQUEST_PROFILING_FUNCTIONS = 25  # cProfile entries kept per request; 0 skips cProfile
+
 #media settings
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
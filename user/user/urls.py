@@ -16,10 +16,8 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from user_app.views import ChangePasswordView 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('user_app.urls')),
-    path('change_password/', ChangePasswordView.as_view(), name='change_password'),
 ]
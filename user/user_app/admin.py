@@ -1,20 +1,152 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Max
+from django.utils.functional import cached_property
 
+from . import reference, search
+from .exports import EXPORT_FIELDS, export_response
 from .forms import CustomUserCreationForm, CustomUserChangeForm
-from .models import CustomUser
+from .models import (
+    CustomUser, LearnerProfile, Municipality, Nationality, OccupationLevel, OFOOccupation, OutboundEmail,
+    Province, Qualification,
+)
+from .routers import read_alias, use_replica
+
+
+class LearnerProfileInline(admin.StackedInline):
+    model = LearnerProfile
+    can_delete = False
+    # Long reference lists are searched instead of rendered as one big select.
+    autocomplete_fields = ("nationality", "municipality")
+    # Derived from the birth date and ID number on save.
+    readonly_fields = ("age", "youth", "id_number_valid", "id_gender", "id_citizen")
+    fieldsets = (
+        ("Personal Info", {"fields": ("contact_number", "birth_date", "id_type", "id_or_passport", "age", "id_number_valid", "id_gender", "id_citizen")}),
+        ("More Info", {"fields": ("title", "youth", "gender", "race", "disability", "home_language", "citezenship", "nationality", "employment_status", "unemployed_period", "home_address", "postal_address", "postal_code", "contract_number", "contracted_learning_status", "learner_enrollment_number", "learning_programe_name", "subcategory", "intervention", "start_date", "end_date", "guardian_id_no", "guardian_full_name", "guardian_contact", "province", "municipality", "town_or_city", "urban_or_rural", "occupation_level", "job_title", "OFO_occupation_code", "OFO_specialization", "OFO_occupation", "highest_school_qualification", "highest_qualification", "student_number", "bursary_awarded_date", "bursary_completion_status", "popi_consent", "popi_consent_date")}),
+    )
+
+
+def estimated_rows(model, using=DEFAULT_DB_ALIAS):
+    """
+    A cheap estimate of the number of rows in ``model``'s table on the
+    database ``using``: the planner's statistics on PostgreSQL, the highest
+    primary key elsewhere (exact as long as rows are rarely deleted).
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    return model._default_manager.using(using).aggregate(estimate=Max('pk'))['estimate'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts exactly up to ADMIN_EXACT_COUNT_LIMIT rows and stops there, so a
+    changelist page never counts the whole table. Past the limit an
+    unfiltered list reports estimated_rows(); a filtered one reports the
+    limit, and staff narrow it down with filters or search. The estimate
+    comes from the database the list is read from.
+    """
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        # No ordering or joins for the display columns: just the filters.
+        queryset = self.object_list.order_by().select_related(None)
+        counted = queryset[:limit + 1].count()
+        if counted <= limit:
+            return counted
+        if not queryset.query.where:
+            return max(estimated_rows(queryset.model, queryset.db), counted)
+        return limit
+
+
+class ProvinceFilter(admin.SimpleListFilter):
+    title = "province"
+    parameter_name = "province"
+
+    def lookups(self, request, model_admin):
+        # From the in-memory reference table, not a DISTINCT over profiles.
+        return [(row.pk, row.name) for row in reference.table(Province).rows]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(profile__province=self.value())
+        return queryset
+
+
+class EmploymentStatusFilter(admin.SimpleListFilter):
+    title = "employment status"
+    parameter_name = "employment_status"
+
+    def lookups(self, request, model_admin):
+        choices = CustomUserCreationForm.base_fields["employment_status"].choices
+        return [(value, label) for value, label in choices if value != reference.PLACEHOLDER[0]]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(profile__employment_status=self.value())
+        return queryset
+
+
+class ProgrammeFilter(admin.SimpleListFilter):
+    title = "learning programme"
+    parameter_name = "programme"
+    # Programme names are free text, so the list is a DISTINCT over the
+    # profile_programme_idx index, cached for this many seconds.
+    lookups_timeout = 300
+
+    def lookups(self, request, model_admin):
+        cache = caches[settings.USER_CACHE_ALIAS]
+        names = cache.get("admin:programme_names")
+        if names is None:
+            names = list(
+                LearnerProfile.objects.exclude(learning_programe_name__isnull=True)
+                .exclude(learning_programe_name="")
+                .order_by("learning_programe_name")
+                .values_list("learning_programe_name", flat=True)
+                .distinct()
+            )
+            cache.set("admin:programme_names", names, self.lookups_timeout)
+        return [(name, name) for name in names]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(profile__learning_programe_name=self.value())
+        return queryset
+
+
+class LearnerChangeList(ChangeList):
+    # Only the columns the list displays (and the key they're joined on).
+    columns = ("email", "first_name", "last_name", "is_staff", "is_active", "profile__province")
+
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).only(*self.columns)
 
 
 class CustomUserAdmin(UserAdmin):
     add_form = CustomUserCreationForm
     form = CustomUserChangeForm
     model = CustomUser
-    list_display = ("email", "is_staff", "is_active",)
-    list_filter = ("email", "is_staff", "is_active",)
+    list_display = ("email", "first_name", "last_name", "province", "is_staff", "is_active",)
+    list_filter = ("is_active", "is_staff", ProvinceFilter, EmploymentStatusFilter, ProgrammeFilter,)
+    list_select_related = ("profile",)
+    # Sorting by email uses its unique index; other columns would sort the
+    # whole table on every page.
+    sortable_by = ("email",)
+    paginator = EstimatedCountPaginator
+    # Filtered lists would otherwise count the unfiltered table as well.
+    show_full_result_count = False
     fieldsets = (
         (None, {"fields": ("email", "password")}),
-        ("Personal Info", {"fields": ("first_name", "last_name", "contact_number", "birth_date", "id_type", "id_or_passport", "age")}),
-        ("More Info", {"fields": ("title", "youth", "gender", "race", "disability", "home_language", "citezenship", "nationality", "employment_status", "unemployed_period", "home_address", "postal_address", "postal_code", "contract_number", "contracted_learning_status", "learner_enrollment_number", "learning_programe_name", "subcategory", "intervention", "start_date", "end_date", "guardian_id_no", "guardian_full_name", "guardian_contact", "province", "municipality", "town_or_city", "urban_or_rural", "occupation_level", "job_title", "OFO_occupation_code", "OFO_specialization", "OFO_occupation", "highest_school_qualification", "highest_qualification", "student_number", "bursary_awarded_date", "bursary_completion_status", "popi_consent", "popi_consent_date")}),
+        ("Personal Info", {"fields": ("first_name", "last_name")}),
         ("Permissions", {"fields": ("is_staff", "is_active", "groups", "user_permissions")}),
     )
     add_fieldsets = (
@@ -27,7 +159,70 @@ class CustomUserAdmin(UserAdmin):
         ),
     )
     search_fields = ("email",)
+    search_help_text = "Name, email, ID or passport, student or learner enrollment number (word prefixes)."
     ordering = ("email",)
+    inlines = [LearnerProfileInline]
+    actions = ["export_as_csv", "export_as_xlsx"]
+
+    def get_changelist(self, request, **kwargs):
+        return LearnerChangeList
+
+    @use_replica
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
+
+    @admin.display(description="province")
+    def province(self, obj):
+        try:
+            province_id = obj.profile.province_id
+        except LearnerProfile.DoesNotExist:
+            return ""
+        row = reference.table(Province).by_id.get(province_id)
+        return row.name if row is not None else ""
+
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index (user_app/search.py) instead of icontains
+        # scans over search_fields.
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=search.matching_user_ids(search_term)), False
+
+    @admin.action(description="Export selected learners to CSV")
+    def export_as_csv(self, request, queryset):
+        return export_response(queryset.using(read_alias()), EXPORT_FIELDS, "csv")
+
+    @admin.action(description="Export selected learners to Excel")
+    def export_as_xlsx(self, request, queryset):
+        return export_response(queryset.using(read_alias()), EXPORT_FIELDS, "xlsx")
 
 
 admin.site.register(CustomUser, CustomUserAdmin)
+
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ("to_email", "subject", "status", "attempts", "next_attempt_at", "sent_at",)
+    list_filter = ("status",)
+    search_fields = ("to_email",)
+    raw_id_fields = ("user",)
+    ordering = ("-created_at",)
+
+
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
+
+
+class ReferenceDataAdmin(admin.ModelAdmin):
+    list_display = ("code", "name",)
+    search_fields = ("code", "name",)
+
+
+class MunicipalityAdmin(ReferenceDataAdmin):
+    list_display = ("code", "name", "province",)
+    list_filter = ("province",)
+
+
+admin.site.register(Province, ReferenceDataAdmin)
+admin.site.register(Municipality, MunicipalityAdmin)
+admin.site.register(Nationality, ReferenceDataAdmin)
+admin.site.register(OccupationLevel, ReferenceDataAdmin)
+admin.site.register(Qualification, ReferenceDataAdmin)
+admin.site.register(OFOOccupation, ReferenceDataAdmin)
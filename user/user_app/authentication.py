@@ -1,21 +1,74 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+
+from .hashers import acheck_password, amake_password
+from .throttling import login_blocked, record_failed_login
+from .user_cache import get_cached_user
+
+
+# Columns needed to verify a password and to log the user in (user_login
+# also checks the temporary password state). Everything else is deferred.
+AUTH_COLUMNS = ('id', 'email', 'password', 'is_active', 'last_login', 'must_change_password', 'temporary_password_expires')
 
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
         UserModel = get_user_model()
+        if email is None:
+            # The admin login form passes the email as ``username``.
+            email = kwargs.get(UserModel.USERNAME_FIELD, kwargs.get('username'))
+        # Reject throttled clients before any query or password hash.
+        # PermissionDenied stops authenticate() from trying ModelBackend.
+        if login_blocked(request, email):
+            if request is not None:
+                request.login_throttled = True
+            raise PermissionDenied
         try:
-            user = UserModel.objects.get(email=email)
+            user = UserModel.objects.only(*AUTH_COLUMNS).get(email=email)
         except UserModel.DoesNotExist:
-            return None
+            # Hash anyway so an unknown email costs the same as a wrong
+            # password and response times don't reveal which emails exist.
+            UserModel().set_password(password)
         else:
-            if user.check_password(password):
+            # check_password() re-encodes the hash with the preferred
+            # PASSWORD_HASHERS entry when it was made with another one.
+            if user.check_password(password) and self.user_can_authenticate(user):
                 return user
+        record_failed_login(request, email)
+        return None
 
     def get_user(self, user_id):
         UserModel = get_user_model()
         try:
-            return UserModel.objects.get(pk=user_id)
+            return get_cached_user(user_id)
         except UserModel.DoesNotExist:
             return None
+
+
+async def aauthenticate(request, email, password):
+    """
+    EmailBackend.authenticate() for the async views: the same throttle,
+    lookup and dummy hash, with the hashing done on the hash executor
+    rather than on the event loop. Sets ``request.login_throttled`` instead
+    of raising PermissionDenied.
+    """
+    UserModel = get_user_model()
+    if await sync_to_async(login_blocked)(request, email):
+        request.login_throttled = True
+        return None
+    try:
+        user = await UserModel.objects.only(*AUTH_COLUMNS).aget(email=email)
+    except UserModel.DoesNotExist:
+        await amake_password(password)
+    else:
+        valid, outdated = await acheck_password(password, user.password)
+        if valid and EmailBackend().user_can_authenticate(user):
+            if outdated:
+                user.password = await amake_password(password)
+                await user.asave(update_fields=['password'])
+            user.backend = f'{EmailBackend.__module__}.{EmailBackend.__qualname__}'
+            return user
+    await sync_to_async(record_failed_login)(request, email)
+    return None
@@ -0,0 +1,259 @@
+"""
+Helpers shared by the benchmark_* management commands.
+
+Benchmarks run against a throwaway test database (never the configured one)
+and with the test environment set up, so mail goes to the locmem backend.
+"""
+import datetime
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+from django.template.base import Template
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def benchmark_database(verbosity=0, instrument_templates=True, on_disk=False):
+    """
+    Create a fresh test database, run the block against it and drop it again.
+    With instrument_templates=False templates render without the test
+    environment's per-render signal, which would dominate template timings.
+    With on_disk=True a SQLite test database is a temporary file instead of
+    shared-cache memory, where a write from a second thread fails at once
+    with "table is locked" rather than waiting for the lock.
+    """
+    render = Template._render
+    setup_test_environment()
+    if not instrument_templates:
+        Template._render = render
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if on_disk and connection.vendor == 'sqlite':
+        test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+
+
+@contextmanager
+def timer(samples):
+    """
+    Append the wall time of the block, in seconds, to ``samples``.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - start)
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    """
+    Latency summary of a list of durations in seconds, reported in ms.
+    """
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000 if ordered else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def measure_requests(send, count, start=0, traced=0):
+    """
+    Call ``send(i)`` for ``count`` consecutive indices from ``start`` and
+    report latency, queries per call and throughput. Then make ``traced``
+    further calls under tracemalloc for the Python memory each one allocates
+    at its peak and keeps afterwards; they are measured separately because
+    tracing slows every allocation down.
+    """
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    samples = []
+    with connection.execute_wrapper(count_queries):
+        begin = time.perf_counter()
+        for i in range(start, start + count):
+            with timer(samples):
+                send(i)
+        elapsed = time.perf_counter() - begin
+    result = summarize(samples)
+    result['queries_per_request'] = queries / count if count else 0.0
+    result['requests_per_sec'] = count / elapsed if elapsed else 0.0
+
+    peaks, retained = [], []
+    if traced:
+        tracemalloc.start()
+        try:
+            for i in range(start + count, start + count + traced):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                send(i)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+        finally:
+            tracemalloc.stop()
+    result['alloc_peak_kb'] = statistics.fmean(peaks) / 1024 if peaks else 0.0
+    result['alloc_retained_kb'] = statistics.fmean(retained) / 1024 if retained else 0.0
+    return result
+
+
+class PeakMemory:
+    """
+    Track the peak resident set size of this process while the block runs,
+    by sampling it from a background thread (psutil works on every platform
+    we deploy on, unlike the resource module).
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = self.peak = 0
+        self._stop = threading.Event()
+
+    def _rss(self):
+        return self._process.memory_info().rss
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self):
+        import psutil
+
+        self._process = psutil.Process()
+        self.baseline = self.peak = self._rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+    @property
+    def growth_mb(self):
+        return (self.peak - self.baseline) / 2 ** 20
+
+
+def registration_payload(i):
+    """
+    A POST body for the register view that passes CustomUserCreationForm.
+    """
+    return {
+        'email': f'learner{i}@example.com',
+        'first_name': 'Thandi',
+        'last_name': 'Mokoena',
+        'contact_number': '0821234567',
+        'birth_date': '2000-01-15',
+        'id_type': 'national id',
+        'id_or_passport': '0001150800082',
+        'age': '24',
+        'title': 'miss',
+        'youth': 'yes',
+        'gender': 'female',
+        'race': 'african',
+        'disability': 'none',
+        'home_language': 'isizulu',
+        'citezenship': 'south africa',
+        'nationality': 'afghanistan',
+        'employment_status': 'unemployed',
+        'unemployed_period': '0 - 1 year',
+        'home_address': '12 Main Road, Soweto',
+        'postal_address': '12 Main Road, Soweto',
+        'postal_code': '1804',
+        'contract_number': '',
+        'contracted_learning_status': '',
+        'learner_enrollment_number': '',
+        'learning_programe_name': 'Chemical Operations',
+        'subcategory': 'Learnership',
+        'intervention': 'Learnership',
+        'start_date': '2024-02-01',
+        'end_date': '2025-01-31',
+        'guardian_id_no': '7005125800088',
+        'guardian_full_name': 'Sipho Mokoena',
+        'guardian_contact': '0831234567',
+        'province': 'gauteng',
+        'municipality': 'City of Matlosana Local Municipality-NW403',
+        'town_or_city': 'Soweto',
+        'urban_or_rural': 'urban',
+        'occupation_level': 'Top management',
+        'job_title': 'Operator',
+        'OFO_occupation_code': '313101',
+        'OFO_specialization': 'Chemical',
+        'OFO_occupation': 'Chemical Plant Operator',
+        'highest_school_qualification': 'gr12',
+        'highest_qualification': 'National Certificate',
+        'student_number': '201912345',
+        'bursary_awarded_date': '',
+        'bursary_completion_status': 'First Year',
+        'popi_consent': 'agree',
+        'popi_consent_date': '2024-01-20',
+    }
+
+
+def make_learner(i):
+    """
+    An unsaved CustomUser, with its unsaved ``profile``, holding the
+    registration_payload() values; for bulk_create'ing benchmark data without
+    going through the form.
+    """
+    from . import derived, reference
+    from .forms import CustomUserCreationForm
+    from .models import CustomUser, LearnerProfile
+
+    fields = registration_payload(i)
+    for name in ('birth_date', 'start_date', 'end_date', 'popi_consent_date'):
+        fields[name] = datetime.date.fromisoformat(fields[name])
+    for name, model in reference.PROFILE_FIELDS.items():
+        fields[name] = reference.get_by_code(model, fields[name])
+    fields['bursary_awarded_date'] = None
+    fields['age'] = int(fields['age'])
+    user = CustomUser(
+        password='!', email=fields.pop('email'),
+        first_name=fields.pop('first_name'), last_name=fields.pop('last_name'),
+    )
+    user.profile = LearnerProfile(**{name: fields[name] for name in CustomUserCreationForm.profile_fields})
+    derived.apply(user.profile)
+    return user
+
+
+def create_learners(count, start=0, batch_size=5000):
+    """
+    bulk_create ``count`` learners and their profiles.
+    """
+    from . import changes, reporting, search
+    from .models import CustomUser, LearnerProfile
+
+    for offset in range(start, start + count, batch_size):
+        users = [make_learner(i) for i in range(offset, min(start + count, offset + batch_size))]
+        CustomUser.objects.bulk_create(users)
+        LearnerProfile.objects.bulk_create([user.profile for user in users])
+        search.index_users(user.pk for user in users)
+        reporting.add(reporting.key_for(user.profile) for user in users)
+        changes.record((user.pk for user in users), changes.INSERTED)
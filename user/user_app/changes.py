@@ -0,0 +1,160 @@
+"""
+Change tracking for delta exports of learner data.
+
+LearnerChange is a journal of the learners inserted, updated and deleted.
+A learner here is a user and their profile, the row an export writes. The
+CustomUser and LearnerProfile signals record single saves and deletes.
+Code that writes learners in bulk (imports, seeding, the derived-field
+refresh) calls record() itself, in the same transaction. Saves that only
+touch columns exports leave out, such as last_login on every login, aren't
+recorded.
+
+ExportCheckpoint names a series of submissions. A run exports each learner
+journalled after the checkpoint's position, up to the journal's end when
+the run began, once, with its net change: inserted, updated or deleted
+(the id alone). A learner inserted and deleted within the run is left
+out. The run reads the journal along its key and the learners by key, so
+its cost grows with the number of changes, not the size of the table. The
+first run under a new name has no position and exports every learner as
+inserted.
+
+After each chunk is written the run stores the last user id it wrote, so
+an interrupted run resumes there instead of starting over. The checkpoint
+only moves to the run's target once the run finishes. A learner changed
+while a run is under way can appear in it and again in the next one.
+
+Journal keys follow commit order because SQLite runs one write transaction
+at a time. On a database with concurrent writers, a transaction still open
+when a run begins could commit an entry below the run's target.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .exports import EXPORT_CHUNK_SIZE, iter_rows
+from .models import CustomUser, ExportCheckpoint, LearnerChange
+from .sqlite import retry_on_lock
+
+INSERTED, UPDATED, DELETED = LearnerChange.INSERTED, LearnerChange.UPDATED, LearnerChange.DELETED
+
+
+def record(user_ids, action):
+    """
+    Journal ``action`` for each of ``user_ids``.
+    """
+    now = timezone.now()
+    LearnerChange.objects.bulk_create(
+        [LearnerChange(user_id=pk, action=action, changed_at=now) for pk in user_ids], batch_size=1000,
+    )
+
+
+@retry_on_lock
+def begin(name, restart=False):
+    """
+    The checkpoint ``name``, ready for a run: its unfinished run, unless
+    ``restart``, or a new one up to the end of the journal.
+    """
+    with transaction.atomic():
+        checkpoint, _ = ExportCheckpoint.objects.select_for_update().get_or_create(name=name)
+        if checkpoint.target is None or restart:
+            checkpoint.target = LearnerChange.objects.aggregate(last=Max('pk'))['last'] or 0
+            checkpoint.resume_after = None
+            checkpoint.save(update_fields=['target', 'resume_after'])
+    return checkpoint
+
+
+@retry_on_lock
+def advance(checkpoint, last_user_id):
+    """
+    Note that the run has written every learner up to ``last_user_id``.
+    """
+    checkpoint.resume_after = last_user_id
+    ExportCheckpoint.objects.filter(pk=checkpoint.pk).update(resume_after=last_user_id)
+
+
+@retry_on_lock
+def finish(checkpoint):
+    checkpoint.position, checkpoint.target, checkpoint.resume_after = checkpoint.target, None, None
+    checkpoint.submitted_at = timezone.now()
+    checkpoint.save(update_fields=['position', 'target', 'resume_after', 'submitted_at'])
+
+
+def _chunked(pairs, chunk_size):
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _journal_chunks(start, end, after, chunk_size):
+    # (user_id, inserted in the range) per learner, in user id order.
+    changed = (
+        LearnerChange.objects.filter(pk__gt=start, pk__lte=end, user_id__gt=after or 0)
+        .values('user_id').annotate(inserted=Count('pk', filter=Q(action=INSERTED)))
+        .order_by('user_id').values_list('user_id', 'inserted')
+    )
+    return _chunked(changed.iterator(chunk_size=chunk_size), chunk_size)
+
+
+def _user_chunks(after, chunk_size):
+    users = CustomUser.objects.order_by('pk').values_list('pk', flat=True)
+    while True:
+        ids = list(users.filter(pk__gt=after or 0)[:chunk_size])
+        if not ids:
+            return
+        yield [(pk, True) for pk in ids]
+        after = ids[-1]
+
+
+def delta_chunks(checkpoint, fields, chunk_size=EXPORT_CHUNK_SIZE, resume=True):
+    """
+    Yield ``(last_user_id, rows)`` for the run ``checkpoint`` is on, up to
+    ``chunk_size`` learners at a time, in user id order. Each row is the
+    change followed by the ``fields``, which must start with 'id'; deleted
+    learners only have the id. Without ``resume`` the run starts from its
+    first learner again.
+    """
+    after = checkpoint.resume_after if resume else None
+    if checkpoint.position is None:
+        chunks = _user_chunks(after, chunk_size)
+    else:
+        chunks = _journal_chunks(checkpoint.position, checkpoint.target, after, chunk_size)
+    blank = [None] * (len(fields) - 1)
+    for chunk in chunks:
+        ids = [pk for pk, _ in chunk]
+        current = {row[0]: row for row in iter_rows(CustomUser.objects.filter(pk__in=ids), fields, chunk_size)}
+        rows = []
+        for pk, inserted in chunk:
+            row = current.get(pk)
+            if row is not None:
+                rows.append([INSERTED if inserted else UPDATED, *row])
+            elif not inserted:
+                rows.append([DELETED, pk, *blank])
+        yield ids[-1], rows
+
+
+def prune(batch_size=10000, progress=None):
+    """
+    Delete the journal entries every checkpoint has passed,
+    ``batch_size`` per DELETE. Nothing is deleted while there are no
+    checkpoints. Returns the number deleted.
+    """
+    passed = [
+        checkpoint.position if checkpoint.position is not None else checkpoint.target
+        for checkpoint in ExportCheckpoint.objects.all()
+    ]
+    if not passed or None in passed:
+        return 0
+    entries = LearnerChange.objects.filter(pk__lte=min(passed)).order_by('pk').values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        keys = list(entries[:batch_size])
+        if not keys:
+            return deleted
+        deleted += retry_on_lock(LearnerChange.objects.filter(pk__lte=keys[-1]).delete)()[0]
+        if progress:
+            progress(deleted)
@@ -0,0 +1,236 @@
+"""
+Learner profile fields derived from other fields rather than typed in:
+
+- ``age`` and ``youth`` from ``birth_date``
+- ``id_number_valid``, ``id_gender`` and ``id_citizen`` from an SA ID number
+  (YYMMDD, four gender digits, citizenship digit, 8, Luhn check digit)
+
+LearnerProfile.save() calls apply(), so every save stores current values;
+code that bulk_creates profiles calls it itself. Ages go stale as birthdays
+pass, so `manage.py refresh_derived_fields` runs recompute_ages() nightly:
+one UPDATE per chunk of rows, computing the age in SQL from date
+boundaries, which only writes the rows whose age or youth changed, and
+journals them for delta exports (user_app/changes.py).
+
+Reports filter on the stored, indexed ``age`` and ``youth`` columns.
+"""
+import datetime
+from collections import namedtuple
+
+from django.db import connections, router, transaction
+from django.db.models import Case, Max, Min, Q, Value, When
+
+from .sqlite import retry_on_lock
+
+# Youth as the National Youth Policy defines it.
+YOUTH_MIN_AGE = 15
+YOUTH_MAX_AGE = 35
+
+NATIONAL_ID = 'national id'
+
+# Changing any of these changes the derived fields.
+SOURCE_FIELDS = frozenset({'birth_date', 'id_or_passport', 'id_type'})
+DERIVED_FIELDS = ('birth_date', 'age', 'youth', 'id_number_valid', 'id_gender', 'id_citizen')
+
+# Luhn doubling of each digit: 2 * d, minus 9 when that has two digits.
+_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+SAIDNumber = namedtuple('SAIDNumber', 'birth_date gender citizen')
+
+
+def luhn_check_digit(digits):
+    """
+    The check digit that makes ``digits`` + it pass the Luhn checksum, as
+    the last digit of an SA ID number does.
+    """
+    reverse = digits[::-1]
+    total = sum(map(_DOUBLED.__getitem__, map(int, reverse[0::2]))) + sum(map(int, reverse[1::2]))
+    return str(-total % 10)
+
+
+def luhn_valid(number):
+    return number.isdigit() and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def parse_sa_id(number, today=None):
+    """
+    The SAIDNumber encoded in ``number``, or None if it is not a valid SA
+    ID number. The century is the latest one that doesn't put the birth
+    date in the future.
+    """
+    if not number or len(number) != 13 or not number.isascii() or not luhn_valid(number):
+        return None
+    if number[10] not in '01':
+        return None
+    today = today or datetime.date.today()
+    try:
+        birth_date = datetime.date(2000 + int(number[:2]), int(number[2:4]), int(number[4:6]))
+        if birth_date > today:
+            birth_date = birth_date.replace(year=birth_date.year - 100)
+    except ValueError:
+        return None
+    return SAIDNumber(birth_date, 'female' if int(number[6:10]) < 5000 else 'male', number[10] == '0')
+
+
+def age_on(birth_date, day):
+    return day.year - birth_date.year - ((day.month, day.day) < (birth_date.month, birth_date.day))
+
+
+def youth_for(age):
+    if age is None:
+        return None
+    return 'yes' if YOUTH_MIN_AGE <= age <= YOUTH_MAX_AGE else 'no'
+
+
+def years_before(day, years):
+    """
+    The date ``years`` years before ``day``; 28 February for 29 February in
+    a year that has none. Someone born on or before it is at least
+    ``years`` old on ``day``.
+    """
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def apply(profile, today=None):
+    """
+    Set the derived fields of an unsaved or changed LearnerProfile. A
+    missing birth date is taken from a valid ID number.
+    """
+    today = today or datetime.date.today()
+    id_number = parse_sa_id(profile.id_or_passport, today) if profile.id_type == NATIONAL_ID else None
+    profile.id_number_valid = (id_number is not None) if profile.id_type == NATIONAL_ID else None
+    profile.id_gender = id_number.gender if id_number else None
+    profile.id_citizen = id_number.citizen if id_number else None
+    if profile.birth_date is None and id_number:
+        profile.birth_date = id_number.birth_date
+    profile.age = age_on(profile.birth_date, today) if profile.birth_date else None
+    profile.youth = youth_for(profile.age)
+
+
+def check_id_number(cleaned_data):
+    """
+    Cross-field checks for CompiledSchema: a national ID number must pass
+    its checksum and carry the birth date given beside it. Returns
+    ``{field: message}``.
+    """
+    if cleaned_data.get('id_type') != NATIONAL_ID or not cleaned_data.get('id_or_passport'):
+        return {}
+    id_number = parse_sa_id(cleaned_data['id_or_passport'])
+    if id_number is None:
+        return {'id_or_passport': "Enter a valid South African ID number."}
+    birth_date = cleaned_data.get('birth_date')
+    if birth_date and birth_date != id_number.birth_date:
+        return {'birth_date': "The birth date doesn't match the ID number."}
+    return {}
+
+
+def age_expressions(birth_dates, today):
+    """
+    ``(age, youth)`` SQL expressions over ``birth_date`` for birth dates
+    in the ``(earliest, latest)`` range: a CASE over the date on which each
+    age starts, so the database computes ages without any date functions.
+    """
+    earliest, latest = birth_dates
+    youngest, oldest = age_on(latest, today), age_on(earliest, today)
+    age = Case(
+        *[When(birth_date__gt=years_before(today, age + 1), then=Value(age)) for age in range(youngest, oldest)],
+        default=Value(oldest),
+    )
+    youth = Case(
+        When(
+            birth_date__gt=years_before(today, YOUTH_MAX_AGE + 1),
+            birth_date__lte=years_before(today, YOUTH_MIN_AGE),
+            then=Value('yes'),
+        ),
+        default=Value('no'),
+    )
+    return age, youth
+
+
+def recompute_ages(model, today=None, chunk_size=10000, progress=None, record=None):
+    """
+    Bring ``age`` and ``youth`` up to date for every profile with a birth
+    date, ``chunk_size`` primary keys per UPDATE. Only rows whose values
+    change are written. ``record``, if given, is called with the keys of
+    each chunk's updated rows in the UPDATE's transaction. Returns the
+    number of rows updated.
+    """
+    today = today or datetime.date.today()
+    profiles = model._default_manager.filter(birth_date__isnull=False)
+    bounds = profiles.aggregate(
+        earliest=Min('birth_date'), latest=Max('birth_date'), first=Min('pk'), last=Max('pk'),
+    )
+    if bounds['first'] is None:
+        return 0
+    age, youth = age_expressions((bounds['earliest'], bounds['latest']), today)
+    updated = 0
+    for low in range(bounds['first'], bounds['last'] + 1, chunk_size):
+        chunk = profiles.filter(pk__gte=low, pk__lt=low + chunk_size)
+        updated += _update_ages(chunk.exclude(Q(age=age) & Q(youth=youth)), age, youth, record)
+        if progress:
+            progress(min(low + chunk_size - 1, bounds['last']), updated)
+    return updated
+
+
+@retry_on_lock
+def _update_ages(stale, age, youth, record):
+    if record is None:
+        return stale.update(age=age, youth=youth)
+    with transaction.atomic(using=stale.db):
+        keys = list(stale.values_list('pk', flat=True))
+        updated = stale.model._default_manager.filter(pk__in=keys).update(age=age, youth=youth)
+        record(keys)
+    return updated
+
+
+@retry_on_lock
+def _update_rows(model, instances, field_names, record=None):
+    """
+    Write ``field_names`` of ``instances`` with one prepared UPDATE run
+    through executemany. bulk_update() builds a CASE per column over the
+    whole batch instead, which SQLite evaluates row by row.
+    """
+    connection = connections[router.db_for_write(model)]
+    fields = [model._meta.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(model._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(model._meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(instance, field.attname), connection) for field in fields] + [instance.pk]
+        for instance in instances
+    ]
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+        if record is not None:
+            record([instance.pk for instance in instances])
+
+
+def recompute_id_fields(model, chunk_size=10000, record=None):
+    """
+    Recompute every derived field in Python and write the rows that
+    differ, for backfills and data loaded behind save()'s back. ``record``
+    is as for recompute_ages(). Returns the number of rows updated.
+    """
+    today = datetime.date.today()
+    updated, last = 0, None
+    profiles = model._default_manager.order_by('pk').only('pk', *DERIVED_FIELDS, *SOURCE_FIELDS)
+    while True:
+        chunk = list((profiles.filter(pk__gt=last) if last is not None else profiles)[:chunk_size])
+        if not chunk:
+            return updated
+        last = chunk[-1].pk
+        changed = []
+        for profile in chunk:
+            before = [getattr(profile, name) for name in DERIVED_FIELDS]
+            apply(profile, today)
+            if [getattr(profile, name) for name in DERIVED_FIELDS] != before:
+                changed.append(profile)
+        if changed:
+            _update_rows(model, changed, DERIVED_FIELDS, record)
+        updated += len(changed)
@@ -0,0 +1,140 @@
+"""
+Streaming learner-data exports.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` so neither
+model instances nor the full result set are ever held in memory, and written
+either as a streamed CSV response or through an openpyxl write-only workbook.
+"""
+import csv
+import datetime
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from . import reference
+from .models import CustomUser
+
+EXPORT_FIELDS = [
+    'id', 'email', 'first_name', 'last_name', 'date_joined', 'is_active',
+    'contact_number', 'birth_date', 'id_type', 'id_or_passport', 'age', 'title', 'youth',
+    'gender', 'race', 'disability', 'home_language', 'citezenship', 'nationality',
+    'employment_status', 'unemployed_period', 'home_address', 'postal_address', 'postal_code',
+    'contract_number', 'contracted_learning_status', 'learner_enrollment_number',
+    'learning_programe_name', 'subcategory', 'intervention', 'start_date', 'end_date',
+    'guardian_id_no', 'guardian_full_name', 'guardian_contact', 'province', 'municipality',
+    'town_or_city', 'urban_or_rural', 'occupation_level', 'job_title', 'OFO_occupation_code',
+    'OFO_specialization', 'OFO_occupation', 'highest_school_qualification',
+    'highest_qualification', 'student_number', 'bursary_awarded_date',
+    'bursary_completion_status', 'popi_consent', 'popi_consent_date',
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+_USER_COLUMNS = {field.name for field in CustomUser._meta.concrete_fields}
+
+
+def parse_fields(value):
+    """
+    Turn a comma separated field list into a validated list of export fields.
+    An empty value selects every export field.
+    """
+    if not value:
+        return list(EXPORT_FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown export field(s): {', '.join(unknown)}")
+    return fields
+
+
+def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one tuple per user, fetching ``chunk_size`` rows at a time.
+    Learner columns are read from the profile through a single join.
+    """
+    lookups = [name if name in _USER_COLUMNS else f'profile__{name}' for name in fields]
+    rows = queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=chunk_size)
+    keyed = [(index, reference.PROFILE_FIELDS[name]) for index, name in enumerate(fields) if name in reference.PROFILE_FIELDS]
+    return _with_codes(rows, keyed) if keyed else rows
+
+
+def _with_codes(rows, keyed):
+    """
+    Replace reference-table keys with their codes from the in-memory tables,
+    rather than joining every reference table.
+    """
+    lookups = [(index, reference.table(model).by_id) for index, model in keyed]
+    for row in rows:
+        row = list(row)
+        for index, by_id in lookups:
+            entry = by_id.get(row[index])
+            row[index] = entry.code if entry is not None else None
+        yield row
+
+
+class Echo:
+    """
+    File-like object whose write() hands the line straight back, so
+    csv.writer can be used to build a streamed response.
+    """
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _excel_value(value):
+    # Excel has no notion of time zones.
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value, datetime.timezone.utc)
+    return value
+
+
+def write_xlsx(rows, fields, fileobj):
+    """
+    Write rows to ``fileobj`` through an openpyxl write-only workbook, which
+    flushes each row to a temporary file instead of keeping cells in memory.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Learners')
+    sheet.append(fields)
+    for row in rows:
+        sheet.append([_excel_value(value) for value in row])
+    workbook.save(fileobj)
+
+
+def csv_response(queryset, fields, filename='learners.csv'):
+    response = StreamingHttpResponse(
+        stream_csv(iter_rows(queryset, fields), fields),
+        content_type='text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(queryset, fields, filename='learners.xlsx'):
+    # A zip archive can't be streamed before it is complete, so spool the
+    # workbook to disk and stream the file from there.
+    spool = tempfile.TemporaryFile()
+    write_xlsx(iter_rows(queryset, fields), fields, spool)
+    spool.seek(0)
+    return FileResponse(
+        spool,
+        as_attachment=True,
+        filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+def export_response(queryset, fields, file_format='csv'):
+    if file_format == 'xlsx':
+        return xlsx_response(queryset, fields)
+    return csv_response(queryset, fields)
@@ -1,10 +1,45 @@
 from django import forms
-from .models import CustomUser
-from django.contrib.auth.forms import AuthenticationForm,UserChangeForm
+from . import derived, reference
+from .models import CustomUser, LearnerProfile, Municipality, Nationality, OccupationLevel, Province, Qualification
+from django.contrib.auth.forms import AuthenticationForm,PasswordChangeForm,UserChangeForm
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.utils.translation import gettext_lazy as _
+from django.urls import reverse_lazy
 from django.utils import timezone
+from .validation import CompiledSchema, SharedFields
+from .widgets import PrecomputedSelect, TypeaheadInput
 import datetime
+import functools
+
+class ReferenceChoiceField(forms.ChoiceField):
+    """
+    A row of a reference table, picked by its code. Choices and lookups come
+    from the in-memory copy in reference.py, so neither rendering nor
+    validation queries the database. Accepts the row's name as well as its
+    code, for typeahead inputs used without JavaScript. Cleans to the model
+    instance.
+    """
+    def __init__(self, model, **kwargs):
+        self.model = model
+        super().__init__(choices=functools.partial(reference.choices, model), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values or value == reference.PLACEHOLDER[0]:
+            return None
+        row = reference.lookup(self.model, str(value))
+        if row is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+        return row
+
+    def validate(self, value):
+        forms.Field.validate(self, value)
+
+
+def validate_not_in_future(value):
+    if value > timezone.now().date():
+        raise ValidationError("Birth date cannot be in the future.", code='future_date')
+
 
 class CustomUserCreationForm(forms.ModelForm ):
     
@@ -65,16 +100,9 @@ class CustomUserCreationForm(forms.ModelForm ):
         input_formats=['%Y-%m-%d'],
         widget=forms.DateInput(attrs={'placeholder': 'YYYY-MM-DD', 'class': 'form-control datepicker'}),
         help_text='Enter your birth date in the format YYYY-MM-DD.',
+        validators=[validate_not_in_future],
     )
     
-    def clean_birth_date(self):
-        birth_date = self.cleaned_data.get('birth_date')
-        if birth_date:
-            
-            if birth_date > timezone.now().date():
-                raise ValidationError("Birth date cannot be in the future.")
-        return birth_date
-    
     id_or_passport = forms.CharField(
         required=True,
         max_length=13,
@@ -93,15 +121,17 @@ class CustomUserCreationForm(forms.ModelForm ):
                                     'class': 'form-control'}))
                                 
 
-    age = forms.IntegerField(required=True,
-                                widget=forms.NumberInput(attrs={'placeholder': 'Age',
+    # Age and youth are worked out from the birth date when the profile is
+    # saved; whatever is posted for them is ignored.
+    age = forms.IntegerField(required=False, help_text='Calculated from your birth date.',
+                                widget=forms.NumberInput(attrs={'placeholder': 'Age', 'readonly': True,
                                                             'class': 'form-control'}))
     
     title = forms.ChoiceField(choices=[('select', 'Select'), ('mr', 'Mr'), ('mrs', 'Mrs'), ('miss','Miss'), ('dr', 'Dr'), ('prof', 'Prof'), ('rev', 'Rev')], required=True,
                                 widget=forms.Select(attrs={'class': 'form-control'}))
         
-    youth = forms.CharField(required=True, max_length=3,
-                                widget=forms.TextInput(attrs={'placeholder': 'Youth',
+    youth = forms.CharField(required=False, max_length=3, help_text='Calculated from your birth date.',
+                                widget=forms.TextInput(attrs={'placeholder': 'Youth', 'readonly': True,
                                                             'class': 'form-control'}))
     
     gender = forms.ChoiceField(choices=[('select', 'Select'), ('male', 'Male'),('female', 'Female'), ('choose', 'Choose Not To Identify')], required=True,
@@ -114,13 +144,14 @@ class CustomUserCreationForm(forms.ModelForm ):
                                    required=True, widget=forms.Select(attrs={'class': 'form-control'}))
     
     home_language = forms.ChoiceField(choices=[('select', 'Select') ,('afrikaans', 'Afrikaans'), ('english', 'English'), ('isindebele',  'IsiNdebele'), ('isixhosa', 'IsiXhosa'), ('isizulu', 'IsiZulu'), ('sepedi', 'Sepedi'), ('sesotho', 'Sesotho'), ('setswana', 'Setswana'), ('siswati', 'SiSwati'), ('tshivenda', 'Tshivenda'), ('xitsonga', 'Xitsonga')], required=True,
-                                widget=forms.Select(attrs={'class': 'form-control'}))
+                                widget=PrecomputedSelect(attrs={'class': 'form-control'}))
     
     citezenship = forms.ChoiceField(choices=[('select', 'Select') ,('south africa', 'South Africa'), ('other', 'Other')], required=True,
                                 widget=forms.Select(attrs={'class': 'form-control'}))
     
-    nationality = forms.ChoiceField(choices=[('select', 'Select'),('afghanistan', 'Afghanistan'), ('albania', 'Albania'), ('algeria', 'Algeria')] ,required=True,
-                                widget=forms.Select(attrs={'class': 'form-control'}))
+    nationality = ReferenceChoiceField(Nationality, required=True,
+                                widget=TypeaheadInput(reverse_lazy('reference_typeahead', args=['nationality']),
+                                                      attrs={'placeholder': 'Nationality', 'class': 'form-control'}))
     
     employment_status = forms.ChoiceField(choices=[('select', 'Select'), ('employed-permanent', 'Employed-Permanent'), ('employed-temporary', 'Employed-Temporary'), ('employed-contractor', 'Employed-Contractor'), ('unemployed', 'Unemployed')], required=True,
                                 widget=forms.Select(attrs={'class': 'form-control'}))
@@ -241,11 +272,13 @@ class CustomUserCreationForm(forms.ModelForm ):
         )]
     )
     
-    province = forms.ChoiceField(choices=[('select', 'Select'), ('eastern_cape', 'Eastern Cape'), ('free_state', 'Free State'), ('gauteng', 'Gauteng'), ('kwazulu_natal', 'KwaZulu Natal'), ('limpopo', 'Limpopo'), ('mpumalanga', 'Mpumalanga'), ('northern_cape', 'Northen Cape'), ('north_west', 'Noth West'), ('western_cape', 'Western Cape')], required=True,
-                                widget=forms.Select(attrs={'class': 'form-control'}))
+    province = ReferenceChoiceField(Province, required=True,
+                                widget=PrecomputedSelect(attrs={'class': 'form-control'}))
     
-    municipality = forms.ChoiceField(choices=[('select', 'Select'), ('Dr Kenneth Kaunda District Municipality-DC40', 'Dr Kenneth Kaunda District Municipality-DC40'), ('City of Matlosana Local Municipality-NW403', 'City of Matlosana Local Municipality-NW403'), ('Ditsobotla Local Municipality-NW384', 'Ditsobotla Local Municipality-NW384')], required=True,
-                                widget=forms.Select(attrs={'class': 'form-control'}))
+    municipality = ReferenceChoiceField(Municipality, required=True,
+                                widget=TypeaheadInput(reverse_lazy('reference_typeahead', args=['municipality']),
+                                                      depends_on='province',
+                                                      attrs={'placeholder': 'Municipality', 'class': 'form-control'}))
                                                             
     town_or_city_pattern = r'^[a-zA-Z\s]+$'
 
@@ -264,9 +297,8 @@ class CustomUserCreationForm(forms.ModelForm ):
     urban_or_rural = forms.ChoiceField(choices=[('select', 'Select'), ('urban', 'Urban'), ('rural', 'Rural')], required=True,
                                 widget=forms.Select(attrs={'class': 'form-control'}))
                                                             
-    occupation_level = forms.ChoiceField(choices=[('select', 'Select'), ('Top management', 'Top management'), ('Senior management', 'Senior management'), ('Professionally qualified and experienced specialists and mid-management', 'Professionally qualified and experienced specialists and mid-management'), 
-                                                  ('Skilled technical and academically qualified workers, junior management, supervisors, foremen and superintendents', 'Skilled technical and academically qualified workers, junior management, supervisors, foremen and superintendents'), ('Semi-skilled and discretionary decision makers', 'Semi-skilled and discretionary decision makers'), ('Unskilled and defined decision makers', 'Unskilled and defined decision makers')], required=True,
-                                widget=forms.Select(attrs={'placeholder': 'Occupation Level',
+    occupation_level = ReferenceChoiceField(OccupationLevel, required=True,
+                                widget=PrecomputedSelect(attrs={'placeholder': 'Occupation Level',
                                                             'class': 'form-control'}))
     
     job_title = forms.CharField(max_length=100, required=True,
@@ -274,8 +306,9 @@ class CustomUserCreationForm(forms.ModelForm ):
                                                             'class': 'form-control'}))
     
     OFO_occupation_code = forms.CharField(max_length=10, required=True,
-                                widget=forms.TextInput(attrs={'placeholder': 'Occupation Code',
-                                                            'class': 'form-control'}))
+                                widget=TypeaheadInput(reverse_lazy('reference_typeahead', args=['ofo-occupation']),
+                                                      attrs={'placeholder': 'Occupation Code',
+                                                             'class': 'form-control'}))
     
     OFO_specialization = forms.CharField(max_length=100, required=True,
                                 widget=forms.TextInput(attrs={'placeholder': 'Specialization',
@@ -286,11 +319,11 @@ class CustomUserCreationForm(forms.ModelForm ):
                                                             'class': 'form-control'}))
     
     highest_school_qualification = forms.ChoiceField(choices=[('select', 'Select'), ('gr1', 'Grade 1'), ('gr2', 'Grade 2'), ('gr3', 'Grade 3'), ('gr4', 'Grade 4'), ('gr5', 'Grade 5'), ('gr6', 'Grade 6'), ('gr7', 'Grade 7'), ('gr8', 'Grade 8'), ('gr9', 'Grade 9'), ('gr10', 'Grade 10'), ('gr11', 'Grade 11'), ('gr12', 'Grade 12')], required=True,
-                                widget=forms.Select(attrs={'placeholder': 'Highest School Qualification',
+                                widget=PrecomputedSelect(attrs={'placeholder': 'Highest School Qualification',
                                                             'class': 'form-control'}))
     
-    highest_qualification = forms.ChoiceField(choices=[('select', 'Select'), ('National Certificate', 'National Certificate'), ('National Diploma', 'National Diploma'), ('National First Degree', 'National First Degree'), ('Post-doctoral Degree', 'Post-doctoral Degree'), ('Doctoral Degree', 'Doctoral Degree'), ('Masters Degree', 'Masters Degree'), ('Professional Qualification', 'Professional Qualification'), ('Honours Degree', 'Honours Degree'), ('National Higher Diploma', 'National Higher Diploma'), ('National Masters Diploma', 'National Masters Diploma'), ('National Higher Certificate', 'National Higher Certificate'), ('Further Diploma', 'Further Diploma')], required=True,
-                                widget=forms.Select(attrs={'placeholder': 'Highest Qualification',
+    highest_qualification = ReferenceChoiceField(Qualification, required=True,
+                                widget=PrecomputedSelect(attrs={'placeholder': 'Highest Qualification',
                                                             'class': 'form-control'}))
     
     student_number_pattern = r'^\d{9}$'
@@ -332,16 +365,90 @@ class CustomUserCreationForm(forms.ModelForm ):
                   'occupation_level', 'job_title', 'OFO_occupation_code', 'OFO_specialization', 'OFO_occupation', 'highest_school_qualification', 'highest_qualification',
                   'student_number', 'bursary_awarded_date', 'bursary_completion_status', 'popi_consent', 'popi_consent_date')
         
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        print(self.data)  # Print form data to debug
-        
+    # Fields stored on the LearnerProfile rather than the CustomUser row.
+    profile_fields = [name for name in Meta.fields if name not in ('email', 'first_name', 'last_name')]
+
+    def _clean_fields(self):
+        # One pass over the compiled schema instead of field.clean() through
+        # every BoundField; it includes the LearnerProfile model validators.
+        cleaned_data, errors = registration_schema.clean(self.data)
+        self.cleaned_data.update(cleaned_data)
+        for name, error_list in errors.items():
+            self.add_error(name, error_list)
+
+    def _post_clean(self):
+        super()._post_clean()
+        self.profile = LearnerProfile(**{
+            name: self.cleaned_data[name] for name in self.profile_fields if name in self.cleaned_data
+        })
+
+    def save(self, commit=True):
+        """
+        Return the user with its unsaved profile attached as ``user.profile``.
+        With commit=True both rows are saved.
+        """
+        user = super().save(commit=False)
+        user.profile = self.profile
+        if commit:
+            user.save()
+            self.profile.save()
+        return user
+
+
+# Compiled once at import; see validation.py. The form never changes its
+# fields per instance, so instances can share them.
+CustomUserCreationForm.base_fields = SharedFields(CustomUserCreationForm.base_fields)
+registration_schema = CompiledSchema(
+    CustomUserCreationForm, models=(CustomUser, LearnerProfile), checks=(derived.check_id_number,),
+)
+
+
+def validate_registration(data):
+    """
+    Validate a registration payload without building a form: the compiled
+    field checks plus the email uniqueness check ModelForm would run.
+    Returns ``(cleaned_data, errors)`` like CompiledSchema.clean().
+    """
+    cleaned_data, errors = registration_schema.clean(data)
+    if 'email' in cleaned_data and CustomUser.objects.filter(email=cleaned_data['email']).exists():
+        errors['email'] = [CustomUser().unique_error_message(CustomUser, ['email'])]
+        del cleaned_data['email']
+    return cleaned_data, errors
+
+
+def learner_from_cleaned_data(cleaned_data):
+    """
+    An unsaved CustomUser with its unsaved ``profile`` attached, from valid
+    registration data.
+    """
+    user = CustomUser(
+        email=cleaned_data['email'],
+        first_name=cleaned_data['first_name'],
+        last_name=cleaned_data['last_name'],
+    )
+    user.profile = LearnerProfile(**{name: cleaned_data[name] for name in CustomUserCreationForm.profile_fields})
+    # Profiles built here are bulk_created, which skips save().
+    derived.apply(user.profile)
+    return user
+
 
 class CustomUserChangeForm(UserChangeForm):
 
     class Meta:
         model = CustomUser
         fields = ("email",)
+
+
+class ChangePasswordForm(PasswordChangeForm):
+    """
+    The change_password form of both the sync and the async view.
+    """
+    def clean(self):
+        cleaned_data = super().clean()
+        old_password = cleaned_data.get("old_password")
+        if old_password and old_password == cleaned_data.get("new_password2"):
+            raise ValidationError("Old password cannot be the same as the new password.", code="password_unchanged")
+        return cleaned_data
         
 class Login(AuthenticationForm):
     email = forms.EmailField(max_length=100, required=True,
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from
+    settings.PASSWORD_PBKDF2_ITERATIONS (Django's default when unset).
+
+    It shares the ``pbkdf2_sha256`` algorithm name with Django's hasher, so
+    existing hashes verify unchanged; on the next successful login
+    check_password() sees the iteration count differs and re-encodes the
+    password at the configured cost.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hash_executor():
+    """
+    The thread pool async views hash passwords on. PASSWORD_HASH_WORKERS
+    bounds it (one per CPU by default): hashing is CPU bound and releases
+    the GIL, so more threads than cores only queue work inside the OS
+    instead of in front of the pool.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        return _executor
+
+
+async def run_hasher(func, *args):
+    """
+    Call ``func``, something that hashes passwords, on the hash executor
+    and wait for it without blocking the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(hash_executor(), func, *args)
+
+
+async def amake_password(password):
+    return await run_hasher(make_password, password)
+
+
+def _check(password, encoded):
+    outdated = []
+    valid = check_password(password, encoded, setter=outdated.append)
+    return valid, bool(outdated)
+
+
+async def acheck_password(password, encoded):
+    """
+    ``(valid, outdated)`` for a password against a stored hash. ``outdated``
+    means the hash should be re-encoded with the preferred hasher, which
+    check_password() would otherwise do with a save on the executor thread.
+    """
+    return await run_hasher(_check, password, encoded)
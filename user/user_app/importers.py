@@ -0,0 +1,178 @@
+"""
+Bulk learner import from CSV or XLSX files.
+
+Rows are streamed from the file, validated with the same field rules as the
+registration form and written with bulk_create one chunk at a time, so memory
+use depends on the chunk size and not on the size of the file.
+"""
+import csv
+import datetime
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.html import strip_tags
+
+from . import changes, reporting, search
+from .forms import learner_from_cleaned_data, registration_schema
+from .models import CustomUser, LearnerProfile, OutboundEmail
+from .sqlite import retry_on_lock
+
+# Same alphabet as BaseUserManager.make_random_password().
+TEMPORARY_PASSWORD_CHARS = 'abcdefghjkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+
+def _cell_to_str(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        for row_number, values in enumerate(reader, start=2):
+            yield row_number, dict(zip(header, (v.strip() for v in values)))
+
+
+def _read_xlsx(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_cell_to_str(name) for name in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            if all(v is None for v in values):
+                continue
+            yield row_number, dict(zip(header, map(_cell_to_str, values)))
+    finally:
+        workbook.close()
+
+
+def read_learner_rows(path):
+    """
+    Yield ``(row_number, {column: value})`` for every data row in a CSV or
+    XLSX file. The first row is the header and must use the form field names.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return _read_csv(path)
+    if extension in ('.xlsx', '.xlsm'):
+        return _read_xlsx(path)
+    raise ValueError(f"Unsupported file type '{extension}', expected .csv or .xlsx")
+
+
+def _validate_chunk(rows, error_writer):
+    """
+    Validate a chunk of rows and return the unsaved CustomUser instances, with
+    their unsaved ``profile`` attached, for the rows that passed.
+    """
+    valid = []
+    for row_number, data in rows:
+        # The compiled registration schema, without building a form per row.
+        # Email uniqueness is checked once per chunk below.
+        cleaned_data, errors = registration_schema.clean(data)
+        if errors:
+            for field, error_list in errors.items():
+                for error in error_list:
+                    for message in error:
+                        error_writer(row_number, field, message)
+            continue
+        valid.append((row_number, learner_from_cleaned_data(cleaned_data)))
+
+    emails = [user.email for _, user in valid]
+    taken = set(CustomUser.objects.filter(email__in=emails).values_list('email', flat=True))
+    users, seen = [], set()
+    for row_number, user in valid:
+        if user.email in taken or user.email in seen:
+            error_writer(row_number, 'email', "A user with this email address already exists.")
+            continue
+        seen.add(user.email)
+        users.append(user)
+    return users
+
+
+def _queue_password_emails(users, passwords):
+    outbound = []
+    for user, password in zip(users, passwords):
+        html_message = render_to_string('temp_password.html', {'user': user, 'temporary_password': password})
+        outbound.append(OutboundEmail(
+            user=user,
+            to_email=user.email,
+            subject="Your Temporary Password",
+            body=strip_tags(html_message),
+            html_body=html_message,
+        ))
+    OutboundEmail.objects.bulk_create(outbound)
+
+
+@retry_on_lock
+def _insert_chunk(users, passwords):
+    with transaction.atomic():
+        # A retry inserts the rows again: the rolled back attempt left its
+        # ids on the instances, and another writer may have taken them since.
+        for user in users:
+            user.pk = None
+            user._state.adding = True
+        CustomUser.objects.bulk_create(users)
+        profiles = []
+        for user in users:
+            profile = user.profile
+            profile.user = user
+            profile._state.adding = True
+            profiles.append(profile)
+        LearnerProfile.objects.bulk_create(profiles)
+        search.index_users(user.pk for user in users)
+        reporting.add(reporting.key_for(user.profile) for user in users)
+        changes.record((user.pk for user in users), changes.INSERTED)
+        if passwords is not None:
+            _queue_password_emails(users, passwords)
+
+
+def import_learners(rows, error_writer, chunk_size=500, workers=4, dry_run=False,
+                    send_emails=True, password_ttl=datetime.timedelta(hours=24)):
+    """
+    Validate and insert learner rows chunk by chunk.
+
+    ``error_writer(row_number, field, message)`` is called for every problem
+    found. Temporary passwords are hashed on a thread pool; the PBKDF2, Argon2
+    and bcrypt hashers all release the GIL while hashing. Returns a dict with
+    the number of rows read, created and rejected.
+    """
+    stats = {'rows': 0, 'created': 0, 'rejected': 0}
+
+    rows = iter(rows)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            users = _validate_chunk(chunk, error_writer)
+            stats['rows'] += len(chunk)
+            stats['rejected'] += len(chunk) - len(users)
+            if dry_run or not users:
+                continue
+
+            passwords = [get_random_string(10, TEMPORARY_PASSWORD_CHARS) for _ in users]
+            expires = timezone.now() + password_ttl
+            for user, hashed in zip(users, pool.map(make_password, passwords)):
+                user.password = hashed
+                user.must_change_password = True
+                user.temporary_password_expires = expires
+
+            _insert_chunk(users, passwords if send_emails else None)
+            stats['created'] += len(users)
+    return stats
@@ -0,0 +1,143 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .sqlite import retry_on_lock
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(subject, message, recipient, html_message='', from_email=None, user=None):
+    """
+    Store a message in the outbox and return immediately. Nothing is sent
+    over the network here; see dispatch_queued_mail().
+    """
+    return OutboundEmail.objects.create(
+        user=user,
+        to_email=recipient,
+        from_email=from_email or '',
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+    )
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff: EMAIL_QUEUE_RETRY_BACKOFF seconds after the first
+    failure, doubling after each further failure.
+    """
+    return timedelta(seconds=settings.EMAIL_QUEUE_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+@retry_on_lock
+def _claim_batch(batch_size):
+    """
+    Pick the next due messages and push their next_attempt_at forward so a
+    second dispatcher does not pick up the same rows while this one is
+    talking to the SMTP server.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_QUEUED, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[m.pk for m in batch]).update(
+                next_attempt_at=now + timedelta(seconds=settings.EMAIL_QUEUE_LEASE)
+            )
+    return batch
+
+
+def _build_message(outbound, connection):
+    message = EmailMultiAlternatives(
+        outbound.subject,
+        outbound.body,
+        outbound.from_email or None,
+        [outbound.to_email],
+        connection=connection,
+    )
+    if outbound.html_body:
+        message.attach_alternative(outbound.html_body, 'text/html')
+    return message
+
+
+def _record_failure(outbound, error, max_attempts, result):
+    outbound.attempts += 1
+    outbound.last_error = str(error)
+    if outbound.attempts >= max_attempts:
+        outbound.status = OutboundEmail.STATUS_FAILED
+        # Never sent again, so there's no reason to keep a temporary
+        # password it may carry.
+        outbound.body = ''
+        outbound.html_body = ''
+        result['failed'] += 1
+    else:
+        outbound.next_attempt_at = timezone.now() + retry_delay(outbound.attempts)
+        result['retried'] += 1
+
+
+def dispatch_queued_mail(batch_size=None, max_attempts=None, connection=None):
+    """
+    Deliver one batch of due messages over a single SMTP connection.
+
+    Returns a dict with the number of messages sent, rescheduled for retry
+    and permanently failed.
+    """
+    batch_size = batch_size or settings.EMAIL_QUEUE_BATCH_SIZE
+    max_attempts = max_attempts or settings.EMAIL_QUEUE_MAX_ATTEMPTS
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return result
+
+    connection = connection or get_connection()
+    sent, retried = [], []
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning(f"Could not open mail connection. Error: {str(e)}")
+        for outbound in batch:
+            _record_failure(outbound, e, max_attempts, result)
+        retried = batch
+    else:
+        try:
+            for outbound in batch:
+                try:
+                    _build_message(outbound, connection).send()
+                except Exception as e:
+                    logger.warning(f"Failed to send email {outbound.pk} to {outbound.to_email}. Error: {str(e)}")
+                    _record_failure(outbound, e, max_attempts, result)
+                    retried.append(outbound)
+                else:
+                    outbound.attempts += 1
+                    outbound.status = OutboundEmail.STATUS_SENT
+                    outbound.sent_at = timezone.now()
+                    outbound.last_error = ''
+                    # The body may carry a temporary password; don't keep it
+                    # around once it has been delivered.
+                    outbound.body = ''
+                    outbound.html_body = ''
+                    sent.append(outbound)
+        finally:
+            connection.close()
+
+    if sent:
+        OutboundEmail.objects.bulk_update(
+            sent, ['status', 'attempts', 'sent_at', 'last_error', 'body', 'html_body']
+        )
+    if retried:
+        OutboundEmail.objects.bulk_update(
+            retried, ['status', 'attempts', 'next_attempt_at', 'last_error', 'body', 'html_body']
+        )
+    result['sent'] = len(sent)
+    return result
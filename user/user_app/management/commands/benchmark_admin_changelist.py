@@ -0,0 +1,87 @@
+from contextlib import contextmanager, nullcontext
+
+from django.contrib import admin
+from django.contrib.admin import ModelAdmin
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.test import Client
+
+from user_app.benchmarks import benchmark_database, create_learners, measure_requests
+from user_app.models import CustomUser, Province
+
+
+# The changelist as it was: an email filter (one sidebar entry per user),
+# full counts and every column loaded.
+STOCK = {
+    'list_display': ('email', 'is_staff', 'is_active'),
+    'list_filter': ('email', 'is_staff', 'is_active'),
+    'list_select_related': False,
+    'sortable_by': None,
+    'paginator': Paginator,
+    'show_full_result_count': True,
+}
+
+
+@contextmanager
+def stock_changelist(model_admin):
+    """
+    Give the registered admin its old options for the duration of the block.
+    The admin URLs are bound to the registered instance, so it is changed in
+    place rather than replaced.
+    """
+    for name, value in STOCK.items():
+        setattr(model_admin, name, value)
+    model_admin.get_changelist = lambda request, **kwargs: ModelAdmin.get_changelist(model_admin, request, **kwargs)
+    try:
+        yield
+    finally:
+        for name in [*STOCK, 'get_changelist']:
+            delattr(model_admin, name)
+
+
+class Command(BaseCommand):
+    help = "Time the CustomUser admin changelist at growing table sizes, tuned and as it was."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help="Comma-separated learner counts, measured in increasing order.")
+        parser.add_argument('--requests', type=int, default=10)
+        parser.add_argument('--stock-max', type=int, default=100000,
+                            help="Largest size to measure the stock changelist at; it lists every email.")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with benchmark_database(instrument_templates=False):
+            staff = CustomUser.objects.create_superuser(email='admin@example.com', password='x')
+            client = Client()
+            client.force_login(staff)
+            gauteng = Province.objects.get(code='gauteng').pk
+            model_admin = admin.site._registry[CustomUser]
+            created = 0
+            for size in sizes:
+                create_learners(size - created, start=created)
+                created = size
+                pages = (
+                    ('first page', {}),
+                    ('middle page', {'p': size // model_admin.list_per_page // 2}),
+                    ('province filter', {'province': gauteng}),
+                    ('inactive filter', {'is_active__exact': 0}),
+                )
+                runs = [('tuned', nullcontext)]
+                if size <= options['stock_max']:
+                    runs.append(('stock', lambda: stock_changelist(model_admin)))
+                for label, configure in runs:
+                    with configure():
+                        for page, params in pages:
+                            if label == 'stock' and 'province' in params:
+                                continue
+                            cache.clear()
+                            client.get('/admin/user_app/customuser/', params)
+                            result = measure_requests(
+                                lambda i: client.get('/admin/user_app/customuser/', params), options['requests'],
+                            )
+                            self.stdout.write(
+                                f"{size:>8} {label:<6} {page:<16} mean {result['mean_ms']:9.1f} ms  "
+                                f"p95 {result['p95_ms']:9.1f} ms  {result['queries_per_request']:.0f} queries"
+                            )
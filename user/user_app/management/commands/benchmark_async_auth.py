@@ -0,0 +1,120 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import include, path
+
+from user_app.benchmarks import benchmark_database, registration_payload, summarize
+from user_app.models import CustomUser
+from user_app.urls import auth_urlpatterns
+
+FLOWS = ('login', 'register')
+PASSWORD = 'Benchmark-pass-1'
+
+# The site as user/asgi.py serves it; the command switches ROOT_URLCONF to
+# this module for the ASGI runs.
+urlpatterns = [*auth_urlpatterns(async_views=True), path('', include('user_app.urls'))]
+
+
+def login_payload(i):
+    return {'email': f'bench{i}@example.com', 'password': PASSWORD}
+
+
+PAYLOADS = {'login': login_payload, 'register': registration_payload}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare login and registration under concurrent load: the async views on one event loop, "
+        "as an ASGI worker runs them, against the sync views on a pool of WSGI threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Measured requests per flow and level.")
+        parser.add_argument('--concurrency', default='1,8,32',
+                            help="Comma-separated numbers of requests in flight at once.")
+        parser.add_argument('--flows', default=','.join(FLOWS),
+                            help=f"Comma-separated subset of: {', '.join(FLOWS)}.")
+        parser.add_argument('--iterations', type=int, default=None,
+                            help="PASSWORD_PBKDF2_ITERATIONS for the run; the configured cost by default.")
+
+    def split(self, indexes, workers):
+        return [indexes[n::workers] for n in range(workers)]
+
+    def run_wsgi(self, send, indexes, concurrency):
+        samples, statuses = [], []
+
+        def worker(chunk):
+            client = Client()
+            for i in chunk:
+                start = time.perf_counter()
+                statuses.append(send(client, i).status_code)
+                samples.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, self.split(indexes, concurrency)))
+        return samples, statuses, time.perf_counter() - started
+
+    def run_asgi(self, send, indexes, concurrency):
+        samples, statuses = [], []
+
+        async def worker(chunk):
+            client = AsyncClient()
+            for i in chunk:
+                start = time.perf_counter()
+                statuses.append((await send(client, i)).status_code)
+                samples.append(time.perf_counter() - start)
+
+        async def main():
+            await asyncio.gather(*(worker(chunk) for chunk in self.split(indexes, concurrency)))
+
+        started = time.perf_counter()
+        asyncio.run(main())
+        return samples, statuses, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        flows = options['flows'].split(',')
+        unknown = set(flows) - set(FLOWS)
+        if unknown:
+            raise CommandError(f"Unknown flows: {', '.join(sorted(unknown))}")
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        count = options['requests']
+        unlimited = {'ip': (10 ** 9, 300), 'email': (10 ** 9, 300)}
+
+        with benchmark_database(instrument_templates=False, on_disk=True), override_settings(
+            LOGIN_THROTTLE_RATES=unlimited, PASSWORD_PBKDF2_ITERATIONS=options['iterations'],
+        ):
+            encoded = make_password(PASSWORD)
+            CustomUser.objects.bulk_create(
+                CustomUser(email=login_payload(i)['email'], password=encoded) for i in range(count)
+            )
+            self.stdout.write(f"{'flow':<10} {'server':<6} {'in flight':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+            offset = 0
+            for flow in flows:
+                for level in levels:
+                    for server in ('wsgi', 'asgi'):
+                        if flow == 'login':
+                            indexes = list(range(count))
+                        else:
+                            indexes = list(range(offset, offset + count))
+                            offset += count
+                        send = lambda client, i: client.post(f'/{flow}/', PAYLOADS[flow](i))
+                        if server == 'wsgi':
+                            samples, statuses, elapsed = self.run_wsgi(send, indexes, level)
+                        else:
+                            with override_settings(ROOT_URLCONF=__name__):
+                                samples, statuses, elapsed = self.run_asgi(send, indexes, level)
+                        failed = sum(status != 302 for status in statuses)
+                        if failed:
+                            raise CommandError(f"{flow} over {server}: {failed} of {count} requests failed")
+                        stats = summarize(samples)
+                        self.stdout.write(
+                            f"{flow:<10} {server:<6} {level:>9} {count / elapsed:>8.1f} "
+                            f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f}"
+                        )
+
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_app import changes
+from user_app.benchmarks import benchmark_database, create_learners
+from user_app.exports import EXPORT_FIELDS, iter_rows
+from user_app.models import CustomUser, LearnerProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a full learner export against delta exports of a few changed learners, at growing table "
+        "sizes, to show the delta's cost follows the changes rather than the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,50000,100000', help="Comma separated table sizes.")
+        parser.add_argument('--changes', type=int, default=100, help="Learners changed between submissions.")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        # EXPORT_FIELDS starts with the id, as delta exports need.
+        fields = EXPORT_FIELDS
+        with benchmark_database(instrument_templates=False):
+            self.stdout.write(f"{'learners':>9} {'full s':>8} {'delta s':>8} {'delta rows':>11}")
+            loaded = 0
+            for size in sizes:
+                create_learners(size - loaded, start=loaded)
+                loaded = size
+                # Everything so far counts as submitted.
+                changes.finish(changes.begin('benchmark'))
+                # Spread across the table.
+                ids = list(CustomUser.objects.order_by('pk').values_list('pk', flat=True))
+                changed = ids[::max(1, size // options['changes'])][:options['changes']]
+                for profile in LearnerProfile.objects.filter(pk__in=changed):
+                    profile.postal_code = '0001'
+                    profile.save(update_fields=['postal_code'])
+
+                started = time.perf_counter()
+                for _ in iter_rows(CustomUser.objects.all(), fields):
+                    pass
+                full = time.perf_counter() - started
+
+                started = time.perf_counter()
+                checkpoint = changes.begin('benchmark')
+                written = sum(len(rows) for _, rows in changes.delta_chunks(checkpoint, fields))
+                changes.finish(checkpoint)
+                delta = time.perf_counter() - started
+                self.stdout.write(f"{size:>9} {full:>8.3f} {delta:>8.3f} {written:>11}")
@@ -0,0 +1,40 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_app.benchmarks import PeakMemory, benchmark_database, create_learners
+from user_app.exports import EXPORT_CHUNK_SIZE, EXPORT_FIELDS, iter_rows, stream_csv, write_xlsx
+from user_app.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Measure export throughput (rows/sec) and peak RSS on a synthetic user table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument('--formats', default='csv,xlsx')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f"Seeding {options['rows']} users...")
+            create_learners(options['rows'])
+
+            for file_format in options['formats'].split(','):
+                rows = iter_rows(CustomUser.objects.all(), EXPORT_FIELDS, chunk_size=options['chunk_size'])
+                with tempfile.TemporaryFile(mode='w+b') as sink, PeakMemory() as memory:
+                    start = time.perf_counter()
+                    if file_format == 'xlsx':
+                        write_xlsx(rows, EXPORT_FIELDS, sink)
+                    else:
+                        for line in stream_csv(rows, EXPORT_FIELDS):
+                            sink.write(line.encode())
+                    elapsed = time.perf_counter() - start
+                    size = sink.tell()
+
+                self.stdout.write(
+                    f"{file_format}: {options['rows']} rows in {elapsed:.2f}s "
+                    f"({options['rows'] / elapsed:.0f} rows/sec), {size / 2 ** 20:.1f} MB written, "
+                    f"peak RSS {memory.peak / 2 ** 20:.1f} MB (+{memory.growth_mb:.1f} MB)"
+                )
@@ -0,0 +1,156 @@
+import datetime
+import json
+import subprocess
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from user_app.benchmarks import benchmark_database, measure_requests, registration_payload
+from user_app.models import CustomUser
+
+FLOWS = ('register', 'login', 'change_password', 'home')
+PASSWORD = 'Benchmark-pass-1'
+NEW_PASSWORD = 'Benchmark-pass-2'
+# Reported when comparing runs; higher is worse for all of them except
+# requests_per_sec.
+COMPARED = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'requests_per_sec', 'alloc_peak_kb')
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive register, login, change_password and home through the test client and "
+        "report latency percentiles, queries per request, allocations and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per flow.")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per flow first.")
+        parser.add_argument('--alloc-samples', type=int, default=20,
+                            help="Extra requests per flow traced with tracemalloc.")
+        parser.add_argument('--flows', default=','.join(FLOWS),
+                            help=f"Comma-separated subset of: {', '.join(FLOWS)}.")
+        parser.add_argument('--production-hashers', action='store_true',
+                            help="Use the configured PASSWORD_HASHERS instead of MD5, so "
+                                 "login and change_password include the real hashing cost.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Print the change against a previous --output file.")
+
+    def expect(self, response, status, flow):
+        if response.status_code != status:
+            raise CommandError(f"{flow}: expected HTTP {status}, got {response.status_code}")
+
+    def logged_in_clients(self, total, prefix):
+        """
+        One client per request, each logged in as its own user, so every
+        change_password request starts from a known password.
+        """
+        encoded = make_password(PASSWORD)
+        users = CustomUser.objects.bulk_create(
+            CustomUser(email=f'{prefix}{i}@example.com', password=encoded) for i in range(total)
+        )
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        return clients
+
+    def senders(self, total):
+        """
+        A function per flow that makes its i-th request.
+        """
+        def register(i):
+            self.expect(Client().post('/register/', registration_payload(i)), 302, 'register')
+
+        encoded = make_password(PASSWORD)
+        CustomUser.objects.bulk_create(
+            CustomUser(email=f'login{i}@example.com', password=encoded) for i in range(total)
+        )
+
+        def login(i):
+            response = Client().post('/login/', {'email': f'login{i}@example.com', 'password': PASSWORD})
+            self.expect(response, 302, 'login')
+
+        changers = self.logged_in_clients(total, 'changer')
+
+        def change_password(i):
+            response = changers[i].post('/change_password/', {
+                'old_password': PASSWORD, 'new_password1': NEW_PASSWORD, 'new_password2': NEW_PASSWORD,
+            })
+            self.expect(response, 302, 'change_password')
+
+        viewer = self.logged_in_clients(1, 'viewer')[0]
+
+        def home(i):
+            self.expect(viewer.get('/home/'), 200, 'home')
+
+        return {'register': register, 'login': login, 'change_password': change_password, 'home': home}
+
+    def compare(self, path, results):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(f"\nchange against {path} (commit {previous.get('commit')}):")
+        for flow, stats in results['flows'].items():
+            old = previous['flows'].get(flow)
+            if not old:
+                continue
+            changes = []
+            for key in COMPARED:
+                if old.get(key):
+                    changes.append(f"{key} {(stats[key] - old[key]) / old[key]:+.1%}")
+            self.stdout.write(f"  {flow:<16} " + '  '.join(changes))
+
+    def handle(self, *args, **options):
+        flows = [name.strip() for name in options['flows'].split(',') if name.strip()]
+        unknown = set(flows) - set(FLOWS)
+        if unknown:
+            raise CommandError(f"Unknown flows: {', '.join(sorted(unknown))}")
+        warmup, count, traced = options['warmup'], options['requests'], options['alloc_samples']
+
+        overrides = {}
+        if not options['production_hashers']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        results = {
+            'commit': current_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'options': {'requests': count, 'warmup': warmup, 'alloc_samples': traced,
+                        'production_hashers': options['production_hashers']},
+            'flows': {},
+        }
+        # benchmark_database() sets up the test environment, which swaps the
+        # SMTP backend for locmem, so nothing leaves the machine.
+        with benchmark_database(), override_settings(**overrides):
+            caches[settings.LOGIN_THROTTLE_CACHE_ALIAS].clear()
+            senders = self.senders(warmup + count + traced)
+            for flow in flows:
+                send = senders[flow]
+                for i in range(warmup):
+                    send(i)
+                stats = measure_requests(send, count, start=warmup, traced=traced)
+                results['flows'][flow] = stats
+                self.stdout.write(
+                    f"{flow:<16} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms "
+                    f"p99={stats['p99_ms']:.2f}ms  {stats['requests_per_sec']:.0f} req/s  "
+                    f"{stats['queries_per_request']:.2f} queries/req  "
+                    f"alloc peak={stats['alloc_peak_kb']:.0f}KiB retained={stats['alloc_retained_kb']:.1f}KiB"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['compare']:
+            self.compare(options['compare'], results)
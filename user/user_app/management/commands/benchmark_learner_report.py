@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import Client
+
+from user_app import reporting
+from user_app.benchmarks import benchmark_database, measure_requests, summarize, timer
+from user_app.models import CustomUser, LearnerProfile
+from user_app.seeding import seed_users
+
+PIVOTS = (
+    ('province', None),
+    ('province,race', 'gender'),
+    ('programme,employment_status', 'disability'),
+)
+
+
+def on_demand(by, column):
+    """
+    The same counts grouped over every profile, as reports did before.
+    """
+    group = [reporting.DIMENSIONS[name] for name in [*by.split(','), *([column] if column else [])]]
+    return list(LearnerProfile.objects.values(*group).annotate(learners=Count('pk')).order_by(*group))
+
+
+class Command(BaseCommand):
+    help = "Time funder report pivots from the summary table against grouping every profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500000)
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database(instrument_templates=False):
+            start = time.perf_counter()
+            seed_users(options['users'], defer_indexes=True)
+            self.stdout.write(f"{options['users']} learners seeded in {time.perf_counter() - start:.1f} s")
+            start = time.perf_counter()
+            reporting.rebuild()
+            self.stdout.write(f"full rebuild: {time.perf_counter() - start:.2f} s")
+
+            staff = CustomUser.objects.create_superuser(email='admin@example.com', password='x')
+            client = Client()
+            client.force_login(staff)
+            for by, column in PIVOTS:
+                params = {'by': by, **({'columns': column} if column else {})}
+                summary = measure_requests(
+                    lambda i: client.get('/staff/reports/learners/', params), options['requests'],
+                )
+                samples = []
+                for _ in range(max(options['requests'] // 10, 3)):
+                    with timer(samples):
+                        on_demand(by, column)
+                scan = summarize(samples)
+                label = f"{by}" + (f" x {column}" if column else '')
+                self.stdout.write(
+                    f"{label:<42} endpoint p50 {summary['p50_ms']:8.2f} ms  "
+                    f"on-demand GROUP BY p50 {scan['p50_ms']:9.2f} ms"
+                )
+
+            # What the signals add to a profile save that changes a dimension.
+            rng = random.Random(0)
+            profiles = list(LearnerProfile.objects.order_by('?')[:options['requests']])
+            samples = []
+            for profile in profiles:
+                profile.race = rng.choice(('african', 'coloured', 'indian', 'white'))
+                with timer(samples):
+                    profile.save(update_fields=['race'])
+            result = summarize(samples)
+            self.stdout.write(f"profile save with summary update p50 {result['p50_ms']:.2f} ms")
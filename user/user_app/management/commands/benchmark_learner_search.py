@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from user_app import search
+from user_app.benchmarks import benchmark_database, make_learner, summarize, timer
+from user_app.models import CustomUser, LearnerProfile
+
+FIRST_NAMES = (
+    'Thandi', 'Sipho', 'Lerato', 'Pieter', 'Ayanda', 'Nomvula', 'Johan', 'Kagiso', 'Zanele', 'Bongani',
+    'Naledi', 'Themba', 'Anele', 'Refilwe', 'Mpho', 'Karabo', 'Lindiwe', 'Tshepo', 'Fatima', 'Priya',
+)
+LAST_NAMES = (
+    'Mokoena', 'Dlamini', 'Nkosi', 'van der Merwe', 'Khumalo', 'Botha', 'Ndlovu', 'Naidoo', 'Pillay', 'Mahlangu',
+    'Mthembu', 'Sithole', 'Zulu', 'Molefe', 'Pretorius', 'Venter', 'Ngcobo', 'Mabaso', 'Jacobs', 'Adams',
+)
+
+
+def synthetic_learner(i, rng):
+    user = make_learner(i)
+    user.first_name = rng.choice(FIRST_NAMES)
+    user.last_name = rng.choice(LAST_NAMES)
+    user.profile.id_or_passport = f'{rng.randrange(10 ** 12, 10 ** 13)}'
+    user.profile.student_number = f'{2015 + i % 10}{i:07d}'
+    user.profile.learner_enrollment_number = f'LE{i:08d}'
+    return user
+
+
+def icontains(query):
+    """
+    The scan staff had before: every word in any of the searched columns.
+    """
+    condition = Q()
+    for word in query.split():
+        condition &= (
+            Q(first_name__icontains=word) | Q(last_name__icontains=word) | Q(email__icontains=word)
+            | Q(profile__id_or_passport__icontains=word) | Q(profile__student_number__icontains=word)
+            | Q(profile__learner_enrollment_number__icontains=word)
+        )
+    return CustomUser.objects.filter(condition)
+
+
+class Command(BaseCommand):
+    help = "Time staff learner searches on the full-text index against icontains scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500000)
+        parser.add_argument('--queries', type=int, default=200,
+                            help="Searches measured per query kind and method.")
+        parser.add_argument('--page-size', type=int, default=25)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        users, page_size = options['users'], options['page_size']
+        with benchmark_database():
+            start = time.perf_counter()
+            for offset in range(0, users, 5000):
+                batch = [synthetic_learner(i, rng) for i in range(offset, min(users, offset + 5000))]
+                CustomUser.objects.bulk_create(batch)
+                LearnerProfile.objects.bulk_create([user.profile for user in batch])
+            loaded = time.perf_counter() - start
+            start = time.perf_counter()
+            search.rebuild()
+            indexed = time.perf_counter() - start
+            self.stdout.write(f"{users} users: load {loaded:.1f} s, index {indexed:.1f} s")
+
+            kinds = (
+                ('surname prefix', lambda: rng.choice(LAST_NAMES).split()[-1][:4]),
+                ('first + last name', lambda: f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES).split()[-1]}'),
+                ('student number', lambda: f'{2015 + (i := rng.randrange(users)) % 10}{i:07d}'),
+                ('email', lambda: f'learner{rng.randrange(users)}@example.com'),
+            )
+            methods = (
+                ('full-text', lambda query: (search.SearchResults(query).count(),
+                                             search.SearchResults(query)[:page_size])),
+                ('icontains', lambda query: (icontains(query).count(),
+                                             list(icontains(query).order_by('email')[:page_size]))),
+            )
+            for kind, make_query in kinds:
+                queries = [make_query() for _ in range(options['queries'])]
+                for label, run in methods:
+                    # The scans take seconds each over 500k rows; a few make the point.
+                    sample = queries if label == 'full-text' else queries[:max(len(queries) // 20, 3)]
+                    samples = []
+                    for query in sample:
+                        with timer(samples):
+                            run(query)
+                    result = summarize(samples)
+                    self.stdout.write(
+                        f"{kind:<18} {label:<10} n={result['count']:<4} mean {result['mean_ms']:9.2f} ms  "
+                        f"p50 {result['p50_ms']:9.2f} ms  p99 {result['p99_ms']:9.2f} ms"
+                    )
@@ -0,0 +1,69 @@
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from user_app.benchmarks import benchmark_database, summarize, timer
+from user_app.models import CustomUser
+
+TUNED = 'user_app.hashers.TunedPBKDF2PasswordHasher'
+
+# (label, PASSWORD_HASHERS, PASSWORD_PBKDF2_ITERATIONS). Hashers whose
+# library isn't installed are skipped.
+CONFIGURATIONS = (
+    ('pbkdf2 (Django default)', [TUNED], None),
+    ('pbkdf2 300k iterations', [TUNED], 300000),
+    ('pbkdf2 100k iterations', [TUNED], 100000),
+    ('argon2', ['django.contrib.auth.hashers.Argon2PasswordHasher'], None),
+    ('bcrypt_sha256', ['django.contrib.auth.hashers.BCryptSHA256PasswordHasher'], None),
+    ('scrypt', ['django.contrib.auth.hashers.ScryptPasswordHasher'], None),
+)
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput (success, wrong password, unknown email) at several hasher settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=20,
+                            help="Logins measured per case and configuration.")
+
+    def available(self):
+        hasher = get_hasher()
+        try:
+            hasher.encode('probe', hasher.salt())
+        except ValueError:
+            return False
+        return True
+
+    def measure(self, count, email, password):
+        factory = RequestFactory()
+        samples = []
+        for _ in range(count):
+            with timer(samples):
+                authenticate(factory.post('/login/'), email=email, password=password)
+        return summarize(samples)
+
+    def handle(self, *args, **options):
+        count = options['attempts']
+        unlimited = {'ip': (10 ** 9, 300), 'email': (10 ** 9, 300)}
+        with benchmark_database(), override_settings(LOGIN_THROTTLE_RATES=unlimited):
+            for label, hashers, iterations in CONFIGURATIONS:
+                with override_settings(PASSWORD_HASHERS=hashers, PASSWORD_PBKDF2_ITERATIONS=iterations):
+                    if not self.available():
+                        self.stdout.write(f"{label:<24} skipped (hasher library not installed)")
+                        continue
+                    CustomUser.objects.filter(email='bench@example.com').delete()
+                    CustomUser.objects.create_user(email='bench@example.com', password='correct horse')
+                    start = time.perf_counter()
+                    cases = (
+                        ('success', self.measure(count, 'bench@example.com', 'correct horse')),
+                        ('wrong password', self.measure(count, 'bench@example.com', 'wrong')),
+                        ('unknown email', self.measure(count, 'nobody@example.com', 'wrong')),
+                    )
+                    rate = 3 * count / (time.perf_counter() - start)
+                self.stdout.write(f"{label:<24} {rate:7.1f} logins/sec")
+                for case, stats in cases:
+                    self.stdout.write(f"  {case:<16} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms")
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from user_app.benchmarks import benchmark_database
+from user_app.models import CustomUser
+from user_app.throttling import reset_throttle_stats, throttle_stats
+
+
+class Command(BaseCommand):
+    help = "Compare CPU time per failed login attempt with CPU time per throttled (rejected) attempt."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=20,
+                            help="Failed attempts measured before the throttle kicks in.")
+        parser.add_argument('--rejected', type=int, default=5000,
+                            help="Attempts measured once the client is blocked.")
+
+    def attempts(self, count, email):
+        factory = RequestFactory()
+        start = time.process_time()
+        for _ in range(count):
+            authenticate(factory.post('/login/'), email=email, password='wrong')
+        return (time.process_time() - start) / count
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            # Uses the configured PASSWORD_HASHERS, so the unthrottled cost
+            # is what production pays per attempt.
+            CustomUser.objects.create_user(email='victim@example.com', password='correct horse')
+            caches[settings.LOGIN_THROTTLE_CACHE_ALIAS].clear()
+            reset_throttle_stats()
+
+            unlimited = {'ip': (10 ** 9, 300), 'email': (10 ** 9, 300)}
+            with override_settings(LOGIN_THROTTLE_RATES=unlimited):
+                failed = self.attempts(options['attempts'], 'victim@example.com')
+
+            blocked = {'ip': (1, 300), 'email': (1, 300)}
+            with override_settings(LOGIN_THROTTLE_RATES=blocked):
+                rejected = self.attempts(options['rejected'], 'victim@example.com')
+
+            stats = throttle_stats()
+            self.stdout.write(f"failed attempt (lookup + hash): {failed * 1000:.3f} ms CPU")
+            self.stdout.write(f"rejected attempt (throttled):   {rejected * 1000:.3f} ms CPU")
+            self.stdout.write(f"ratio: {failed / rejected:.0f}x  (allowed={stats['allowed']} blocked={stats['blocked']})")
@@ -0,0 +1,48 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from user_app.benchmarks import benchmark_database, summarize, timer
+from user_app.models import CustomUser
+from user_app.user_cache import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Load-test authenticated page views with and without the session user cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--views', type=int, default=2000,
+                            help="Total authenticated GET /home/ requests per run.")
+
+    def run(self, clients, views):
+        samples = []
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(views):
+                with timer(samples):
+                    clients[i % len(clients)].get('/home/')
+        return len(queries) / views, summarize(samples)
+
+    def handle(self, *args, **options):
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        with benchmark_database(), override_settings(PASSWORD_HASHERS=hashers):
+            clients = []
+            for i in range(options['users']):
+                user = CustomUser.objects.create_user(email=f'viewer{i}@example.com', password='x')
+                client = Client()
+                client.force_login(user)
+                clients.append(client)
+
+            for label, timeout in (('no cache', 0), ('cached', 300)):
+                caches['default'].clear()
+                reset_cache_stats()
+                with override_settings(USER_CACHE_TIMEOUT=timeout):
+                    per_view, stats = self.run(clients, options['views'])
+                counters = cache_stats()
+                lookups = counters['hits'] + counters['misses']
+                self.stdout.write(
+                    f"{label:<9} {per_view:.2f} queries/page view  p50={stats['p50_ms']:.2f}ms "
+                    f"p95={stats['p95_ms']:.2f}ms  hit ratio={counters['hits'] / lookups if lookups else 0:.1%}"
+                )
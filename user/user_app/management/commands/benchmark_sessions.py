@@ -0,0 +1,90 @@
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from user_app.benchmarks import benchmark_database, summarize, timer
+from user_app.models import CustomUser
+
+# (label, SESSION_ENGINE, SESSION_CACHED)
+ENGINES = (
+    ('db', 'django.contrib.sessions.backends.db', False),
+    ('write-avoiding', 'user_app.sessions', False),
+    ('cached write-avoiding', 'user_app.sessions', True),
+)
+PASSWORD = 'Benchmark-pass-1'
+PAGES = ('/home/', '/change_password/')
+
+
+class SessionQueries:
+    """
+    Execute wrapper counting reads and writes of django_session.
+    """
+    def __init__(self):
+        self.reads = self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql:
+            if sql.startswith('SELECT'):
+                self.reads += 1
+            elif not sql.startswith(('SAVEPOINT', 'RELEASE')):
+                self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Sign users in (remember me) and browse as each of them, once per session engine, and "
+        "report django_session reads and writes per 1k requests and login latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--views', type=int, default=9, help="Page views per user after logging in.")
+
+    def run(self, users):
+        logins, queries = [], SessionQueries()
+        requests = 0
+        with connection.execute_wrapper(queries):
+            for i in range(users):
+                client = Client()
+                with timer(logins):
+                    response = client.post('/login/', {
+                        'email': f'bench{i}@example.com', 'password': PASSWORD, 'remember_me': 'on',
+                    })
+                if response.status_code != 302:
+                    raise CommandError(f"login: expected HTTP 302, got {response.status_code}")
+                for view in range(self.views):
+                    client.get(PAGES[view % len(PAGES)])
+                requests += 1 + self.views
+        return requests, queries, summarize(logins)
+
+    def handle(self, *args, **options):
+        self.views = options['views']
+        users = options['users']
+        unlimited = {'ip': (10 ** 9, 300), 'email': (10 ** 9, 300)}
+        with benchmark_database(instrument_templates=False), override_settings(
+            LOGIN_THROTTLE_RATES=unlimited, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+        ):
+            encoded = make_password(PASSWORD)
+            CustomUser.objects.bulk_create(
+                CustomUser(email=f'bench{i}@example.com', password=encoded) for i in range(users)
+            )
+            self.stdout.write(
+                f"{'engine':<22} {'save every request':<19} {'reads/1k':>9} {'writes/1k':>10} "
+                f"{'login p50 ms':>13} {'login p95 ms':>13}"
+            )
+            for save_every_request in (False, True):
+                for label, engine, cached in ENGINES:
+                    caches['default'].clear()
+                    with override_settings(
+                        SESSION_ENGINE=engine, SESSION_CACHED=cached, SESSION_SAVE_EVERY_REQUEST=save_every_request,
+                    ):
+                        requests, queries, login = self.run(users)
+                    self.stdout.write(
+                        f"{label:<22} {'yes' if save_every_request else 'no':<19} "
+                        f"{queries.reads * 1000 / requests:>9.1f} {queries.writes * 1000 / requests:>10.1f} "
+                        f"{login['p50_ms']:>13.2f} {login['p95_ms']:>13.2f}"
+                    )
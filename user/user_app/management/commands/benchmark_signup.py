@@ -0,0 +1,83 @@
+import time
+
+from django.core.mail import send_mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from user_app.benchmarks import benchmark_database, registration_payload, summarize, timer
+from user_app.mail import dispatch_queued_mail
+
+
+class SlowEmailBackend(LocmemEmailBackend):
+    """
+    locmem backend that sleeps like a remote SMTP server would: ``latency``
+    for the connect/TLS handshake and a fifth of it per message.
+    """
+    latency = 0.0
+    connected = False
+
+    def open(self):
+        if self.connected:
+            return False
+        time.sleep(self.latency)
+        self.connected = True
+        return True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            time.sleep(self.latency / 5 * len(messages))
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
+
+
+class Command(BaseCommand):
+    help = "Show that register latency no longer depends on SMTP latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20,
+                            help="Registrations per SMTP latency setting.")
+        parser.add_argument('--smtp-latency', default='0,250,1000',
+                            help="Comma separated simulated SMTP handshake latencies in ms.")
+
+    def handle(self, *args, **options):
+        latencies = [int(ms) for ms in options['smtp_latency'].split(',')]
+        backend = f'{__name__}.SlowEmailBackend'
+        # The password hasher would otherwise dominate every sample.
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+        with benchmark_database(), override_settings(EMAIL_BACKEND=backend, PASSWORD_HASHERS=hashers):
+            client = Client()
+            offset = 0
+            for latency in latencies:
+                SlowEmailBackend.latency = latency / 1000
+
+                inline = []
+                for _ in range(min(options['requests'], 5)):
+                    with timer(inline):
+                        send_mail('Benchmark', 'body', None, ['inline@example.com'])
+
+                queued = []
+                for i in range(options['requests']):
+                    with timer(queued):
+                        client.post('/register/', registration_payload(offset + i))
+                offset += options['requests']
+
+                drain = []
+                with timer(drain):
+                    result = dispatch_queued_mail(batch_size=options['requests'])
+
+                inline_stats, queued_stats = summarize(inline), summarize(queued)
+                self.stdout.write(
+                    f"smtp={latency:>5}ms  "
+                    f"inline send_mail p50={inline_stats['p50_ms']:.1f}ms  "
+                    f"register p50={queued_stats['p50_ms']:.1f}ms p95={queued_stats['p95_ms']:.1f}ms  "
+                    f"dispatcher: {result['sent']} sent in {drain[0] * 1000:.1f}ms over one connection"
+                )
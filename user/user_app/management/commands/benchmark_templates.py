@@ -0,0 +1,50 @@
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from user_app.benchmarks import benchmark_database
+
+PAGES = ('/register/', '/login/')
+
+
+def templates_setting(cached_loader):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    loaders = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+    if cached_loader:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    templates[0]['OPTIONS']['loaders'] = loaders
+    return templates
+
+
+class Command(BaseCommand):
+    help = "Requests/sec for GET /register/ and /login/ with and without template and fragment caching."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+
+    def rate(self, client, path, count):
+        client.get(path)  # warm up
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get(path)
+        return count / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        runs = (
+            ('no caching', False, 0),
+            ('cached loader', True, 0),
+            ('cached loader + fragments', True, settings.REGISTER_FORM_CACHE_TIMEOUT),
+        )
+        with benchmark_database(instrument_templates=False):
+            client = Client()
+            for label, cached_loader, fragment_timeout in runs:
+                caches['default'].clear()
+                with override_settings(TEMPLATES=templates_setting(cached_loader),
+                                       REGISTER_FORM_CACHE_TIMEOUT=fragment_timeout):
+                    rates = '  '.join(f"{path} {self.rate(client, path, options['requests']):6.0f} req/s" for path in PAGES)
+                self.stdout.write(f"{label:<27} {rates}")
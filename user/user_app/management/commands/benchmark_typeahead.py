@@ -0,0 +1,82 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from user_app import reference
+from user_app.benchmarks import benchmark_database, summarize, timer
+from user_app.models import OFOOccupation
+
+WORDS = (
+    'agricultural', 'assistant', 'builder', 'chemical', 'clerk', 'community', 'designer', 'electrical',
+    'engineer', 'farm', 'field', 'finance', 'general', 'health', 'information', 'inspector', 'laboratory',
+    'machine', 'manager', 'mechanical', 'mining', 'nursing', 'officer', 'operator', 'plant', 'practitioner',
+    'production', 'quality', 'retail', 'safety', 'sales', 'school', 'services', 'software', 'supervisor',
+    'systems', 'technician', 'trade', 'transport', 'worker',
+)
+
+
+class Command(BaseCommand):
+    help = "Time typeahead lookups on the in-memory prefix index against a linear scan and a database query."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=20000,
+                            help="Synthetic OFO occupations to load.")
+        parser.add_argument('--queries', type=int, default=5000,
+                            help="Lookups measured per method.")
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        page_size = options['page_size']
+        with benchmark_database():
+            OFOOccupation.objects.bulk_create(
+                OFOOccupation(code=f'{i:06d}', name=' '.join(rng.sample(WORDS, 3)).title() + f' {i}')
+                for i in range(options['entries'])
+            )
+            reference.invalidate(OFOOccupation)
+            start = time.perf_counter()
+            table = reference.table(OFOOccupation)
+            loaded = time.perf_counter() - start
+            start = time.perf_counter()
+            table.prefix_index
+            indexed = time.perf_counter() - start
+            self.stdout.write(
+                f"{len(table.rows)} rows: load {loaded * 1000:.1f} ms, "
+                f"prefix index {indexed * 1000:.1f} ms ({len(table.prefix_index[0])} keys)"
+            )
+
+            queries = []
+            for _ in range(options['queries']):
+                word = rng.choice(WORDS)
+                queries.append(word[:rng.randint(2, len(word))])
+
+            words = [(row, reference.normalize(row.name).split(' ')) for row in table.rows]
+
+            def linear(query):
+                prefix = reference.normalize(query)
+                return [row for row, row_words in words if any(word.startswith(prefix) for word in row_words)]
+
+            def database(query):
+                return list(OFOOccupation.objects.filter(name__icontains=query).order_by('name')[:page_size])
+
+            client = Client()
+            methods = (
+                ('prefix index', lambda query: reference.search(OFOOccupation, query)[:page_size]),
+                ('linear scan', lambda query: linear(query)[:page_size]),
+                ('database icontains', database),
+                ('HTTP endpoint', lambda query: client.get('/api/reference/ofo-occupation/', {'q': query})),
+            )
+            for label, lookup in methods:
+                # The slow baselines don't need every query to make the point.
+                sample = queries if label == 'prefix index' else queries[:max(len(queries) // 20, 50)]
+                samples = []
+                for query in sample:
+                    with timer(samples):
+                        lookup(query)
+                result = summarize(samples)
+                self.stdout.write(
+                    f"{label:<20} n={result['count']:<6} mean {result['mean_ms']:8.3f} ms  "
+                    f"p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms"
+                )
@@ -0,0 +1,49 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from user_app.benchmarks import benchmark_database, create_learners, summarize, timer
+from user_app.models import CustomUser, LearnerProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the lean CustomUser row that authentication loads with the old "
+        "wide row (user joined to its learner profile): payload size and lookup time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--lookups', type=int, default=5000)
+
+    def payload_bytes(self, lookups):
+        """
+        Average bytes of column data per row, as the database returns them.
+        """
+        rows = list(CustomUser.objects.values_list(*lookups)[:1000])
+        return sum(len(str(value)) for row in rows for value in row if value is not None) / len(rows)
+
+    def lookup_times(self, queryset, pks):
+        samples = []
+        for pk in pks:
+            with timer(samples):
+                queryset.get(pk=pk)
+        return summarize(samples)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            create_learners(options['users'])
+            pks = random.Random(0).choices(list(CustomUser.objects.values_list('pk', flat=True)), k=options['lookups'])
+
+            user_columns = [field.attname for field in CustomUser._meta.concrete_fields]
+            profile_columns = [f'profile__{field.attname}' for field in LearnerProfile._meta.concrete_fields]
+            runs = (
+                ('before (user + learner columns)', CustomUser.objects.select_related('profile'), user_columns + profile_columns),
+                ('after (auth row only)', CustomUser.objects.all(), user_columns),
+            )
+            for label, queryset, columns in runs:
+                stats = self.lookup_times(queryset, pks)
+                self.stdout.write(
+                    f"{label:<32} {len(columns):3} columns {self.payload_bytes(columns):5.0f} bytes/row  "
+                    f"get(pk) p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms"
+                )
@@ -0,0 +1,53 @@
+import time
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from user_app.benchmarks import benchmark_database, registration_payload
+from user_app.forms import CustomUserCreationForm, registration_schema, validate_registration
+
+
+class StockValidationForm(CustomUserCreationForm):
+    """
+    The registration form validated the stock Django way, as it was before the
+    compiled schema: field.clean() through every BoundField, then
+    LearnerProfile.full_clean().
+    """
+    _clean_fields = forms.BaseForm._clean_fields
+
+    def _post_clean(self):
+        super()._post_clean()
+        exclude = ['user'] + [name for name in self.profile_fields if name not in self.cleaned_data]
+        try:
+            self.profile.full_clean(exclude=exclude, validate_unique=False)
+        except ValidationError as e:
+            self._update_errors(e)
+
+
+class Command(BaseCommand):
+    help = "Compare registration payload validations per second: stock form, compiled form, JSON API mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def rate(self, validate, payload, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            validate(payload)
+        return iterations / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        valid = registration_payload(1)
+        invalid = dict(valid, email='not-an-email', contact_number='12', province='atlantis', birth_date='2999-01-01')
+        runs = (
+            ('stock form', lambda data: StockValidationForm(data=data).is_valid()),
+            ('compiled form', lambda data: CustomUserCreationForm(data=data).is_valid()),
+            ('API mode (+ email query)', validate_registration),
+            ('schema only', registration_schema.clean),
+        )
+        with benchmark_database():
+            for label, validate in runs:
+                rates = [self.rate(validate, payload, iterations) for payload in (valid, invalid)]
+                self.stdout.write(f"{label:<26} valid: {rates[0]:8.0f}/s   invalid: {rates[1]:8.0f}/s")
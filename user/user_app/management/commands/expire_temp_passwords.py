@@ -0,0 +1,43 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user_app.temp_passwords import expire_temporary_passwords
+
+
+class Command(BaseCommand):
+    help = (
+        "Make temporary passwords that expired more than TEMP_PASSWORD_GRACE ago unusable, "
+        "in batches, optionally queueing a reminder email to each account."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.TEMP_PASSWORD_SWEEP_BATCH_SIZE,
+                            help="Accounts updated per transaction.")
+        parser.add_argument('--grace-hours', type=float, default=settings.TEMP_PASSWORD_GRACE / 3600,
+                            help="Hours past expiry before a temporary password stops working.")
+        parser.add_argument('--remind', action='store_true',
+                            help="Queue an email telling each account its temporary password expired.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(result):
+            if options['verbosity'] > 1:
+                rate = result['expired'] / (time.perf_counter() - started)
+                self.stdout.write(f"{result['expired']} expired ({rate:,.0f}/s)")
+
+        result = expire_temporary_passwords(
+            batch_size=options['batch_size'],
+            grace=datetime.timedelta(hours=options['grace_hours']),
+            remind=options['remind'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        rate = result['expired'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {result['expired']} temporary passwords and queued {result['reminded']} reminders "
+            f"in {elapsed:.1f} s ({rate:,.0f} accounts/s)."
+        ))
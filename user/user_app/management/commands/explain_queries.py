@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user_app.queries import CANONICAL_QUERIES, explain
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the app's canonical queries and flag the ones that scan a whole table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print the full plan for every query, not only the flagged ones.")
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help="Exit with an error if any query needs a full table scan (for CI).")
+
+    def handle(self, *args, **options):
+        flagged = []
+        for query in CANONICAL_QUERIES:
+            plan, full_scan = explain(query)
+            if full_scan and not query.allow_scan:
+                flagged.append(query.name)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {query.name}"))
+            elif full_scan:
+                self.stdout.write(self.style.WARNING(f"scan (ok)  {query.name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"index      {query.name}"))
+            if options['verbose_plans'] or (full_scan and not query.allow_scan):
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if flagged and options['fail_on_scan']:
+            raise CommandError(f"{len(flagged)} canonical quer{'y' if len(flagged) == 1 else 'ies'} without a usable index: {', '.join(flagged)}")
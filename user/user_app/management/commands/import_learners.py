@@ -0,0 +1,66 @@
+import csv
+import datetime
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user_app.importers import import_learners, read_learner_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create learners from a CSV or XLSX file whose header row uses the "
+        "registration form field names. Each learner gets a temporary password "
+        "that is emailed through the outbox."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to a .csv or .xlsx file.")
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Rows validated and inserted per bulk_create.")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Threads used to hash temporary passwords.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate every row but do not create any users.")
+        parser.add_argument('--errors', metavar='PATH',
+                            help="Write the row-level error report to this CSV file instead of stderr.")
+        parser.add_argument('--no-email', action='store_true',
+                            help="Do not queue temporary password emails.")
+        parser.add_argument('--password-ttl-hours', type=int, default=24,
+                            help="Hours before the temporary passwords expire.")
+
+    def handle(self, *args, **options):
+        try:
+            rows = read_learner_rows(options['path'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        report = open(options['errors'], 'w', newline='') if options['errors'] else sys.stderr
+        writer = csv.writer(report)
+        writer.writerow(['row', 'field', 'error'])
+
+        start = time.perf_counter()
+        try:
+            stats = import_learners(
+                rows,
+                error_writer=lambda row, field, message: writer.writerow([row, field, message]),
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+                send_emails=not options['no_email'],
+                password_ttl=datetime.timedelta(hours=options['password_ttl_hours']),
+            )
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        finally:
+            if report is not sys.stderr:
+                report.close()
+        elapsed = time.perf_counter() - start
+
+        verb = "validated (dry run)" if options['dry_run'] else "created"
+        accepted = stats['rows'] - stats['rejected'] if options['dry_run'] else stats['created']
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['rows']} rows read, {accepted} {verb}, {stats['rejected']} rejected "
+            f"in {elapsed:.1f}s ({stats['rows'] / elapsed if elapsed else 0:.0f} rows/sec)."
+        ))
@@ -0,0 +1,74 @@
+import glob
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from user_app.benchmarks import percentile
+
+
+def log_files(path):
+    """
+    The log and its rotated backups (profile.jsonl.1, .2, ...).
+    """
+    return [path] + sorted(glob.glob(f'{glob.escape(path)}.[0-9]*'))
+
+
+class Command(BaseCommand):
+    help = "Aggregate the request profiling log into the slowest endpoints and functions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help="Log to read (default: REQUEST_PROFILING_LOG and its backups).")
+        parser.add_argument('--top', type=int, default=10, help="Rows to show in each table.")
+
+    def read(self, paths):
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            try:
+                                yield json.loads(line)
+                            except ValueError:
+                                continue
+            except FileNotFoundError:
+                continue
+
+    def handle(self, *args, **options):
+        paths = [options['log']] if options['log'] else log_files(settings.REQUEST_PROFILING_LOG)
+        endpoints = defaultdict(list)
+        functions = defaultdict(lambda: {'calls': 0, 'own_ms': 0.0, 'requests': 0})
+        for record in self.read(paths):
+            endpoints[(record['method'], record['view'] or record['path'])].append(record)
+            for entry in record.get('functions', []):
+                total = functions[entry['function']]
+                total['calls'] += entry['calls']
+                total['own_ms'] += entry['own_ms']
+                total['requests'] += 1
+        if not endpoints:
+            raise CommandError(f"No profile records in {', '.join(paths)}")
+
+        rows = []
+        for (method, view), records in endpoints.items():
+            totals = sorted(record['total_ms'] for record in records)
+            rows.append((
+                percentile(totals, 95), method, view, len(records), percentile(totals, 50),
+                sum(record['sql_count'] for record in records) / len(records),
+                sum(record['sql_ms'] for record in records) / len(records),
+                sum(record['template_ms'] for record in records) / len(records),
+            ))
+        self.stdout.write("Slowest endpoints (by p95):")
+        self.stdout.write(f"  {'endpoint':<32} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'sql ms':>8} {'tpl ms':>8}")
+        for p95, method, view, count, p50, queries, sql_ms, template_ms in sorted(rows, reverse=True)[:options['top']]:
+            self.stdout.write(
+                f"  {method + ' ' + view:<32} {count:>8} {p50:>8.1f} {p95:>8.1f} {queries:>8.1f} {sql_ms:>8.1f} {template_ms:>8.1f}"
+            )
+
+        self.stdout.write("\nFunctions with the most own time (summed over all profiled requests):")
+        ranked = sorted(functions.items(), key=lambda item: item[1]['own_ms'], reverse=True)[:options['top']]
+        for function, total in ranked:
+            self.stdout.write(
+                f"  {total['own_ms']:>10.1f} ms {total['calls']:>9} calls {total['requests']:>6} requests  {function}"
+            )
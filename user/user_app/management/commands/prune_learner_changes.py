@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_app.changes import prune
+
+
+class Command(BaseCommand):
+    help = "Delete the learner change journal entries every export checkpoint has passed, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help="Journal entries deleted per statement.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(deleted):
+            if options['verbosity'] > 1:
+                rate = deleted / (time.perf_counter() - started)
+                self.stdout.write(f"{deleted} deleted ({rate:,.0f}/s)")
+
+        deleted = prune(batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} journal entries in {elapsed:.1f} s ({rate:,.0f} entries/s)."
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user_app.sessions import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions from the database in batches, oldest first; run daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SESSION_PURGE_BATCH_SIZE,
+                            help="Sessions deleted per statement.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(deleted):
+            if options['verbosity'] > 1:
+                rate = deleted / (time.perf_counter() - started)
+                self.stdout.write(f"{deleted} deleted ({rate:,.0f}/s)")
+
+        deleted = purge_expired(batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired sessions in {elapsed:.1f} s ({rate:,.0f} sessions/s)."
+        ))
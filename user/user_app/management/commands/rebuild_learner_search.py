@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from user_app import search
+from user_app.models import LearnerSearch
+
+
+class Command(BaseCommand):
+    help = "Rebuild the staff learner search index from CustomUser and LearnerProfile."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(f"Indexed {LearnerSearch.objects.count()} users.")
@@ -0,0 +1,42 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_app import changes, derived
+from user_app.models import LearnerProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring every learner's age and youth status up to date; run nightly. "
+        "With --id-numbers, also recompute the fields derived from ID numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help="Profiles per UPDATE statement.")
+        parser.add_argument('--date', type=datetime.date.fromisoformat, default=None,
+                            help="Compute ages on this date (YYYY-MM-DD) instead of today.")
+        parser.add_argument('--id-numbers', action='store_true',
+                            help="Also reparse ID numbers, for rows written without save().")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(last_pk, updated):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"up to pk {last_pk}: {updated} updated")
+
+        def record(user_ids):
+            changes.record(user_ids, changes.UPDATED)
+
+        if options['id_numbers']:
+            updated = derived.recompute_id_fields(LearnerProfile, chunk_size=options['chunk_size'], record=record)
+            self.stdout.write(f"Updated the ID fields of {updated} profiles.")
+        updated = derived.recompute_ages(
+            LearnerProfile, today=options['date'], chunk_size=options['chunk_size'], progress=progress,
+            record=record,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Updated the age of {updated} profiles in {elapsed:.1f} s."))
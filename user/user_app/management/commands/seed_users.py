@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from user_app.seeding import seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert N synthetic learners that pass the registration form's validation, for load testing. "
+        "The same --seed and --chunk-size always produce the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, required=True)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--start', type=int, default=0,
+                            help="Index of the first row, to add to an earlier run with the same seed.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Processes generating rows while this one inserts them.")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Rows per generated chunk and per transaction.")
+        parser.add_argument('--password', default='seeded-password',
+                            help="Password of every seeded user; hashed once.")
+        parser.add_argument('--defer-indexes', action='store_true',
+                            help="Drop the secondary indexes and search triggers and rebuild them at the end "
+                                 "instead of maintaining them row by row; only allowed on an empty database.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(inserted):
+            if options['verbosity'] > 1:
+                rate = inserted / (time.perf_counter() - started)
+                self.stdout.write(f"{inserted} rows ({rate:,.0f}/s)")
+
+        try:
+            inserted = seed_users(
+                options['count'], seed=options['seed'], start=options['start'], chunk_size=options['chunk_size'],
+                workers=options['workers'], password=options['password'],
+                defer_indexes=options['defer_indexes'], progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        except IntegrityError as e:
+            raise CommandError(f"{e}. Rows from this seed are already there; continue with --start.")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {inserted} users in {elapsed:.1f} s ({inserted / elapsed:,.0f} rows/s)."
+        ))
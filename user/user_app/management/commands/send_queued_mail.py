@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from user_app.mail import dispatch_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound emails in batches over a reused SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_QUEUE_BATCH_SIZE,
+                            help="Messages sent per SMTP connection.")
+        parser.add_argument('--max-attempts', type=int, default=settings.EMAIL_QUEUE_MAX_ATTEMPTS,
+                            help="Attempts before a message is marked as failed.")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep running and poll the outbox instead of exiting once it is empty.")
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help="Seconds to sleep between polls when the outbox is empty (with --loop).")
+
+    def handle(self, *args, **options):
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        while True:
+            result = dispatch_queued_mail(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            for key, value in result.items():
+                totals[key] += value
+            if any(result.values()):
+                self.stdout.write(f"sent={result['sent']} retried={result['retried']} failed={result['failed']}")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['sent']} sent, {totals['retried']} rescheduled, {totals['failed']} failed."
+        ))
@@ -0,0 +1,67 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from user_app.benchmarks import benchmark_database, registration_payload
+from user_app.sqlite import lock_stats, reset_lock_stats
+
+# (label, settings): Django's SQLite defaults, then the tuning layer.
+MODES = (
+    ('stock', {'SQLITE_PRAGMAS': {}, 'SQLITE_LOCK_RETRIES': 0}),
+    ('tuned', {}),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Register learners from concurrent threads against a SQLite file, with Django's defaults "
+        "and with the WAL/pragma/retry layer, and report registrations/sec and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=32, help="Threads registering at once.")
+        parser.add_argument('--registrations', type=int, default=20, help="Registrations per writer.")
+
+    def register(self, writer, count):
+        client = Client()
+        outcomes = Counter()
+        try:
+            for n in range(count):
+                try:
+                    response = client.post('/register/', registration_payload(writer * count + n))
+                    outcomes['ok' if response.status_code == 302 else f'HTTP {response.status_code}'] += 1
+                except Exception as e:
+                    outcomes[str(e)] += 1
+        finally:
+            connection.close()
+        return outcomes
+
+    def handle(self, *args, **options):
+        writers, count = options['writers'], options['registrations']
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        for label, overrides in MODES:
+            with override_settings(PASSWORD_HASHERS=hashers, **overrides), \
+                    benchmark_database(instrument_templates=False, on_disk=True):
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal_mode = cursor.fetchone()[0]
+                reset_lock_stats()
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=writers) as pool:
+                    outcomes = sum(pool.map(self.register, range(writers), [count] * writers), Counter())
+                elapsed = time.perf_counter() - started
+                stats = lock_stats()
+            ok = outcomes.pop('ok', 0)
+            self.stdout.write(
+                f"{label:<6} journal={journal_mode:<7} {ok / elapsed:7.1f} registrations/s  "
+                f"{ok}/{writers * count} ok  {stats['retries']} retries"
+            )
+            for error, times in outcomes.most_common():
+                self.stdout.write(f"    {times} x {error}")
+        self.stdout.write(f"pragmas: {settings.SQLITE_PRAGMAS}")
@@ -0,0 +1,94 @@
+# Generated by Django 5.0.3 on 2026-10-18 20:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0005_customuser_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearnerProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('contact_number', models.CharField(blank=True, max_length=10, null=True)),
+                ('birth_date', models.DateField(blank=True, null=True)),
+                ('id_or_passport', models.CharField(blank=True, max_length=13, null=True)),
+                ('id_type', models.CharField(blank=True, max_length=20, null=True)),
+                ('age', models.IntegerField(blank=True, null=True)),
+                ('title', models.CharField(blank=True, max_length=5, null=True)),
+                ('youth', models.CharField(blank=True, max_length=3, null=True)),
+                ('gender', models.CharField(blank=True, max_length=50, null=True)),
+                ('race', models.CharField(blank=True, max_length=50, null=True)),
+                ('disability', models.CharField(blank=True, max_length=50, null=True)),
+                ('home_language', models.CharField(blank=True, max_length=50, null=True)),
+                ('citezenship', models.CharField(blank=True, max_length=50, null=True)),
+                ('nationality', models.CharField(blank=True, max_length=50, null=True)),
+                ('employment_status', models.CharField(blank=True, max_length=100, null=True)),
+                ('unemployed_period', models.CharField(blank=True, max_length=100, null=True)),
+                ('home_address', models.CharField(blank=True, max_length=100, null=True)),
+                ('postal_address', models.CharField(blank=True, max_length=100, null=True)),
+                ('postal_code', models.CharField(blank=True, max_length=10, null=True)),
+                ('contract_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('contracted_learning_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('learner_enrollment_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('learning_programe_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('subcategory', models.CharField(blank=True, max_length=100, null=True)),
+                ('intervention', models.CharField(blank=True, max_length=100, null=True)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('guardian_id_no', models.CharField(blank=True, max_length=13, null=True)),
+                ('guardian_full_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('guardian_contact', models.CharField(blank=True, max_length=10, null=True)),
+                ('province', models.CharField(blank=True, max_length=50, null=True)),
+                ('municipality', models.CharField(blank=True, max_length=50, null=True)),
+                ('town_or_city', models.CharField(blank=True, max_length=50, null=True)),
+                ('urban_or_rural', models.CharField(blank=True, max_length=50, null=True)),
+                ('occupation_level', models.CharField(blank=True, max_length=1000, null=True)),
+                ('job_title', models.CharField(blank=True, max_length=50, null=True)),
+                ('OFO_occupation_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('OFO_specialization', models.CharField(blank=True, max_length=50, null=True)),
+                ('OFO_occupation', models.CharField(blank=True, max_length=50, null=True)),
+                ('highest_school_qualification', models.CharField(blank=True, max_length=50, null=True)),
+                ('highest_qualification', models.CharField(blank=True, max_length=50, null=True)),
+                ('student_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('bursary_awarded_date', models.DateField(blank=True, null=True)),
+                ('bursary_completion_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('popi_consent', models.CharField(blank=True, max_length=10, null=True)),
+                ('popi_consent_date', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['province', 'municipality'], name='profile_province_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['employment_status', 'province'], name='profile_employment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['learning_programe_name', 'intervention'], name='profile_programme_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['intervention'], name='profile_intervention_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['start_date', 'end_date'], name='profile_programme_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['end_date'], name='profile_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(condition=models.Q(('popi_consent', 'agree')), fields=['popi_consent_date'], name='profile_popi_agreed_idx'),
+        ),
+    ]
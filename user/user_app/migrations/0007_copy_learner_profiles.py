@@ -0,0 +1,61 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+LEARNER_FIELDS = [
+    'contact_number', 'birth_date', 'id_or_passport', 'id_type', 'age', 'title', 'youth',
+    'gender', 'race', 'disability', 'home_language', 'citezenship', 'nationality',
+    'employment_status', 'unemployed_period', 'home_address', 'postal_address', 'postal_code',
+    'contract_number', 'contracted_learning_status', 'learner_enrollment_number',
+    'learning_programe_name', 'subcategory', 'intervention', 'start_date', 'end_date',
+    'guardian_id_no', 'guardian_full_name', 'guardian_contact', 'province', 'municipality',
+    'town_or_city', 'urban_or_rural', 'occupation_level', 'job_title', 'OFO_occupation_code',
+    'OFO_specialization', 'OFO_occupation', 'highest_school_qualification',
+    'highest_qualification', 'student_number', 'bursary_awarded_date',
+    'bursary_completion_status', 'popi_consent', 'popi_consent_date',
+]
+
+
+def _batches(queryset, fields):
+    """
+    Yield lists of value dicts ordered by pk, BATCH_SIZE rows at a time,
+    using keyset pagination so each batch is an index range scan.
+    """
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').values(*fields)[:BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1]['pk']
+        yield batch
+
+
+def copy_to_profiles(apps, schema_editor):
+    CustomUser = apps.get_model('user_app', 'CustomUser')
+    LearnerProfile = apps.get_model('user_app', 'LearnerProfile')
+    for batch in _batches(CustomUser.objects.all(), ['pk'] + LEARNER_FIELDS):
+        LearnerProfile.objects.bulk_create([
+            LearnerProfile(user_id=row.pop('pk'), **row) for row in batch
+        ])
+
+
+def copy_from_profiles(apps, schema_editor):
+    CustomUser = apps.get_model('user_app', 'CustomUser')
+    LearnerProfile = apps.get_model('user_app', 'LearnerProfile')
+    for batch in _batches(LearnerProfile.objects.all(), ['pk'] + LEARNER_FIELDS):
+        CustomUser.objects.bulk_update(
+            [CustomUser(pk=row.pop('pk'), **row) for row in batch],
+            LEARNER_FIELDS,
+        )
+    LearnerProfile.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0006_learnerprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_to_profiles, copy_from_profiles),
+    ]
@@ -0,0 +1,221 @@
+# Generated by Django 5.0.3 on 2026-10-18 20:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0007_copy_learner_profiles'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_province_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_employment_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_programme_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_intervention_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_programme_dates_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_end_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_popi_agreed_idx',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OFO_occupation',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OFO_occupation_code',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='OFO_specialization',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='age',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='birth_date',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='bursary_awarded_date',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='bursary_completion_status',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='citezenship',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='contact_number',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='contract_number',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='contracted_learning_status',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='disability',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='employment_status',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='end_date',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='gender',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='guardian_contact',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='guardian_full_name',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='guardian_id_no',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='highest_qualification',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='highest_school_qualification',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='home_address',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='home_language',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='id_or_passport',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='id_type',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='intervention',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='job_title',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='learner_enrollment_number',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='learning_programe_name',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='municipality',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='nationality',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='occupation_level',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='popi_consent',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='popi_consent_date',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='postal_address',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='postal_code',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='province',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='race',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='start_date',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='student_number',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='subcategory',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='title',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='town_or_city',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='unemployed_period',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='urban_or_rural',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='youth',
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0008_remove_customuser_learner_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Province',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=150, unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Municipality',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=150, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('province', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='municipalities', to='user_app.province')),
+            ],
+            options={
+                'verbose_name_plural': 'municipalities',
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Nationality',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=150, unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'verbose_name_plural': 'nationalities',
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OccupationLevel',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=150, unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Qualification',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=150, unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OFOOccupation',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=150, unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'verbose_name': 'OFO occupation',
+                'ordering': ['name'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='nationality_ref',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='user_app.nationality'),
+        ),
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='province_ref',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='user_app.province'),
+        ),
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='municipality_ref',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='user_app.municipality'),
+        ),
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='occupation_level_ref',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='user_app.occupationlevel'),
+        ),
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='highest_qualification_ref',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='user_app.qualification'),
+        ),
+    ]
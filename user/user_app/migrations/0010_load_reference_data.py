@@ -0,0 +1,83 @@
+import json
+import os
+
+from django.core.management.color import no_style
+from django.db import migrations
+
+FIXTURE = os.path.join(os.path.dirname(__file__), os.pardir, 'fixtures', 'reference_data.json')
+
+# LearnerProfile text column -> (reference model, temporary key column).
+REFERENCE_FIELDS = {
+    'nationality': ('Nationality', 'nationality_ref'),
+    'province': ('Province', 'province_ref'),
+    'municipality': ('Municipality', 'municipality_ref'),
+    'occupation_level': ('OccupationLevel', 'occupation_level_ref'),
+    'highest_qualification': ('Qualification', 'highest_qualification_ref'),
+}
+
+
+def load_fixture(apps, schema_editor):
+    with open(FIXTURE, encoding='utf-8') as f:
+        entries = json.load(f)
+    rows = {}
+    for entry in entries:
+        Model = apps.get_model(entry['model'])
+        fields = dict(entry['fields'])
+        if 'province' in fields:
+            fields['province_id'] = fields.pop('province')
+        rows.setdefault(Model, []).append(Model(pk=entry['pk'], **fields))
+    # In fixture order, so provinces exist before their municipalities.
+    models = list(rows)
+    for Model in models:
+        Model.objects.bulk_create(rows[Model], ignore_conflicts=True)
+    # The fixture sets primary keys explicitly; move the sequences past them.
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def to_reference_keys(apps, schema_editor):
+    load_fixture(apps, schema_editor)
+    LearnerProfile = apps.get_model('user_app', 'LearnerProfile')
+    for field, (model_name, key_field) in REFERENCE_FIELDS.items():
+        Model = apps.get_model('user_app', model_name)
+        ids = dict(Model.objects.values_list('code', 'pk'))
+        values = LearnerProfile.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        for value in values.values_list(field, flat=True).distinct():
+            if value not in ids:
+                # Keep values that aren't in the fixture rather than lose them.
+                ids[value] = Model.objects.create(code=value[:150], name=value).pk
+            LearnerProfile.objects.filter(**{field: value}).update(**{key_field: ids[value]})
+
+    # Seed the OFO catalogue with the codes learners have entered so far.
+    OFOOccupation = apps.get_model('user_app', 'OFOOccupation')
+    known = set(OFOOccupation.objects.values_list('code', flat=True))
+    entered = (
+        LearnerProfile.objects.exclude(OFO_occupation_code__isnull=True).exclude(OFO_occupation_code='')
+        .values_list('OFO_occupation_code', 'OFO_occupation').distinct()
+    )
+    new = {}
+    for code, occupation in entered:
+        if code not in known:
+            new.setdefault(code, occupation or code)
+    OFOOccupation.objects.bulk_create([OFOOccupation(code=code, name=name) for code, name in new.items()])
+
+
+def to_text_values(apps, schema_editor):
+    LearnerProfile = apps.get_model('user_app', 'LearnerProfile')
+    for field, (model_name, key_field) in REFERENCE_FIELDS.items():
+        Model = apps.get_model('user_app', model_name)
+        for pk, code in Model.objects.values_list('pk', 'code'):
+            LearnerProfile.objects.filter(**{f'{key_field}_id': pk}).update(**{field: code})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0009_reference_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_reference_keys, to_text_values),
+    ]
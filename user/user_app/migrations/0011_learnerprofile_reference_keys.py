@@ -0,0 +1,74 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0010_load_reference_data'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='learnerprofile',
+            name='profile_province_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='learnerprofile',
+            name='profile_employment_idx',
+        ),
+        migrations.RemoveField(
+            model_name='learnerprofile',
+            name='nationality',
+        ),
+        migrations.RenameField(
+            model_name='learnerprofile',
+            old_name='nationality_ref',
+            new_name='nationality',
+        ),
+        migrations.RemoveField(
+            model_name='learnerprofile',
+            name='province',
+        ),
+        migrations.RenameField(
+            model_name='learnerprofile',
+            old_name='province_ref',
+            new_name='province',
+        ),
+        migrations.RemoveField(
+            model_name='learnerprofile',
+            name='municipality',
+        ),
+        migrations.RenameField(
+            model_name='learnerprofile',
+            old_name='municipality_ref',
+            new_name='municipality',
+        ),
+        migrations.RemoveField(
+            model_name='learnerprofile',
+            name='occupation_level',
+        ),
+        migrations.RenameField(
+            model_name='learnerprofile',
+            old_name='occupation_level_ref',
+            new_name='occupation_level',
+        ),
+        migrations.RemoveField(
+            model_name='learnerprofile',
+            name='highest_qualification',
+        ),
+        migrations.RenameField(
+            model_name='learnerprofile',
+            old_name='highest_qualification_ref',
+            new_name='highest_qualification',
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['province', 'municipality'], name='profile_province_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['employment_status', 'province'], name='profile_employment_idx'),
+        ),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.0.3 on 2026-10-18 20:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    # External-content FTS5 index over user_app_learnersearch: the text
+    # lives in the table, the index only holds tokens. Prefix indexes make
+    # 2- and 3-character prefix queries (typing) cheap. '@' and '.' are part
+    # of words so an email address is one token: searching for one doesn't
+    # intersect every row containing "example" and "com".
+    """
+    CREATE VIRTUAL TABLE user_app_learnersearch_fts USING fts5(
+        name, email, identifiers,
+        content='user_app_learnersearch', content_rowid='user_id',
+        tokenize="unicode61 remove_diacritics 2 tokenchars '@.'", prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER user_app_learnersearch_ai AFTER INSERT ON user_app_learnersearch BEGIN
+        INSERT INTO user_app_learnersearch_fts (rowid, name, email, identifiers)
+        VALUES (new.user_id, new.name, new.email, new.identifiers);
+    END
+    """,
+    """
+    CREATE TRIGGER user_app_learnersearch_ad AFTER DELETE ON user_app_learnersearch BEGIN
+        INSERT INTO user_app_learnersearch_fts (user_app_learnersearch_fts, rowid, name, email, identifiers)
+        VALUES ('delete', old.user_id, old.name, old.email, old.identifiers);
+    END
+    """,
+    """
+    CREATE TRIGGER user_app_learnersearch_au AFTER UPDATE ON user_app_learnersearch BEGIN
+        INSERT INTO user_app_learnersearch_fts (user_app_learnersearch_fts, rowid, name, email, identifiers)
+        VALUES ('delete', old.user_id, old.name, old.email, old.identifiers);
+        INSERT INTO user_app_learnersearch_fts (rowid, name, email, identifiers)
+        VALUES (new.user_id, new.name, new.email, new.identifiers);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS user_app_learnersearch_au',
+    'DROP TRIGGER IF EXISTS user_app_learnersearch_ad',
+    'DROP TRIGGER IF EXISTS user_app_learnersearch_ai',
+    'DROP TABLE IF EXISTS user_app_learnersearch_fts',
+]
+
+POSTGRESQL_INDEX = [
+    # Names and identifiers weigh more than the email address.
+    'ALTER TABLE user_app_learnersearch ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION user_app_learnersearch_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(NEW.identifiers, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(NEW.email, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER user_app_learnersearch_vector BEFORE INSERT OR UPDATE ON user_app_learnersearch
+    FOR EACH ROW EXECUTE FUNCTION user_app_learnersearch_vector()
+    """,
+    'CREATE INDEX user_app_learnersearch_vector_idx ON user_app_learnersearch USING gin (search_vector)',
+]
+
+POSTGRESQL_DROP = [
+    'DROP TRIGGER IF EXISTS user_app_learnersearch_vector ON user_app_learnersearch',
+    'DROP FUNCTION IF EXISTS user_app_learnersearch_vector()',
+    'ALTER TABLE user_app_learnersearch DROP COLUMN IF EXISTS search_vector',
+]
+
+# One statement for every existing user; COALESCE and || work the same on
+# both backends.
+BACKFILL = """
+    INSERT INTO user_app_learnersearch (user_id, name, email, identifiers)
+    SELECT u.id,
+           TRIM(COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, '')),
+           u.email,
+           TRIM(COALESCE(p.id_or_passport, '') || ' ' || COALESCE(p.student_number, '')
+                || ' ' || COALESCE(p.learner_enrollment_number, ''))
+    FROM user_app_customuser u
+    LEFT JOIN user_app_learnerprofile p ON p.user_id = u.id
+"""
+
+
+def create_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX}.get(schema_editor.connection.vendor, [])
+    for sql in statements + [BACKFILL]:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0011_learnerprofile_reference_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearnerSearch',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('name', models.TextField(blank=True)),
+                ('email', models.TextField(blank=True)),
+                ('identifiers', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
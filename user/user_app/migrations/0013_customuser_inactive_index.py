@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_app', '0012_learner_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['email'], name='user_inactive_email_idx'),
+        ),
+    ]
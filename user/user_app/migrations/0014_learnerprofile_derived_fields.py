@@ -0,0 +1,44 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:14
+
+from django.db import migrations, models
+
+from user_app import derived
+
+
+def derive_fields(apps, schema_editor):
+    # Also corrects ages entered by hand and since gone stale.
+    derived.recompute_id_fields(apps.get_model('user_app', 'LearnerProfile'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0013_customuser_inactive_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='id_citizen',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='id_gender',
+            field=models.CharField(blank=True, editable=False, max_length=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='learnerprofile',
+            name='id_number_valid',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['youth', 'province'], name='profile_youth_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learnerprofile',
+            index=models.Index(fields=['age'], name='profile_age_idx'),
+        ),
+        migrations.RunPython(derive_fields, migrations.RunPython.noop),
+    ]
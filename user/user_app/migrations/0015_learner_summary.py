@@ -0,0 +1,42 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+def build_summary(apps, schema_editor):
+    from user_app.reporting import DIMENSIONS, summary_rows
+
+    LearnerProfile = apps.get_model('user_app', 'LearnerProfile')
+    LearnerSummary = apps.get_model('user_app', 'LearnerSummary')
+    LearnerSummary.objects.bulk_create([
+        LearnerSummary(learners=learners, **dict(zip(DIMENSIONS, key)))
+        for key, learners in summary_rows(LearnerProfile.objects.all())
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0014_learnerprofile_derived_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearnerSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('province', models.CharField(blank=True, max_length=50)),
+                ('race', models.CharField(blank=True, max_length=50)),
+                ('gender', models.CharField(blank=True, max_length=50)),
+                ('disability', models.CharField(blank=True, max_length=50)),
+                ('employment_status', models.CharField(blank=True, max_length=100)),
+                ('programme', models.CharField(blank=True, max_length=100)),
+                ('learners', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='learnersummary',
+            constraint=models.UniqueConstraint(fields=('province', 'race', 'gender', 'disability', 'employment_status', 'programme'), name='learner_summary_key'),
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_app', '0015_learner_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('must_change_password', True), ('temporary_password_expires__isnull', False)), fields=['temporary_password_expires'], name='user_temp_password_idx'),
+        ),
+    ]
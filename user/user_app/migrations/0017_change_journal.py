@@ -0,0 +1,51 @@
+# Generated by Django 5.0.3 on 2026-10-18 23:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0016_customuser_temp_password_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        # Existing users were created when they joined; nothing has recorded
+        # a change since.
+        migrations.RunSQL(
+            'UPDATE user_app_customuser SET created_at = date_joined, updated_at = date_joined',
+            migrations.RunSQL.noop,
+        ),
+        migrations.CreateModel(
+            name='LearnerChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('inserted', 'Inserted'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=8)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(blank=True, null=True)),
+                ('target', models.BigIntegerField(blank=True, null=True)),
+                ('resume_after', models.BigIntegerField(blank=True, null=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from . import derived
 from .managers import CustomUserManager
 
 class CustomUser(AbstractUser):
@@ -12,6 +15,118 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
     
+    must_change_password = models.BooleanField(default=True)
+    temporary_password_expires = models.DateTimeField(null=True, blank=True)
+    # Set by save(); code that changes users with QuerySet.update() sets
+    # updated_at itself.
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    
+    objects = CustomUserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # The admin changelist's "inactive" filter, in its email order.
+            # Django writes is_active=False as NOT is_active, which only a
+            # partial index with the same condition can serve; the active
+            # filter matches most rows and reads the email index.
+            models.Index(fields=['email'], condition=models.Q(is_active=False), name='user_inactive_email_idx'),
+            # Outstanding temporary passwords, oldest expiry first, for
+            # expire_temp_passwords; the sweeper clears the expiry, which
+            # takes the row out again. must_change_password is in the
+            # condition rather than the key: it is written as a bare column
+            # test, which SQLite can't seek an index on.
+            models.Index(
+                fields=['temporary_password_expires'],
+                condition=models.Q(must_change_password=True, temporary_password_expires__isnull=False),
+                name='user_temp_password_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.email}"
+
+    def save(self, *args, **kwargs):
+        # A password set on an existing user (the admin's password form,
+        # `manage.py changepassword`, ...) replaces any temporary one: keep
+        # expire_temp_passwords away from it. New users are created with
+        # their temporary password this way, so they keep theirs.
+        if self._password is not None and not self._state.adding:
+            self.must_change_password = False
+            self.temporary_password_expires = None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {
+                    *kwargs['update_fields'], 'must_change_password', 'temporary_password_expires',
+                }
+        super().save(*args, **kwargs)
+
+
+class ReferenceData(models.Model):
+    """
+    A row of a reference list (provinces, municipalities, ...). Learner
+    profiles store the small integer key; ``code`` is the value forms and
+    exports use. The lists are loaded from fixtures/reference_data.json and
+    served from memory by user_app/reference.py.
+    """
+    id = models.SmallAutoField(primary_key=True)
+    code = models.CharField(max_length=150, unique=True)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        abstract = True
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class Province(ReferenceData):
+    pass
+
+
+class Municipality(ReferenceData):
+    province = models.ForeignKey(Province, null=True, blank=True, on_delete=models.PROTECT, related_name='municipalities')
+
+    class Meta(ReferenceData.Meta):
+        verbose_name_plural = 'municipalities'
+
+
+class Nationality(ReferenceData):
+
+    class Meta(ReferenceData.Meta):
+        verbose_name_plural = 'nationalities'
+
+
+class OccupationLevel(ReferenceData):
+    pass
+
+
+class Qualification(ReferenceData):
+    pass
+
+
+class OFOOccupation(ReferenceData):
+    """
+    The Organising Framework for Occupations catalogue; ``code`` is the OFO
+    code. Profiles keep the code and occupation the learner typed, so this
+    is for lookups only.
+    """
+    class Meta(ReferenceData.Meta):
+        verbose_name = 'OFO occupation'
+
+
+class LearnerProfile(models.Model):
+    """
+    Learner and demographic data, kept out of the CustomUser row so that
+    authentication (which loads request.user on every request) only reads
+    the auth columns. Access it on demand through ``user.profile``.
+
+    The reference-data keys are not indexed one by one: the reports filter
+    through the composite indexes below, and deleting a reference row (the
+    only other lookup by key) is rare.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='profile')
     contact_number = models.CharField(max_length=10, null=True, blank=True)
     birth_date = models.DateField(null=True, blank=True)
     id_or_passport = models.CharField(max_length=13, null=True, blank=True)
@@ -24,7 +139,7 @@ class CustomUser(AbstractUser):
     disability = models.CharField(max_length=50, null=True, blank=True)
     home_language = models.CharField(max_length=50, null=True, blank=True)
     citezenship = models.CharField(max_length=50, null=True, blank=True)
-    nationality = models.CharField(max_length=50, null=True, blank=True)
+    nationality = models.ForeignKey(Nationality, null=True, blank=True, on_delete=models.PROTECT, related_name='+', db_index=False)
     employment_status = models.CharField(max_length=100, null=True, blank=True)
     unemployed_period = models.CharField(max_length=100, null=True, blank=True)
     home_address = models.CharField(max_length=100, null=True, blank=True)
@@ -41,27 +156,171 @@ class CustomUser(AbstractUser):
     guardian_id_no = models.CharField(max_length=13, null=True, blank=True)
     guardian_full_name = models.CharField(max_length=100, null=True, blank=True)
     guardian_contact = models.CharField(max_length=10, null=True, blank=True)
-    province = models.CharField(max_length=50, null=True, blank=True)
-    municipality = models.CharField(max_length=50, null=True, blank=True)
+    province = models.ForeignKey(Province, null=True, blank=True, on_delete=models.PROTECT, related_name='+', db_index=False)
+    municipality = models.ForeignKey(Municipality, null=True, blank=True, on_delete=models.PROTECT, related_name='+', db_index=False)
     town_or_city = models.CharField(max_length=50, null=True, blank=True)
     urban_or_rural = models.CharField(max_length=50, null=True, blank=True)
-    occupation_level = models.CharField(max_length=1000, null=True, blank=True)
+    occupation_level = models.ForeignKey(OccupationLevel, null=True, blank=True, on_delete=models.PROTECT, related_name='+', db_index=False)
     job_title = models.CharField(max_length=50, null=True, blank=True)
     OFO_occupation_code = models.CharField(max_length=50, null=True, blank=True)
     OFO_specialization = models.CharField(max_length=50, null=True, blank=True)
     OFO_occupation = models.CharField(max_length=50, null=True, blank=True)
     highest_school_qualification = models.CharField(max_length=50, null=True, blank=True)
-    highest_qualification = models.CharField(max_length=50, null=True, blank=True)
+    highest_qualification = models.ForeignKey(Qualification, null=True, blank=True, on_delete=models.PROTECT, related_name='+', db_index=False)
     student_number = models.CharField(max_length=20, null=True, blank=True)
     bursary_awarded_date = models.DateField(null=True, blank=True)
     bursary_completion_status = models.CharField(max_length=50, null=True, blank=True)
     popi_consent = models.CharField(max_length=10, null=True, blank=True)
     popi_consent_date = models.DateField(null=True, blank=True)
-    must_change_password = models.BooleanField(default=True)
-    temporary_password_expires = models.DateTimeField(null=True, blank=True)
-    
-    
-    objects = CustomUserManager()
-    
+    # From the SA ID number: None unless id_type is a national ID.
+    id_number_valid = models.BooleanField(null=True, blank=True, editable=False)
+    id_gender = models.CharField(max_length=6, null=True, blank=True, editable=False)
+    id_citizen = models.BooleanField(null=True, blank=True, editable=False)
+
+    class Meta:
+        # Chosen from the staff filters and funder reports; see
+        # user_app/queries.py and `manage.py explain_queries`.
+        indexes = [
+            models.Index(fields=['province', 'municipality'], name='profile_province_idx'),
+            models.Index(fields=['employment_status', 'province'], name='profile_employment_idx'),
+            models.Index(fields=['learning_programe_name', 'intervention'], name='profile_programme_idx'),
+            models.Index(fields=['intervention'], name='profile_intervention_idx'),
+            models.Index(fields=['start_date', 'end_date'], name='profile_programme_dates_idx'),
+            models.Index(fields=['end_date'], name='profile_end_date_idx'),
+            models.Index(fields=['popi_consent_date'], condition=models.Q(popi_consent='agree'), name='profile_popi_agreed_idx'),
+            models.Index(fields=['youth', 'province'], name='profile_youth_idx'),
+            models.Index(fields=['age'], name='profile_age_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.email}"
+        return f"Learner profile for {self.user_id}"
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or derived.SOURCE_FIELDS.intersection(update_fields):
+            derived.apply(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *derived.DERIVED_FIELDS}
+        super().save(*args, **kwargs)
+
+
+class LearnerSearch(models.Model):
+    """
+    The text staff search learners by, one row per user, copied from
+    CustomUser and LearnerProfile by user_app/search.py. The full-text index
+    over it is backend specific and created in migration 0012: an FTS5 table
+    kept in step by triggers on SQLite, a trigger-maintained tsvector column
+    with a GIN index on PostgreSQL.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    name = models.TextField(blank=True)
+    email = models.TextField(blank=True)
+    # ID or passport, student and learner enrollment numbers.
+    identifiers = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Search entry for {self.user_id}"
+
+
+class LearnerSummary(models.Model):
+    """
+    The number of learners with each combination of the funder report
+    dimensions that has any, kept up to date by user_app/reporting.py so
+    reports sum a few thousand rows instead of grouping every profile.
+    Missing values are stored as '' so the combination stays unique.
+    """
+    province = models.CharField(max_length=50, blank=True)
+    race = models.CharField(max_length=50, blank=True)
+    gender = models.CharField(max_length=50, blank=True)
+    disability = models.CharField(max_length=50, blank=True)
+    employment_status = models.CharField(max_length=100, blank=True)
+    programme = models.CharField(max_length=100, blank=True)
+    learners = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['province', 'race', 'gender', 'disability', 'employment_status', 'programme'],
+                name='learner_summary_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.learners} learners"
+
+
+class OutboundEmail(models.Model):
+    """
+    A message waiting in (or delivered from) the outbox. Views only enqueue
+    rows here; the send_queued_mail command delivers them over SMTP.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE, related_name='outbound_emails')
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class LearnerChange(models.Model):
+    """
+    A learner (a user and their profile, as exports write them) inserted,
+    updated or deleted, recorded by user_app/changes.py. The key orders
+    the journal; delta exports read it from a checkpoint's position on.
+    user_id is a plain column so the entry outlives a deleted user.
+    """
+    INSERTED = 'inserted'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (INSERTED, 'Inserted'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    user_id = models.BigIntegerField()
+    action = models.CharField(max_length=8, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"User {self.user_id} {self.action}"
+
+
+class ExportCheckpoint(models.Model):
+    """
+    A named series of delta exports, such as a funder's monthly submission.
+    ``position`` is the last journal entry submitted (None before the first
+    run); an unfinished run has a ``target`` entry and, once it has written
+    a chunk, the last user id written in ``resume_after``.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(null=True, blank=True)
+    target = models.BigIntegerField(null=True, blank=True)
+    resume_after = models.BigIntegerField(null=True, blank=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,215 @@
+"""
+Opt-in per-request profiling.
+
+ProfilingMiddleware profiles a request when REQUEST_PROFILING is on, or when
+the request carries the REQUEST_PROFILING_HEADER header and comes from a
+staff user (or DEBUG is on). For a profiled request it records:
+
+- the number of SQL queries and the time spent in them, on every database
+- the time spent rendering templates (outermost render only, so includes
+  are not counted twice)
+- a cProfile of the request, reduced to the REQUEST_PROFILING_FUNCTIONS
+  functions with the most own time
+
+The totals go back in a Server-Timing header, which browser dev tools show
+next to the request, and the whole record is appended as one JSON line to
+REQUEST_PROFILING_LOG, rotated by size. `manage.py profile_report`
+aggregates those logs.
+
+Requests that aren't profiled pay for one settings check. The middleware
+is async-capable so the async views keep a native path under ASGI; a
+profiled async request runs on one thread, where its queries are seen.
+"""
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+_handler_lock = threading.Lock()
+_handlers = {}
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+
+_original_render = Template.render
+
+
+def _timed_render(self, context):
+    profile = _current.get()
+    if profile is None:
+        return _original_render(self, context)
+    profile._template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        profile._template_depth -= 1
+        if not profile._template_depth:
+            profile.template_time += time.perf_counter() - start
+
+
+Template.render = _timed_render
+
+
+def _log_handler():
+    path = settings.REQUEST_PROFILING_LOG
+    with _handler_lock:
+        if path not in _handlers:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=settings.REQUEST_PROFILING_LOG_MAX_BYTES,
+                backupCount=settings.REQUEST_PROFILING_LOG_BACKUPS,
+                encoding='utf-8',
+                delay=True,
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            _handlers[path] = handler
+        return _handlers[path]
+
+
+def write_record(record):
+    """
+    Append one profile record to the rotating JSON-lines log.
+    """
+    handler = _log_handler()
+    handler.handle(logging.makeLogRecord({'msg': json.dumps(record), 'levelno': logging.INFO}))
+
+
+def top_functions(profiler, limit):
+    """
+    The ``limit`` functions with the most own time, as JSON-friendly dicts.
+    """
+    stats = pstats.Stats(profiler).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in ranked
+    ]
+
+
+def _header_present(request):
+    return bool(request.META.get('HTTP_' + settings.REQUEST_PROFILING_HEADER.upper().replace('-', '_')))
+
+
+def profiling_requested(request):
+    if settings.REQUEST_PROFILING:
+        return True
+    if not _header_present(request):
+        return False
+    user = getattr(request, 'user', None)
+    return settings.DEBUG or bool(user is not None and user.is_staff)
+
+
+class ProfilingMiddleware:
+    """
+    Must come after AuthenticationMiddleware, which the header check needs.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not profiling_requested(request):
+            return self.get_response(request)
+        return self.profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        # Only the header check needs request.user, which means the ORM.
+        if not (settings.REQUEST_PROFILING or _header_present(request)):
+            return await self.get_response(request)
+        if not await sync_to_async(profiling_requested)(request):
+            return await self.get_response(request)
+        # Sync code the view hands to sync_to_async comes back to this
+        # thread, so the execute wrappers and cProfile see its queries.
+        return await sync_to_async(self.profile)(request, async_to_sync(self.get_response))
+
+    def profile(self, request, get_response):
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = None
+        if settings.REQUEST_PROFILING_FUNCTIONS:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this process.
+                profiler = None
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_query))
+                response = get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            _current.reset(token)
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={profile.sql_time * 1000:.1f};desc="{profile.sql_count} queries"',
+            f'tpl;dur={profile.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        match = request.resolver_match
+        record = {
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            'sql_count': profile.sql_count,
+            'sql_ms': round(profile.sql_time * 1000, 3),
+            'template_ms': round(profile.template_time * 1000, 3),
+            'functions': top_functions(profiler, settings.REQUEST_PROFILING_FUNCTIONS) if profiler else [],
+        }
+        try:
+            write_record(record)
+        except OSError as e:
+            logger.warning(f"Could not write request profile for {request.path}. Error: {str(e)}")
+        return response
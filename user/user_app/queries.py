@@ -0,0 +1,135 @@
+"""
+The app's canonical queries: the lookups behind login, the staff filters and
+the funder reports. `manage.py explain_queries` runs EXPLAIN on each of them
+so a missing or unused index shows up before it reaches production.
+"""
+import datetime
+
+from django.contrib.sessions.models import Session
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import CustomUser, LearnerChange, LearnerProfile, OutboundEmail
+
+
+class CanonicalQuery:
+    def __init__(self, name, build, allow_scan=False):
+        self.name = name
+        self.build = build
+        # Some queries (full exports) are expected to read the whole table.
+        self.allow_scan = allow_scan
+
+    def queryset(self):
+        return self.build()
+
+
+def _today():
+    return timezone.now().date()
+
+
+CANONICAL_QUERIES = [
+    CanonicalQuery(
+        'login by email',
+        lambda: CustomUser.objects.filter(email='learner@example.com'),
+    ),
+    CanonicalQuery(
+        'session user by pk',
+        lambda: CustomUser.objects.filter(pk=1),
+    ),
+    CanonicalQuery(
+        'learners by province and municipality',
+        lambda: LearnerProfile.objects.filter(province_id=1, municipality_id=1),
+    ),
+    CanonicalQuery(
+        'learners by employment status',
+        lambda: LearnerProfile.objects.filter(employment_status='unemployed'),
+    ),
+    CanonicalQuery(
+        'learners on a programme',
+        lambda: LearnerProfile.objects.filter(learning_programe_name='Chemical Operations', intervention='Learnership'),
+    ),
+    CanonicalQuery(
+        'learners by intervention',
+        lambda: LearnerProfile.objects.filter(intervention='Learnership'),
+    ),
+    CanonicalQuery(
+        'learners active on a date',
+        lambda: LearnerProfile.objects.filter(start_date__lte=_today(), end_date__gte=_today()),
+    ),
+    CanonicalQuery(
+        'programmes ending this month',
+        lambda: LearnerProfile.objects.filter(end_date__range=(_today(), _today() + datetime.timedelta(days=31))),
+    ),
+    CanonicalQuery(
+        'learners who gave POPI consent',
+        lambda: LearnerProfile.objects.filter(popi_consent='agree', popi_consent_date__gte=_today() - datetime.timedelta(days=365)),
+    ),
+    CanonicalQuery(
+        'youth learners by province',
+        lambda: LearnerProfile.objects.filter(youth='yes', province_id=1),
+    ),
+    CanonicalQuery(
+        'learners in an age band',
+        lambda: LearnerProfile.objects.filter(age__range=(18, 24)),
+    ),
+    CanonicalQuery(
+        'due outbound email',
+        lambda: OutboundEmail.objects.filter(status=OutboundEmail.STATUS_QUEUED, next_attempt_at__lte=timezone.now()).order_by('next_attempt_at'),
+    ),
+    CanonicalQuery(
+        'expired temporary passwords',
+        lambda: CustomUser.objects.filter(must_change_password=True, temporary_password_expires__lt=timezone.now()).order_by('temporary_password_expires'),
+    ),
+    CanonicalQuery(
+        'expired sessions',
+        lambda: Session.objects.filter(expire_date__lt=timezone.now()).order_by('expire_date').values_list('pk', flat=True)[:1000],
+    ),
+    CanonicalQuery(
+        'learner changes since a checkpoint',
+        lambda: LearnerChange.objects.filter(pk__gt=1000, pk__lte=2000).values('user_id').order_by('user_id'),
+    ),
+    CanonicalQuery(
+        'users updated since a date',
+        lambda: CustomUser.objects.filter(updated_at__gte=timezone.now() - datetime.timedelta(days=31)),
+    ),
+    CanonicalQuery(
+        'full learner export',
+        lambda: CustomUser.objects.select_related('profile').order_by('pk'),
+        allow_scan=True,
+    ),
+]
+
+
+def is_full_scan(plan, vendor):
+    """
+    Whether an EXPLAIN plan reads a whole table instead of using an index.
+    """
+    if vendor == 'sqlite':
+        # EXPLAIN QUERY PLAN says "SCAN <table>" for a table scan and
+        # "SCAN <table> USING [COVERING] INDEX ..." for an index scan.
+        return any(
+            'SCAN ' in line and 'USING' not in line
+            for line in plan.splitlines()
+        )
+    if vendor == 'postgresql':
+        return 'Seq Scan' in plan
+    return False
+
+
+def explain(query):
+    """
+    Return ``(plan, full_scan)`` for a CanonicalQuery on its database.
+
+    On PostgreSQL sequential scans are disabled for the duration of the
+    EXPLAIN, because on a small table the planner would pick one even when a
+    suitable index exists; what we want to know is whether an index *can* be
+    used.
+    """
+    queryset = query.queryset()
+    connection = connections[queryset.db]
+    with transaction.atomic(using=queryset.db):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+    return plan, is_full_scan(plan, connection.vendor)
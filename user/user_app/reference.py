@@ -0,0 +1,206 @@
+"""
+Process-wide, in-memory copies of the reference tables (provinces,
+municipalities, nationalities, ...).
+
+Each list is read with one query the first time it is used and then served
+from memory: form choices, code -> row lookups for validation and row ->
+code lookups for exports never touch the database.
+
+Saving or deleting a reference row (through the admin or loaddata) drops
+the local copy and bumps a version key in the USER_CACHE_ALIAS cache. Other
+processes compare that version at most every REFERENCE_CACHE_CHECK_INTERVAL
+seconds, so they only notice within that delay when the alias is shared;
+with the default per-process cache they notice on restart.
+
+Long tables (municipalities, nationalities, the OFO catalogue) are too big
+for a <select>; search() answers typeahead queries from a sorted prefix
+index built the first time a table is searched.
+"""
+import bisect
+import functools
+import re
+import threading
+import time
+import unicodedata
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import LearnerProfile, Municipality, Nationality, OFOOccupation, ReferenceData
+
+# The empty option every select on the registration form starts with.
+PLACEHOLDER = ('select', 'Select')
+
+# LearnerProfile fields holding a reference-table key, by field name.
+PROFILE_FIELDS = {
+    field.name: field.related_model
+    for field in LearnerProfile._meta.concrete_fields
+    if field.is_relation and issubclass(field.related_model, ReferenceData)
+}
+
+# Tables served by the typeahead API, by the name used in its URL.
+TYPEAHEAD_MODELS = {
+    'municipality': Municipality,
+    'nationality': Nationality,
+    'ofo-occupation': OFOOccupation,
+}
+
+_lock = threading.Lock()
+_tables = {}
+
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """
+    Casefolded words of ``text`` without accents or punctuation, joined by
+    single spaces: the form both index keys and queries are compared in.
+    """
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD.findall(text.casefold()))
+
+
+def _version_key(model):
+    return f'reference:{model._meta.label_lower}:version'
+
+
+def _shared_version(model):
+    cache = caches[settings.USER_CACHE_ALIAS]
+    version = cache.get(_version_key(model))
+    if version is None:
+        cache.add(_version_key(model), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_version_key(model))
+    return version
+
+
+class ReferenceTable:
+    """
+    One reference table held in memory. The rows are model instances shared
+    by every caller, so treat them as read-only.
+    """
+    def __init__(self, model, version):
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.rows = list(model.objects.order_by('name'))
+        self.by_code = {row.code: row for row in self.rows}
+        self.by_id = {row.pk: row for row in self.rows}
+        # Select options, led by the placeholder. The same list object until
+        # the table is reloaded, so PrecomputedSelect can reuse its markup.
+        self.choices = [PLACEHOLDER] + [(row.code, row.name) for row in self.rows]
+
+    @functools.cached_property
+    def by_name(self):
+        return {normalize(row.name): row for row in self.rows}
+
+    @functools.cached_property
+    def prefix_index(self):
+        """
+        ``(keys, positions)``: every word-start suffix of each row's name and
+        code, sorted, and the position in ``rows`` of the row it came from.
+        A query matches a row when it is a prefix of one of its keys, so
+        "tsh" finds "City of Tshwane" and "nw403" finds "...-NW403".
+        """
+        entries = set()
+        for position, row in enumerate(self.rows):
+            for text in (row.name, row.code):
+                words = normalize(text).split(' ')
+                for start in range(len(words)):
+                    entries.add((' '.join(words[start:]), position))
+        entries = sorted(entries)
+        return [key for key, _ in entries], [position for _, position in entries]
+
+    def search(self, query):
+        """
+        Rows matching ``query`` (see prefix_index), in name order; every row
+        for an empty query.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return self.rows
+        keys, positions = self.prefix_index
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\U0010ffff', start)
+        return [self.rows[position] for position in sorted(set(positions[start:end]))]
+
+
+def table(model):
+    """
+    The in-memory copy of ``model``'s rows, loading or refreshing it first if
+    needed.
+    """
+    label = model._meta.label_lower
+    current = _tables.get(label)
+    now = time.monotonic()
+    if current is not None and now - current.checked_at < settings.REFERENCE_CACHE_CHECK_INTERVAL:
+        return current
+    version = _shared_version(model)
+    if current is not None and current.version == version:
+        current.checked_at = now
+        return current
+    with _lock:
+        current = _tables.get(label)
+        if current is None or current.version != version:
+            current = _tables[label] = ReferenceTable(model, version)
+    return current
+
+
+def choices(model):
+    return table(model).choices
+
+
+def get_by_code(model, code):
+    """
+    The row with this code, or None.
+    """
+    return table(model).by_code.get(code)
+
+
+def lookup(model, value):
+    """
+    The row whose code is ``value``, or failing that whose name matches it
+    ignoring case, accents and punctuation; None if neither does.
+    """
+    current = table(model)
+    row = current.by_code.get(value)
+    if row is None:
+        row = current.by_name.get(normalize(value))
+    return row
+
+
+def search(model, query):
+    return table(model).search(query)
+
+
+def code_for(model, pk):
+    """
+    The code of the row with this primary key, or None.
+    """
+    row = table(model).by_id.get(pk)
+    return row.code if row is not None else None
+
+
+def version(models=None):
+    """
+    A string that changes whenever one of these tables (by default, those
+    LearnerProfile uses) is invalidated, for keying caches of markup built
+    from them.
+    """
+    return '-'.join(table(model).version for model in models or PROFILE_FIELDS.values())
+
+
+def _bump_version(model):
+    _tables.pop(model._meta.label_lower, None)
+    caches[settings.USER_CACHE_ALIAS].set(_version_key(model), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate(model):
+    """
+    Drop the cached copy of a table, now and again once the surrounding
+    transaction commits (as user_cache.invalidate_user does).
+    """
+    _bump_version(model)
+    transaction.on_commit(lambda: _bump_version(model))
@@ -0,0 +1,157 @@
+"""
+Funder reports: learner counts by province, race, gender, disability,
+employment status and programme.
+
+LearnerSummary holds one count per combination of those dimensions. The
+LearnerProfile signals move a learner between counts as profiles are saved
+and deleted (deleting a user deletes its profile); code that bulk_creates
+profiles calls add() itself, and `manage.py rebuild_learner_summary`
+recounts everything from the profiles, for after changes made behind the
+ORM's back. pivot() sums the summary rows, which number in the thousands
+however many learners there are.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from . import reference
+from .models import LearnerProfile, LearnerSummary, Province
+from .sqlite import retry_on_lock
+
+# Report dimension -> the LearnerProfile lookup it is counted by.
+DIMENSIONS = {
+    'province': 'province__code',
+    'race': 'race',
+    'gender': 'gender',
+    'disability': 'disability',
+    'employment_status': 'employment_status',
+    'programme': 'learning_programe_name',
+}
+
+# Saving a profile without any of these can't move it between counts.
+SOURCE_FIELDS = frozenset({'province', 'race', 'gender', 'disability', 'employment_status', 'learning_programe_name'})
+
+
+def key_for(profile):
+    """
+    The summary key, a tuple in DIMENSIONS order, a profile is counted under.
+    """
+    return (
+        reference.code_for(Province, profile.province_id) or '',
+        profile.race or '',
+        profile.gender or '',
+        profile.disability or '',
+        profile.employment_status or '',
+        profile.learning_programe_name or '',
+    )
+
+
+def stored_key(user_id):
+    """
+    The summary key of the profile as it is in the database, or None.
+    """
+    values = LearnerProfile.objects.filter(pk=user_id).values_list(*DIMENSIONS.values()).first()
+    return tuple(value or '' for value in values) if values is not None else None
+
+
+def _summary(key):
+    return LearnerSummary.objects.filter(**dict(zip(DIMENSIONS, key)))
+
+
+def _add(key, delta):
+    if _summary(key).update(learners=F('learners') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            LearnerSummary.objects.create(learners=delta, **dict(zip(DIMENSIONS, key)))
+    except IntegrityError:
+        # Created by a concurrent save since the update above.
+        _summary(key).update(learners=F('learners') + delta)
+
+
+def move(old_key, new_key):
+    """
+    Count one learner under ``new_key`` instead of ``old_key``; either may
+    be None, for a new or deleted profile.
+    """
+    if old_key == new_key:
+        return
+    if old_key is not None:
+        _add(old_key, -1)
+    if new_key is not None:
+        _add(new_key, 1)
+
+
+def add(keys):
+    """
+    Count learners under ``keys``, an iterable of summary keys, one update
+    per distinct key.
+    """
+    for key, count in Counter(keys).items():
+        _add(key, count)
+
+
+def summary_rows(profiles):
+    """
+    ``(key, learners)`` for every combination in a LearnerProfile queryset,
+    grouped by the database.
+    """
+    grouped = profiles.order_by().values_list(*DIMENSIONS.values()).annotate(learners=Count('pk'))
+    return [(tuple(value or '' for value in row[:-1]), row[-1]) for row in grouped]
+
+
+@retry_on_lock
+def rebuild():
+    """
+    Recount every learner from the profiles.
+    """
+    with transaction.atomic():
+        # Deleting first takes the write lock, so no profile save can move
+        # a learner between the count and the insert.
+        LearnerSummary.objects.all().delete()
+        LearnerSummary.objects.bulk_create([
+            LearnerSummary(learners=learners, **dict(zip(DIMENSIONS, key)))
+            for key, learners in summary_rows(LearnerProfile.objects.all())
+        ], batch_size=1000)
+
+
+def counts():
+    """
+    ``{key: learners}`` for every combination with learners.
+    """
+    return {
+        tuple(row[:-1]): row[-1]
+        for row in LearnerSummary.objects.filter(learners__gt=0).values_list(*DIMENSIONS, 'learners')
+    }
+
+
+def pivot(by, column=None, filters=None):
+    """
+    Learner counts grouped by the dimensions in ``by`` and, when given,
+    spread across one column per value of the ``column`` dimension, for
+    the learners matching ``filters`` (``{dimension: value}``).
+
+    Returns ``(header, rows)``; the last column of each row is its total.
+    """
+    unknown = [name for name in [*by, *([column] if column else []), *(filters or {})] if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown report dimension(s): {', '.join(unknown)}")
+    group = [*by, column] if column else list(by)
+    grouped = (
+        LearnerSummary.objects.filter(learners__gt=0, **(filters or {}))
+        .values(*group).annotate(total=Sum('learners')).order_by(*group)
+        .values_list(*group, 'total')
+    )
+    if not column:
+        return [*by, 'learners'], [list(row) for row in grouped]
+
+    table = {}
+    for *key, value, total in grouped:
+        table.setdefault(tuple(key), {})[value] = total
+    values = sorted({value for cells in table.values() for value in cells})
+    rows = [
+        [*key, *(cells.get(value, 0) for value in values), sum(cells.values())]
+        for key, cells in table.items()
+    ]
+    return [*by, *(f'{column}={value}' for value in values), 'total'], rows
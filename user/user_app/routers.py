@@ -0,0 +1,194 @@
+"""
+Read replicas.
+
+ReplicaRouter sends reads to one of settings.DATABASE_REPLICAS only inside
+replica_reads() (or a view decorated with use_replica): the staff search,
+funder reports, exports and admin listings, which tolerate a few seconds of
+replication lag. Everything else, and every write, goes to the primary.
+
+Read-your-writes: a write through the ORM pins the rest of the request (or,
+outside requests, the thread) to the primary, and ReplicaPinMiddleware
+gives the client a cookie that keeps its requests on the primary for
+REPLICA_PIN_SECONDS, which should exceed the replicas' usual lag. Sessions
+are always read from the primary and writing one doesn't pin: every request
+may write its session.
+
+Health: a replica is probed with a query (and on PostgreSQL its replay lag
+is compared with REPLICA_MAX_LAG) at most every
+REPLICA_HEALTH_CHECK_INTERVAL seconds per process. Reads skip replicas that
+failed their last probe and fall back to the primary when none passed.
+"""
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_pinned = contextvars.ContextVar('replica_pinned', default=False)
+_wrote = contextvars.ContextVar('replica_wrote', default=False)
+
+# Always read from the primary; writing to them doesn't pin.
+PRIMARY_APPS = frozenset({'sessions'})
+
+_health_lock = threading.Lock()
+_health = {}
+
+
+@contextmanager
+def replica_reads():
+    """
+    Let reads in the block go to a replica.
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def use_replica(view):
+    """
+    Run a view (or view method) inside replica_reads(), rendering a
+    TemplateResponse before leaving it so the template's queries are
+    covered too.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            response = view(*args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+    return wrapper
+
+
+def _probe(alias):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+                )
+                lag = cursor.fetchone()[0] or 0
+                if lag > settings.REPLICA_MAX_LAG:
+                    logger.warning(f"Replica {alias} is {lag:.0f} s behind; reading from the primary instead.")
+                    return False
+            else:
+                cursor.execute('SELECT 1')
+        return True
+    except DatabaseError as e:
+        logger.warning(f"Replica {alias} is unavailable. Error: {str(e)}")
+        connection.close()
+        return False
+
+
+def replica_healthy(alias):
+    """
+    Whether ``alias`` passed its last probe, probing again when that was
+    more than REPLICA_HEALTH_CHECK_INTERVAL seconds ago.
+    """
+    now = time.monotonic()
+    with _health_lock:
+        checked = _health.get(alias)
+    if checked is not None and now - checked[1] < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        return checked[0]
+    healthy = _probe(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def reset_replica_health():
+    with _health_lock:
+        _health.clear()
+
+
+def read_alias():
+    """
+    The database a designated read should use right now: a healthy replica
+    chosen at random, or the primary when pinned or none is healthy.
+    """
+    if _pinned.get():
+        return DEFAULT_DB_ALIAS
+    healthy = [alias for alias in settings.DATABASE_REPLICAS if replica_healthy(alias)]
+    return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or not settings.DATABASE_REPLICAS or model._meta.app_label in PRIMARY_APPS:
+            return None
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_APPS:
+            _pinned.set(True)
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinMiddleware:
+    """
+    Keeps a client that just wrote on the primary for REPLICA_PIN_SECONDS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    def start(self, request):
+        return _pinned.set(settings.REPLICA_PIN_COOKIE in request.COOKIES), _wrote.set(False)
+
+    def finish(self, response):
+        if _wrote.get():
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
+
+    def reset(self, tokens):
+        _pinned.reset(tokens[0])
+        _wrote.reset(tokens[1])
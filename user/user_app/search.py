@@ -0,0 +1,204 @@
+"""
+Full-text search over learners for staff: names, email, ID or passport,
+student and learner enrollment numbers.
+
+LearnerSearch holds one denormalised row per user. index_users() refreshes
+rows from CustomUser and LearnerProfile; the post_save signals call it for
+single saves, and code that bulk_creates users (imports, benchmarks) calls it
+itself. The full-text index over those rows is maintained by the database
+(see migration 0012):
+
+- SQLite: an FTS5 table, ranked with bm25()
+- PostgreSQL: a tsvector column with a GIN index, ranked with ts_rank()
+
+Any other backend falls back to icontains over the LearnerSearch columns,
+which is correct but scans.
+
+Every word of a query must match the start of a word in the row, so
+"thand mok" finds Thandi Mokoena, "2019" finds student number 201912345 and
+"thandi@" finds thandi@example.com.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import CustomUser, LearnerSearch
+
+# Words beyond this are ignored; they add cost without narrowing much.
+MAX_TERMS = 8
+
+# Column weights for bm25(): name, email, identifiers.
+SQLITE_WEIGHTS = (10.0, 2.0, 10.0)
+
+INDEX_BATCH_SIZE = 1000
+
+# Words as the index splits them: an email address is one word.
+_TERM = re.compile(r'[^\W_]+(?:[@.][^\W_]+)*')
+
+
+def terms(query):
+    return _TERM.findall(query.casefold())[:MAX_TERMS]
+
+
+def _join(*values):
+    return ' '.join(value for value in values if value)
+
+
+def index_users(user_ids):
+    """
+    Refresh the search rows of these users.
+    """
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), INDEX_BATCH_SIZE):
+        values = CustomUser.objects.filter(pk__in=user_ids[start:start + INDEX_BATCH_SIZE]).values_list(
+            'pk', 'first_name', 'last_name', 'email',
+            'profile__id_or_passport', 'profile__student_number', 'profile__learner_enrollment_number',
+        )
+        rows = [
+            LearnerSearch(
+                user_id=pk,
+                name=_join(first_name, last_name),
+                email=email,
+                identifiers=_join(id_or_passport, student_number, enrollment_number),
+            )
+            for pk, first_name, last_name, email, id_or_passport, student_number, enrollment_number in values
+        ]
+        LearnerSearch.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['user'], update_fields=['name', 'email', 'identifiers'],
+        )
+
+
+def rebuild():
+    """
+    Reindex every user, for after changes made behind the ORM's back.
+    """
+    LearnerSearch.objects.all().delete()
+    index_users(CustomUser.objects.order_by('pk').values_list('pk', flat=True).iterator())
+
+
+@contextmanager
+def deferred_index(first_user_id):
+    """
+    For bulk loads on SQLite: LearnerSearch rows inserted in the block skip
+    the FTS5 triggers, and rows from ``first_user_id`` on are added to the
+    index in one statement at the end, which is several times faster than
+    row by row. Other backends keep updating the index as rows arrive.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'user_app_learnersearch'"
+        )
+        triggers = cursor.fetchall()
+        for name, _ in triggers:
+            cursor.execute(f'DROP TRIGGER {name}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO user_app_learnersearch_fts (rowid, name, email, identifiers) '
+                'SELECT user_id, name, email, identifiers FROM user_app_learnersearch WHERE user_id >= %s',
+                [first_user_id],
+            )
+            for _, sql in triggers:
+                cursor.execute(sql)
+
+
+def _match(query):
+    """
+    ``(sql, params)`` of a query returning ``(user_id, rank)`` for the
+    matches, lower rank first; None on backends without a full-text index.
+    """
+    words = terms(query)
+    if connection.vendor == 'sqlite':
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        return (
+            f'SELECT rowid AS user_id, bm25(user_app_learnersearch_fts, {weights}) AS rank '
+            f'FROM user_app_learnersearch_fts WHERE user_app_learnersearch_fts MATCH %s',
+            [' '.join(f'"{word}"*' for word in words)],
+        )
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        return (
+            "SELECT user_id, -ts_rank(search_vector, to_tsquery('simple', %s)) AS rank "
+            "FROM user_app_learnersearch WHERE search_vector @@ to_tsquery('simple', %s)",
+            [tsquery, tsquery],
+        )
+    return None
+
+
+def _fallback(query):
+    condition = Q()
+    for word in terms(query):
+        condition &= Q(name__icontains=word) | Q(email__icontains=word) | Q(identifiers__icontains=word)
+    return LearnerSearch.objects.filter(condition)
+
+
+def matching_user_ids(query):
+    """
+    The ids of the users matching ``query``, for ``filter(pk__in=...)``.
+    """
+    if not terms(query):
+        return LearnerSearch.objects.none().values('user_id')
+    match = _match(query)
+    if match is None:
+        return _fallback(query).values('user_id')
+    sql, params = match
+    return RawSQL(f'SELECT user_id FROM ({sql}) matches', params)
+
+
+def _read_connection():
+    # Raw queries bypass the database routers; ask them here.
+    return connections[router.db_for_read(LearnerSearch)]
+
+
+class SearchResults:
+    """
+    Users matching a query, best match first. Paginator-compatible: count()
+    and slicing each run one query, so only the requested page is loaded.
+    """
+    def __init__(self, query):
+        self.query = query
+        self.empty = not terms(query)
+
+    def count(self):
+        if self.empty:
+            return 0
+        match = _match(self.query)
+        if match is None:
+            return _fallback(self.query).count()
+        sql, params = match
+        with _read_connection().cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql}) matches', params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def _ids(self, offset, limit):
+        match = _match(self.query)
+        if match is None:
+            return list(_fallback(self.query).order_by('user_id').values_list('user_id', flat=True)[offset:offset + limit])
+        sql, params = match
+        with _read_connection().cursor() as cursor:
+            cursor.execute(
+                f'SELECT user_id FROM ({sql}) matches ORDER BY rank, user_id LIMIT %s OFFSET %s',
+                params + [limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError("SearchResults only supports slicing without a step.")
+        offset = key.start or 0
+        if self.empty or key.stop is None or key.stop <= offset:
+            return []
+        ids = self._ids(offset, key.stop - offset)
+        users = CustomUser.objects.select_related('profile').in_bulk(ids)
+        return [users[pk] for pk in ids if pk in users]
@@ -0,0 +1,375 @@
+"""
+Synthetic learners for load testing (`manage.py seed_users`).
+
+LearnerGenerator turns a row index into a user, a profile and a search row,
+as tuples ready for executemany. Each chunk of indexes is generated from its
+own Random seeded by (seed, chunk), so the same seed and chunk size give
+the same rows however many worker processes generate them. The generator
+only holds plain data, so it pickles to worker processes cheaply and needs
+no Django setup there.
+
+Values are drawn so the rows pass CustomUserCreationForm: names of letters
+only, 10-digit phone numbers, SA ID numbers whose date of birth, gender
+digits and Luhn check digit agree with the rest of the row, and choices
+taken from the form itself.
+"""
+import datetime
+import random
+from contextlib import contextmanager, nullcontext
+
+from .derived import age_on, luhn_check_digit, youth_for
+
+FIRST_NAMES = {
+    'female': (
+        'Thandi', 'Lerato', 'Ayanda', 'Nomvula', 'Zanele', 'Naledi', 'Anele', 'Refilwe', 'Lindiwe', 'Fatima',
+        'Priya', 'Annika', 'Busisiwe', 'Palesa', 'Nandi', 'Kefilwe', 'Precious', 'Michelle', 'Zinhle', 'Amahle',
+    ),
+    'male': (
+        'Sipho', 'Pieter', 'Johan', 'Kagiso', 'Bongani', 'Themba', 'Mpho', 'Karabo', 'Tshepo', 'Lwazi',
+        'Thabo', 'Sibusiso', 'Kabelo', 'Andile', 'Neo', 'Rajesh', 'Ettienne', 'Mandla', 'Lebo', 'Tumelo',
+    ),
+}
+LAST_NAMES = (
+    'Mokoena', 'Dlamini', 'Nkosi', 'Khumalo', 'Botha', 'Ndlovu', 'Naidoo', 'Pillay', 'Mahlangu', 'Mthembu',
+    'Sithole', 'Zulu', 'Molefe', 'Pretorius', 'Venter', 'Ngcobo', 'Mabaso', 'Jacobs', 'Adams', 'Maluleke',
+    'Shabalala', 'Radebe', 'Nel', 'Coetzee', 'Mkhize', 'Baloyi', 'Govender', 'Hendricks', 'Modise', 'Chauke',
+)
+STREETS = ('Main Road', 'Church Street', 'Voortrekker Road', 'Nelson Mandela Drive', 'Long Street', 'Oak Avenue')
+TOWNS = ('Soweto', 'Klerksdorp', 'Polokwane', 'Mahikeng', 'Durban', 'Gqeberha', 'Bloemfontein', 'Mbombela')
+PROGRAMMES = (
+    ('Chemical Operations', 'Learnership'),
+    ('Electrical Engineering', 'Apprenticeship'),
+    ('Project Management', 'Skills Programme'),
+    ('Business Administration', 'Learnership'),
+    ('Information Technology', 'Internship'),
+    ('Mining Operations', 'Learnership'),
+    ('Welding', 'Apprenticeship'),
+    ('Bookkeeping', 'Bursary'),
+)
+OFO_OCCUPATIONS = (
+    ('313101', 'Chemical Plant Operator', 'Chemical'),
+    ('671101', 'Electrician', 'Electrical'),
+    ('121904', 'Programme or Project Manager', 'Projects'),
+    ('334102', 'Office Administrator', 'Administration'),
+    ('251201', 'Software Developer', 'Software'),
+    ('711101', 'Miner', 'Mining'),
+    ('651202', 'Welder', 'Welding'),
+    ('331301', 'Bookkeeper', 'Finance'),
+)
+
+class LearnerGenerator:
+    """
+    ``choices`` maps each form choice field to the values to draw from, and
+    ``reference`` each reference-table field to its primary keys
+    (``municipalities`` maps a province key to its municipality keys).
+    ``constants`` holds the values every row shares (password hash,
+    date_joined), already adapted for the database.
+    """
+    def __init__(self, seed, chunk_size, choices, reference, municipalities, constants, today):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.choices = choices
+        self.reference = reference
+        self.municipalities = municipalities
+        self.constants = constants
+        self.today = today
+
+    def chunk(self, chunk, first_id, count):
+        """
+        ``(users, profiles, search_rows)`` for rows ``chunk * chunk_size``
+        onwards, keyed from ``first_id``. Built column by column with
+        Random.choices(), which draws a whole column in one call.
+        """
+        rng = random.Random(self.seed * 1_000_003 + chunk)
+        choices, reference, constants, today = self.choices, self.reference, self.constants, self.today
+
+        def column(values):
+            return rng.choices(values, k=count)
+
+        def digits(width):
+            return [f'{value:0{width}d}' for value in rng.choices(range(10 ** width), k=count)]
+
+        indexes = range(chunk * self.chunk_size, chunk * self.chunk_size + count)
+        ids = range(first_id, first_id + count)
+        genders = column(('female', 'male'))
+        first_names = [names[position] for names, position in zip(
+            [FIRST_NAMES[gender] for gender in genders], column(range(len(FIRST_NAMES['female']))),
+        )]
+        last_names = column(LAST_NAMES)
+        emails = [
+            f'{first}.{last}.{index}@seed{self.seed}.example.org'.lower()
+            for first, last, index in zip(first_names, last_names, indexes)
+        ]
+        birth_dates = [today - datetime.timedelta(days=days) for days in column(range(16 * 365, 60 * 365))]
+        ages = [age_on(birth_date, today) for birth_date in birth_dates]
+        citizens = [value < 0.95 for value in (rng.random() for _ in ids)]
+        # SA ID: YYMMDD, gender digits (0000-4999 female, 5000-9999 male),
+        # citizenship (0 citizen, 1 permanent resident), 8, Luhn check digit.
+        gender_digits = rng.choices(range(5000), k=count)
+        id_numbers = []
+        for birth_date, gender, serial, citizen in zip(birth_dates, genders, gender_digits, citizens):
+            number = (
+                f'{birth_date.year % 100:02d}{birth_date.month:02d}{birth_date.day:02d}'
+                f'{serial + (5000 if gender == "male" else 0):04d}{0 if citizen else 1}8'
+            )
+            id_numbers.append(number + luhn_check_digit(number))
+        start_dates = [
+            datetime.date(year, month, day)
+            for year, month, day in zip(column(range(2019, 2025)), column(range(1, 13)), column(range(1, 29)))
+        ]
+        end_dates = [start + datetime.timedelta(days=days) for start, days in zip(start_dates, column((181, 364, 729)))]
+        programmes = column(PROGRAMMES)
+        occupations = column(OFO_OCCUPATIONS)
+        provinces = column(reference['province'])
+        municipalities = [
+            rng.choice(self.municipalities.get(province) or reference['municipality']) for province in provinces
+        ]
+        employment = column(choices['employment_status'])
+        periods = [
+            period if status == 'unemployed' else '0 - 1 year'
+            for status, period in zip(employment, column(choices['unemployed_period']))
+        ]
+        addresses = [
+            f'{number} {street}, {town}'
+            for number, street, town in zip(column(range(1, 1000)), column(STREETS), column(TOWNS))
+        ]
+        titles = [
+            title if gender == 'female' else 'mr' for gender, title in zip(genders, column(('miss', 'mrs')))
+        ]
+        student_numbers = [f'{start.year}{index % 10 ** 5:05d}' for start, index in zip(start_dates, indexes)]
+        enrollment_numbers = [f'LE{self.seed % 100:02d}{index:09d}' for index in indexes]
+        consents = column(('agree', 'agree', 'agree', 'disagree'))
+        phone_prefixes = column(('06', '07', '08'))
+        guardian_prefixes = column(('06', '07', '08'))
+        guardian_first_names = column(FIRST_NAMES['female'] + FIRST_NAMES['male'])
+
+        users = [
+            (pk, constants['password'], False, False, True, constants['date_joined'], first, last, email, True,
+             constants['date_joined'], constants['date_joined'])
+            for pk, first, last, email in zip(ids, first_names, last_names, emails)
+        ]
+        profiles = list(zip(
+            ids,
+            [prefix + number for prefix, number in zip(phone_prefixes, digits(8))],
+            [birth_date.isoformat() for birth_date in birth_dates],
+            id_numbers,
+            ['national id'] * count,
+            ages,
+            titles,
+            [youth_for(age) for age in ages],
+            genders,
+            column(choices['race']),
+            column(choices['disability']),
+            column(choices['home_language']),
+            ['south africa' if citizen else 'other' for citizen in citizens],
+            column(reference['nationality']),
+            employment,
+            periods,
+            addresses,
+            addresses,
+            digits(4),
+            [f'CN{index:08d}' for index in indexes],
+            column(('Active', 'Completed', 'Not Started')),
+            enrollment_numbers,
+            [programme for programme, _ in programmes],
+            [intervention for _, intervention in programmes],
+            [intervention for _, intervention in programmes],
+            [start.isoformat() for start in start_dates],
+            [end.isoformat() for end in end_dates],
+            [str(number) for number in rng.choices(range(10 ** 12, 10 ** 13), k=count)],
+            [f'{first} {last}' for first, last in zip(guardian_first_names, last_names)],
+            [prefix + number for prefix, number in zip(guardian_prefixes, digits(8))],
+            provinces,
+            municipalities,
+            column(TOWNS),
+            column(('urban', 'rural')),
+            column(reference['occupation_level']),
+            [occupation for _, occupation, _ in occupations],
+            [code for code, _, _ in occupations],
+            [specialization for _, _, specialization in occupations],
+            [occupation for _, occupation, _ in occupations],
+            column(choices['highest_school_qualification']),
+            column(reference['highest_qualification']),
+            student_numbers,
+            [None] * count,
+            column(('First Year', 'Second Year', 'Third Year', 'Fourth Year')),
+            consents,
+            # The form asks for the date of the answer either way.
+            [start.isoformat() for start in start_dates],
+            [True] * count,
+            genders,
+            citizens,
+        ))
+        search_rows = [
+            (pk, f'{first} {last}', email, f'{id_number} {student} {enrollment}')
+            for pk, first, last, email, id_number, student, enrollment
+            in zip(ids, first_names, last_names, emails, id_numbers, student_numbers, enrollment_numbers)
+        ]
+        return users, profiles, search_rows
+
+
+# Column order of the tuples above.
+USER_FIELDS = (
+    'id', 'password', 'is_superuser', 'is_staff', 'is_active', 'date_joined',
+    'first_name', 'last_name', 'email', 'must_change_password', 'created_at', 'updated_at',
+)
+PROFILE_FIELDS = (
+    'user', 'contact_number', 'birth_date', 'id_or_passport', 'id_type', 'age', 'title', 'youth', 'gender', 'race',
+    'disability', 'home_language', 'citezenship', 'nationality', 'employment_status', 'unemployed_period',
+    'home_address', 'postal_address', 'postal_code', 'contract_number', 'contracted_learning_status',
+    'learner_enrollment_number', 'learning_programe_name', 'subcategory', 'intervention', 'start_date', 'end_date',
+    'guardian_id_no', 'guardian_full_name', 'guardian_contact', 'province', 'municipality', 'town_or_city',
+    'urban_or_rural', 'occupation_level', 'job_title', 'OFO_occupation_code', 'OFO_specialization',
+    'OFO_occupation', 'highest_school_qualification', 'highest_qualification', 'student_number',
+    'bursary_awarded_date', 'bursary_completion_status', 'popi_consent', 'popi_consent_date',
+    'id_number_valid', 'id_gender', 'id_citizen',
+)
+SEARCH_FIELDS = ('user', 'name', 'email', 'identifiers')
+
+
+def _generate(args):
+    generator, chunk, first_id, count = args
+    return chunk, generator.chunk(chunk, first_id, count)
+
+
+def _insert_sql(model, field_names):
+    from django.db import connection
+
+    fields = [model._meta.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    return 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+
+
+def make_generator(seed, chunk_size, password):
+    """
+    A LearnerGenerator drawing from this database's reference tables and
+    the registration form's choices.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+    from django.utils import timezone
+
+    from . import reference
+    from .forms import CustomUserCreationForm
+    from .models import Municipality
+
+    fields = CustomUserCreationForm.base_fields
+    choices = {
+        name: [value for value, _ in fields[name].choices if value != reference.PLACEHOLDER[0]]
+        for name in ('race', 'disability', 'home_language', 'employment_status', 'unemployed_period',
+                     'highest_school_qualification')
+    }
+    keys = {name: [row.pk for row in reference.table(model).rows] for name, model in reference.PROFILE_FIELDS.items()}
+    municipalities = {}
+    for row in reference.table(Municipality).rows:
+        municipalities.setdefault(row.province_id, []).append(row.pk)
+    constants = {
+        # Hashed once: every seeded user shares the password.
+        'password': make_password(password),
+        'date_joined': connection.ops.adapt_datetimefield_value(timezone.now()),
+    }
+    return LearnerGenerator(seed, chunk_size, choices, keys, municipalities, constants, datetime.date.today())
+
+
+@contextmanager
+def deferred_indexes(models, first_user_id):
+    """
+    Drop the Meta.indexes of ``models`` (not unique constraints) and defer
+    the learner search index for the block, then build them again. Building
+    an index once over the loaded rows is much cheaper than updating it row
+    by row, as long as the load is large next to what is already there.
+    """
+    from django.db import connection
+
+    from . import search
+
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    try:
+        with search.deferred_index(first_user_id):
+            yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+
+
+def seed_users(count, seed=0, start=0, chunk_size=5000, workers=1, password='seeded-password',
+               defer_indexes=False, progress=None):
+    """
+    Insert ``count`` generated learners, rows ``start`` onwards, one
+    transaction per chunk. ``workers`` > 1 generates chunks in that many
+    processes while this one inserts. With ``defer_indexes`` the secondary
+    indexes are dropped and rebuilt once at the end rather than maintained
+    per row; that leaves every other query on the tables without them for
+    the whole load, so it is refused unless there are no users yet.
+    The report summary is recounted at the end. Each chunk journals its
+    learners as inserted. Returns the number of rows inserted.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from django.core.management.color import no_style
+    from django.db import connection, transaction
+    from django.db.models import Max
+
+    from django.utils import timezone
+
+    from . import changes, reporting
+    from .models import CustomUser, LearnerChange, LearnerProfile, LearnerSearch
+    from .sqlite import retry_on_lock
+
+    if start % chunk_size:
+        raise ValueError("start must be a multiple of chunk_size, so chunks line up with earlier runs.")
+    if defer_indexes and CustomUser.objects.exists():
+        raise ValueError("Indexes are only deferred when seeding an empty database.")
+    generator = make_generator(seed, chunk_size, password)
+    first_id = (CustomUser.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    first_chunk = start // chunk_size
+    jobs = []
+    for number, offset in enumerate(range(0, count, chunk_size)):
+        jobs.append((generator, first_chunk + number, first_id + offset, min(chunk_size, count - offset)))
+
+    statements = [
+        _insert_sql(CustomUser, USER_FIELDS),
+        _insert_sql(LearnerProfile, PROFILE_FIELDS),
+        _insert_sql(LearnerSearch, SEARCH_FIELDS),
+    ]
+    journal_sql = _insert_sql(LearnerChange, ('user_id', 'action', 'changed_at'))
+
+    @retry_on_lock
+    def insert(tables):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for sql, rows in zip(statements, tables):
+                cursor.executemany(sql, rows)
+            now = connection.ops.adapt_datetimefield_value(timezone.now())
+            cursor.executemany(journal_sql, [(user[0], changes.INSERTED, now) for user in tables[0]])
+
+    inserted = 0
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    indexes = deferred_indexes([CustomUser, LearnerProfile], first_id) if defer_indexes else nullcontext()
+    try:
+        chunks = executor.map(_generate, jobs) if executor else map(_generate, jobs)
+        with indexes:
+            for _, tables in chunks:
+                insert(tables)
+                inserted += len(tables[0])
+                if progress:
+                    progress(inserted)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    # Explicit keys leave PostgreSQL's sequence behind.
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [CustomUser]):
+            cursor.execute(sql)
+    # One GROUP BY over the table beats an update per combination seeded.
+    reporting.rebuild()
+    return inserted
@@ -0,0 +1,146 @@
+"""
+Session engine: Django's cached_db sessions, read from the cache and written
+through to django_session, minus the writes that change nothing. Without a
+cache shared by every worker (SESSION_CACHED) it reads django_session
+directly and only skips the writes.
+
+SessionMiddleware saves a session whenever it is marked modified, or on
+every request with SESSION_SAVE_EVERY_REQUEST, even if the data is what was
+loaded. This store remembers the data and expiry date last read or written
+and skips a save when the data is unchanged and the stored expiry is less
+than SESSION_EXPIRY_REFRESH_INTERVAL seconds behind the new one. Sliding
+expiry then costs one write per interval instead of one per request, and a
+session can end up to that long before its cookie does.
+
+The default locmem cache is per process: a session flushed at logout by
+one worker would live on in the others' caches until it expired, so the
+cache is only used when SESSION_CACHED says it is shared.
+
+Expired rows are deleted by `manage.py purge_sessions` (clearsessions does
+the same), a batch at a time along the expire_date index.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+from .sqlite import retry_on_lock
+
+KEY_PREFIX = 'user_app.sessions'
+
+
+class SessionStore(CachedDBStore):
+    """
+    Cache entries are ``(data, expire_date)``, so a session read from the
+    cache knows when its row expires.
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # (serialized data, expire_date) as in the database, once loaded.
+        self._stored = None
+        self._written = None
+        self._insert_pending = False
+
+    def _serialize(self, data):
+        return self.serializer().dumps(data)
+
+    def _cache_set(self, data, expire_date):
+        if settings.SESSION_CACHED:
+            self._cache.set(self.cache_key, (data, expire_date), self.get_expiry_age(expiry=expire_date))
+
+    def load(self):
+        entry = None
+        if settings.SESSION_CACHED:
+            try:
+                entry = self._cache.get(self.cache_key)
+            except Exception:
+                # Invalid keys raise on some backends; treat it as a miss.
+                pass
+        if entry is not None:
+            data, expire_date = entry
+        else:
+            session = self._get_session_from_db()
+            if session is None:
+                self._stored = None
+                return {}
+            data, expire_date = self.decode(session.session_data), session.expire_date
+            self._cache_set(data, expire_date)
+        self._stored = (self._serialize(data), expire_date)
+        return data
+
+    def _unchanged(self):
+        data = self._session
+        if self._stored is None or self.session_key is None:
+            return False
+        serialized, expire_date = self._stored
+        refresh = timedelta(seconds=settings.SESSION_EXPIRY_REFRESH_INTERVAL)
+        return self._serialize(data) == serialized and self.get_expiry_date() - expire_date < refresh
+
+    def create_model_instance(self, data):
+        instance = super().create_model_instance(data)
+        self._written = (data, instance.expire_date)
+        return instance
+
+    def cycle_key(self):
+        """
+        Move the data to a new key whose row is inserted by the next save(),
+        at the end of the request, instead of inserting it here for that
+        save to update straight away (login() cycles the key, then adds the
+        user to the session).
+        """
+        data = self._session
+        key = self.session_key
+        self._session_key = self._get_new_session_key()
+        self._session_cache = data
+        self._stored = None
+        self._insert_pending = True
+        self.modified = True
+        if key:
+            self.delete(key)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if self._insert_pending:
+            while True:
+                try:
+                    DBStore.save(self, must_create=True)
+                    break
+                except CreateError:
+                    self._session_key = self._get_new_session_key()
+            self._insert_pending = False
+        elif not must_create and self._unchanged():
+            return
+        else:
+            DBStore.save(self, must_create)
+        data, expire_date = self._written
+        self._cache_set(data, expire_date)
+        self._stored = (self._serialize(data), expire_date)
+
+    @classmethod
+    def clear_expired(cls):
+        purge_expired(batch_size=settings.SESSION_PURGE_BATCH_SIZE)
+
+
+def purge_expired(batch_size=1000, now=None, progress=None):
+    """
+    Delete the sessions that expired before ``now``, oldest first,
+    ``batch_size`` rows per DELETE so no statement holds the table for
+    long. Returns the number deleted.
+    """
+    Session = SessionStore.get_model_class()
+    now = now or timezone.now()
+    expired = Session.objects.filter(expire_date__lt=now).order_by('expire_date').values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        keys = list(expired[:batch_size])
+        if not keys:
+            return deleted
+        deleted += retry_on_lock(Session.objects.filter(pk__in=keys).delete)()[0]
+        if progress:
+            progress(deleted)
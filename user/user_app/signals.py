@@ -0,0 +1,96 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import changes, reference, reporting, search
+from .exports import EXPORT_FIELDS
+from .models import CustomUser, LearnerProfile, Municipality, Nationality, OccupationLevel, OFOOccupation, Province, Qualification
+from .user_cache import invalidate_user
+
+REFERENCE_MODELS = (Province, Municipality, Nationality, OccupationLevel, Qualification, OFOOccupation)
+
+# The fields copied into LearnerSearch, by model.
+SEARCH_FIELDS = {
+    CustomUser: {'first_name', 'last_name', 'email'},
+    LearnerProfile: {'id_or_passport', 'student_number', 'learner_enrollment_number'},
+}
+
+# The user columns exports write; saves of others aren't journalled.
+EXPORTED_USER_FIELDS = frozenset(EXPORT_FIELDS).intersection(field.name for field in CustomUser._meta.concrete_fields)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+@receiver(m2m_changed, sender=CustomUser.user_permissions.through)
+def invalidate_cached_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # group.user_set.clear(): after the clear nobody is left to invalidate.
+        for pk in instance.user_set.values_list('pk', flat=True):
+            invalidate_user(pk)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        for pk in (pk_set or ()) if reverse else [instance.pk]:
+            invalidate_user(pk)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=LearnerProfile)
+def update_learner_search(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login alone; don't reindex for that.
+    if update_fields is not None and not SEARCH_FIELDS[sender].intersection(update_fields):
+        return
+    search.index_users([instance.pk])
+
+
+@receiver(post_save, sender=CustomUser)
+def record_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        changes.record([instance.pk], changes.INSERTED)
+    elif update_fields is None or EXPORTED_USER_FIELDS.intersection(update_fields):
+        changes.record([instance.pk], changes.UPDATED)
+
+
+@receiver(post_save, sender=LearnerProfile)
+@receiver(post_delete, sender=LearnerProfile)
+def record_profile_change(sender, instance, **kwargs):
+    # Every profile column is exported. A new user's profile adds an
+    # entry the user's insert already covers.
+    changes.record([instance.pk], changes.UPDATED)
+
+
+@receiver(post_delete, sender=CustomUser)
+def record_user_deletion(sender, instance, **kwargs):
+    changes.record([instance.pk], changes.DELETED)
+
+
+@receiver(pre_save, sender=LearnerProfile)
+def remember_summary_key(sender, instance, update_fields=None, **kwargs):
+    # The counts the profile leaves when it is saved; a new one leaves none.
+    instance._summary_key = None
+    if not instance._state.adding and (update_fields is None or reporting.SOURCE_FIELDS.intersection(update_fields)):
+        instance._summary_key = reporting.stored_key(instance.pk)
+
+
+@receiver(post_save, sender=LearnerProfile)
+def update_learner_summary(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not reporting.SOURCE_FIELDS.intersection(update_fields):
+        return
+    reporting.move(instance._summary_key, reporting.key_for(instance))
+
+
+@receiver(post_delete, sender=LearnerProfile)
+def remove_from_learner_summary(sender, instance, **kwargs):
+    # Also sent for the profile when its user is deleted.
+    reporting.move(reporting.key_for(instance), None)
+
+
+def invalidate_reference_table(sender, **kwargs):
+    reference.invalidate(sender)
+
+
+for model in REFERENCE_MODELS:
+    post_save.connect(invalidate_reference_table, sender=model, dispatch_uid=f'reference_save_{model.__name__}')
+    post_delete.connect(invalidate_reference_table, sender=model, dispatch_uid=f'reference_delete_{model.__name__}')
@@ -0,0 +1,103 @@
+"""
+SQLite tuning for concurrent writers.
+
+configure_connection() runs on every new connection (see apps.py) and
+applies settings.SQLITE_PRAGMAS: WAL, so readers don't block the writer and
+a commit is an append to the log; synchronous=NORMAL, which is durable
+across application crashes in WAL mode and fsyncs only at checkpoints;
+memory-mapped reads, a bigger page cache, and busy_timeout, so a writer
+waits for the lock rather than failing at once.
+
+SQLite still runs one write transaction at a time, and a transaction that
+read before writing can't wait for the lock at all: it fails with
+"database is locked" when another writer got in first. retry_on_lock()
+runs such a unit of work again after a randomized, exponentially growing
+delay, so writers that collided don't collide again in lockstep. It only
+retries outside any transaction: inside one, the work already done would be
+lost, so the error propagates to whoever owns the outer block.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+LOCK_MESSAGES = ('database is locked', 'database table is locked')
+
+_stats_lock = threading.Lock()
+_stats = {'retries': 0, 'gave_up': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def lock_stats():
+    """
+    Retry counters for this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_lock_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    if connection.is_in_memory_db():
+        # Neither applies to a database without a file.
+        pragmas.pop('journal_mode', None)
+        pragmas.pop('mmap_size', None)
+    if connection.alias in settings.DATABASE_REPLICAS:
+        # Read-only: the journal mode is the primary's to set.
+        pragmas.pop('journal_mode', None)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCK_MESSAGES)
+
+
+def _in_transaction():
+    return any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+
+def retry_on_lock(func):
+    """
+    Decorate a unit of database work (a transaction, or a single write in
+    autocommit mode) so it is run again, up to SQLITE_LOCK_RETRIES times,
+    when SQLite reports the database locked. The n-th retry waits a random
+    time of up to SQLITE_LOCK_RETRY_DELAY * 2 ** n seconds.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e) or _in_transaction():
+                    raise
+                if attempt >= settings.SQLITE_LOCK_RETRIES:
+                    _count('gave_up')
+                    raise
+            _count('retries')
+            delay = random.uniform(0, settings.SQLITE_LOCK_RETRY_DELAY * 2 ** attempt)
+            attempt += 1
+            logger.info(f"Database locked in {func.__qualname__}; retry {attempt} in {delay * 1000:.0f} ms")
+            time.sleep(delay)
+    return wrapper
@@ -0,0 +1,99 @@
+"""
+Expiring temporary passwords that were never changed.
+
+Login only checks temporary_password_expires lazily: within
+TEMP_PASSWORD_GRACE of expiry a user can still log in and is asked for a
+new password. `manage.py expire_temp_passwords` deals with the accounts past
+that: their password becomes unusable and their expiry is cleared, which
+also takes them out of the partial index the sweep reads
+(user_temp_password_idx), so each run only sees the accounts still due.
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import escape, strip_tags
+
+from .models import CustomUser, OutboundEmail
+from .sqlite import retry_on_lock
+from .user_cache import invalidate_users
+
+
+def expired_accounts(cutoff):
+    """
+    Users whose temporary password expired before ``cutoff``, oldest first.
+    """
+    return CustomUser.objects.filter(
+        must_change_password=True, temporary_password_expires__lt=cutoff,
+    ).order_by('temporary_password_expires')
+
+
+# Stands in for the first name while the reminder is rendered.
+_NAME = '\x00first_name\x00'
+
+
+def _reminders(users):
+    """
+    Reminder emails for ``(pk, email, first_name)`` rows. Only the name
+    differs between them, so the template is rendered once and the
+    (escaped, as the template would have it) name substituted per user.
+    """
+    html_message = render_to_string('temp_password_expired.html', {'user': {'first_name': _NAME}})
+    body = strip_tags(html_message)
+    outbound = []
+    for pk, email, first_name in users:
+        name = escape(first_name or '')
+        outbound.append(OutboundEmail(
+            user_id=pk,
+            to_email=email,
+            subject="Your Temporary Password Has Expired",
+            body=body.replace(_NAME, name),
+            html_body=html_message.replace(_NAME, name),
+        ))
+    return outbound
+
+
+@retry_on_lock
+def _expire_batch(cutoff, batch_size, unusable, remind):
+    with transaction.atomic():
+        users = list(
+            expired_accounts(cutoff).select_for_update(skip_locked=True)
+            .values_list('pk', 'email', 'first_name')[:batch_size]
+        )
+        if users:
+            ids = [pk for pk, _, _ in users]
+            CustomUser.objects.filter(pk__in=ids).update(
+                password=unusable, temporary_password_expires=None, updated_at=timezone.now(),
+            )
+            invalidate_users(ids)
+            if remind:
+                OutboundEmail.objects.bulk_create(_reminders(users))
+    return users
+
+
+def expire_temporary_passwords(batch_size=None, grace=None, remind=False, now=None, progress=None):
+    """
+    Make the temporary passwords that expired more than ``grace`` ago
+    unusable, ``batch_size`` accounts per transaction: one UPDATE per batch,
+    plus one INSERT of reminder emails with ``remind``. Returns
+    ``{'expired': ..., 'reminded': ...}``.
+    """
+    batch_size = batch_size or settings.TEMP_PASSWORD_SWEEP_BATCH_SIZE
+    if grace is None:
+        grace = datetime.timedelta(seconds=settings.TEMP_PASSWORD_GRACE)
+    cutoff = (now or timezone.now()) - grace
+    # Unusable hashes never match a password, so every row can share one.
+    unusable = make_password(None)
+    result = {'expired': 0, 'reminded': 0}
+    while True:
+        users = _expire_batch(cutoff, batch_size, unusable, remind)
+        if not users:
+            return result
+        if remind:
+            result['reminded'] += len(users)
+        result['expired'] += len(users)
+        if progress:
+            progress(result)
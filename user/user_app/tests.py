@@ -1,3 +1,1400 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import sqlite3
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import MD5PasswordHasher, make_password
+from django.contrib.auth.models import Group, Permission
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.db import OperationalError, connection, connections, router
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+
+from .benchmarks import create_learners, measure_requests, registration_payload
+from .importers import import_learners, read_learner_rows
+from .mail import dispatch_queued_mail, queue_mail
+from . import changes, reference
+from .models import CustomUser, ExportCheckpoint, LearnerChange, OutboundEmail, Province
+from .queries import CANONICAL_QUERIES, explain
+from .routers import replica_healthy, reset_replica_health
+from .sessions import SessionStore
+from .sqlite import lock_stats, reset_lock_stats, retry_on_lock
+from .throttling import SlidingWindowLimiter, client_ip, reset_throttle_stats, throttle_stats
+from .urls import auth_urlpatterns
+from .user_cache import cache_stats, reset_cache_stats
+
+
+class CountingHasher(MD5PasswordHasher):
+    calls = 0
+
+    def encode(self, password, salt):
+        CountingHasher.calls += 1
+        return super().encode(password, salt)
+
+
+# The site with the async auth views, as user/asgi.py serves it.
+urlpatterns = [*auth_urlpatterns(async_views=True), path('', include('user_app.urls'))]
+
+
+class BrokenEmailBackend(LocmemEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP unavailable")
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class OutboundEmailTests(TestCase):
+
+    def test_register_queues_instead_of_sending(self):
+        response = self.client.post('/register/', registration_payload(1))
+        self.assertRedirects(response, '/login/')
+        self.assertEqual(len(mail.outbox), 0)
+        user = CustomUser.objects.get(email='learner1@example.com')
+        outbound = OutboundEmail.objects.get(user=user)
+        self.assertEqual(outbound.status, OutboundEmail.STATUS_QUEUED)
+        self.assertEqual(outbound.to_email, user.email)
+
+    def test_dispatch_sends_batch_and_clears_body(self):
+        for i in range(3):
+            queue_mail("Subject", "temporary password", f"user{i}@example.com")
+        result = dispatch_queued_mail(batch_size=10)
+        self.assertEqual(result, {'sent': 3, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+        self.assertFalse(OutboundEmail.objects.exclude(body='').exists())
+
+    @override_settings(EMAIL_BACKEND='user_app.tests.BrokenEmailBackend')
+    def test_failed_send_backs_off_then_gives_up(self):
+        outbound = queue_mail("Subject", "body", "user@example.com", html_message="<p>body</p>")
+        result = dispatch_queued_mail(max_attempts=2)
+        self.assertEqual(result['retried'], 1)
+        outbound.refresh_from_db()
+        self.assertEqual((outbound.attempts, outbound.body), (1, "body"))
+        self.assertGreater(outbound.next_attempt_at, timezone.now())
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        result = dispatch_queued_mail(max_attempts=2)
+        self.assertEqual(result['failed'], 1)
+        outbound.refresh_from_db()
+        self.assertEqual(outbound.status, OutboundEmail.STATUS_FAILED)
+        self.assertIn("SMTP unavailable", outbound.last_error)
+        self.assertEqual((outbound.body, outbound.html_body), ('', ''))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportLearnersTests(TestCase):
+
+    def write_csv(self, rows):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(registration_payload(0)))
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_import_csv_reports_bad_rows(self):
+        bad = dict(registration_payload(2), contact_number='12')
+        duplicate = registration_payload(1)
+        path = self.write_csv([registration_payload(1), bad, registration_payload(3), duplicate])
+        errors = []
+        stats = import_learners(read_learner_rows(path), lambda *error: errors.append(error), chunk_size=2, workers=2)
+        self.assertEqual(stats, {'rows': 4, 'created': 2, 'rejected': 2})
+        self.assertEqual([(row, field) for row, field, _ in errors], [(3, 'contact_number'), (5, 'email')])
+        user = CustomUser.objects.get(email='learner3@example.com')
+        self.assertTrue(user.must_change_password)
+        self.assertTrue(user.has_usable_password())
+        self.assertEqual(OutboundEmail.objects.filter(user=user).count(), 1)
+
+    def test_dry_run_creates_nothing(self):
+        path = self.write_csv([registration_payload(1)])
+        stats = import_learners(read_learner_rows(path), lambda *error: None, dry_run=True)
+        self.assertEqual(stats, {'rows': 1, 'created': 0, 'rejected': 0})
+        self.assertFalse(CustomUser.objects.exists())
+
+    def test_import_xlsx(self):
+        from openpyxl import Workbook
+
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        payload = registration_payload(1)
+        workbook = Workbook()
+        workbook.active.append(list(payload))
+        workbook.active.append([None if value == '' else value for value in payload.values()])
+        workbook.save(path)
+
+        stats = import_learners(read_learner_rows(path), lambda *error: None, send_emails=False)
+        self.assertEqual(stats['created'], 1)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+class ExportLearnersTests(TestCase):
+
+    def setUp(self):
+        create_learners(3)
+        self.staff = CustomUser.objects.create_user(email="staff@example.com", password="foo", is_staff=True)
+
+    def test_staff_csv_export_streams_selected_fields(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/export/learners/', {'fields': 'email,province'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'email,province')
+        self.assertEqual(lines[1], 'learner0@example.com,gauteng')
+        self.assertEqual(len(lines), 5)
+
+    def test_xlsx_export_and_unknown_field(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/export/learners/', {'format': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+        response = self.client.get('/export/learners/', {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_staff(self):
+        self.client.force_login(CustomUser.objects.get(email="learner0@example.com"))
+        response = self.client.get('/export/learners/')
+        self.assertEqual(response.status_code, 302)
+
+
+class LearnerProfileTests(TestCase):
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_register_creates_profile(self):
+        self.client.post('/register/', registration_payload(1))
+        user = CustomUser.objects.get(email='learner1@example.com')
+        self.assertEqual(user.first_name, 'Thandi')
+        self.assertEqual(user.profile.province.code, 'gauteng')
+        self.assertEqual(user.profile.student_number, '201912345')
+
+    def test_profile_validation_uses_model_rules(self):
+        from .forms import CustomUserCreationForm
+
+        form = CustomUserCreationForm(data=dict(registration_payload(1), OFO_specialization='x' * 60))
+        self.assertFalse(form.is_valid())
+        self.assertIn('OFO_specialization', form.errors)
+
+    def test_profile_loads_on_demand(self):
+        create_learners(1)
+        pk = CustomUser.objects.get().pk
+        with self.assertNumQueries(1):
+            user = CustomUser.objects.get(pk=pk)
+        self.assertNotIn('province', [field.name for field in CustomUser._meta.concrete_fields])
+        gauteng = Province.objects.get(code='gauteng')
+        with self.assertNumQueries(1):
+            self.assertEqual(user.profile.province_id, gauteng.pk)
+
+
+class CanonicalQueryPlanTests(TestCase):
+
+    def test_canonical_queries_use_indexes(self):
+        for query in CANONICAL_QUERIES:
+            with self.subTest(query=query.name):
+                plan, full_scan = explain(query)
+                self.assertTrue(query.allow_scan or not full_scan, plan)
+
+
+@override_settings(USER_CACHE_TIMEOUT=300)
+class SessionUserCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.user = CustomUser.objects.create_user(email="cached@example.com", password="foo", first_name="Lindiwe")
+        self.client.force_login(self.user)
+
+    def test_page_views_hit_the_cache(self):
+        self.client.get('/home/')
+        # Only the session is read from the database once the user is cached.
+        with self.assertNumQueries(1):
+            response = self.client.get('/home/')
+        self.assertContains(response, "Lindiwe")
+        self.assertEqual(cache_stats()['hits'], 1)
+
+    def test_save_invalidates(self):
+        self.client.get('/home/')
+        self.user.first_name = "Ayanda"
+        self.user.save()
+        with self.assertNumQueries(2):
+            response = self.client.get('/home/')
+        self.assertContains(response, "Ayanda")
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.client.get('/home/')
+        self.user.set_password("bar")
+        self.user.save()
+        response = self.client.get('/logout/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_group_and_permission_changes_invalidate(self):
+        before = cache_stats()['invalidations']
+        group = Group.objects.create(name="staff")
+        group.user_set.add(self.user)
+        self.assertEqual(cache_stats()['invalidations'], before + 1)
+        self.user.user_permissions.add(Permission.objects.first())
+        group.user_set.clear()
+        self.assertEqual(cache_stats()['invalidations'], before + 3)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    LOGIN_THROTTLE_RATES={'ip': (10, 300), 'email': (3, 300)},
+)
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_throttle_stats()
+        CustomUser.objects.create_user(email="learner@example.com", password="right")
+
+    def test_email_is_blocked_after_failures_without_touching_the_db(self):
+        for _ in range(3):
+            response = self.client.post('/login/', {'email': 'Learner@example.com ', 'password': 'wrong'})
+            self.assertEqual(response.status_code, 200)
+        request = RequestFactory().post('/login/')
+        with self.assertNumQueries(0):
+            self.assertIsNone(authenticate(request, email='learner@example.com', password='right'))
+        self.assertTrue(request.login_throttled)
+        response = self.client.post('/login/', {'email': 'learner@example.com', 'password': 'right'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(throttle_stats()['blocked'], 2)
+
+    def test_ip_is_blocked_across_emails(self):
+        for i in range(10):
+            self.client.post('/login/', {'email': f'unknown{i}@example.com', 'password': 'x'})
+        response = self.client.post('/login/', {'email': 'learner@example.com', 'password': 'right'})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(LOGIN_THROTTLE_TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_clients_behind_a_trusted_proxy_have_their_own_ip_bucket(self):
+        proxy = {'REMOTE_ADDR': '10.0.0.2'}
+        for i in range(10):
+            self.client.post('/login/', {'email': f'unknown{i}@example.com', 'password': 'x'},
+                             HTTP_X_FORWARDED_FOR='203.0.113.7, 10.0.0.1', **proxy)
+        blocked = self.client.post('/login/', {'email': 'learner@example.com', 'password': 'right'},
+                                   HTTP_X_FORWARDED_FOR='203.0.113.7', **proxy)
+        self.assertEqual(blocked.status_code, 429)
+        # A forged leftmost hop doesn't escape the proxy's own entry.
+        forged = self.client.post('/login/', {'email': 'learner@example.com', 'password': 'right'},
+                                  HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.7', **proxy)
+        self.assertEqual(forged.status_code, 429)
+        other = self.client.post('/login/', {'email': 'learner@example.com', 'password': 'right'},
+                                 HTTP_X_FORWARDED_FOR='203.0.113.8', **proxy)
+        self.assertRedirects(other, '/home/', fetch_redirect_response=False)
+        # From anywhere else the header is ignored.
+        self.assertEqual(client_ip(RequestFactory().get('/', HTTP_X_FORWARDED_FOR='203.0.113.8')), '127.0.0.1')
+
+    def test_successful_login_is_not_counted(self):
+        for _ in range(5):
+            response = self.client.post('/login/', {'email': 'learner@example.com', 'password': 'right'})
+            self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+
+    def test_sliding_window_decays(self):
+        limiter = SlidingWindowLimiter('test', limit=4, window=100)
+        for _ in range(4):
+            limiter.hit('client', now=1000)
+        self.assertTrue(limiter.blocked('client', now=1050))
+        # Half-way through the next window half of the old hits still count.
+        self.assertEqual(limiter.count('client', now=1150), 2)
+        self.assertFalse(limiter.blocked('client', now=1150))
+
+
+class EmailBackendTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(PASSWORD_HASHERS=['user_app.tests.CountingHasher'])
+    def test_unknown_and_known_users_cost_one_hash(self):
+        CustomUser.objects.create_user(email="known@example.com", password="right")
+        for email in ("known@example.com", "unknown@example.com"):
+            CountingHasher.calls = 0
+            with self.assertNumQueries(1):
+                self.assertIsNone(authenticate(email=email, password="wrong"))
+            self.assertEqual(CountingHasher.calls, 1, email)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_only_auth_columns_are_loaded(self):
+        CustomUser.objects.create_user(email="known@example.com", password="right", first_name="Zola")
+        user = authenticate(email="known@example.com", password="right")
+        self.assertEqual(user.get_deferred_fields(), {
+            'first_name', 'last_name', 'is_staff', 'is_superuser', 'date_joined', 'created_at', 'updated_at',
+        })
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_inactive_user_is_rejected(self):
+        CustomUser.objects.create_user(email="known@example.com", password="right", is_active=False)
+        self.assertIsNone(authenticate(email="known@example.com", password="right"))
+
+    @override_settings(PASSWORD_HASHERS=['user_app.hashers.TunedPBKDF2PasswordHasher'])
+    def test_login_upgrades_hash_to_configured_cost(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            CustomUser.objects.create_user(email="known@example.com", password="right")
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertIsNotNone(authenticate(email="known@example.com", password="right"))
+        self.assertTrue(CustomUser.objects.get().password.startswith('pbkdf2_sha256$2000$'))
+
+
+class MeasureRequestsTests(TestCase):
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_reports_latency_queries_and_allocations(self):
+        cache.clear()
+        self.client.force_login(CustomUser.objects.create_user(email="viewer@example.com", password="x"))
+        calls = []
+
+        def send(i):
+            calls.append(i)
+            self.client.get('/home/')
+
+        stats = measure_requests(send, 5, start=2, traced=3)
+        self.assertEqual(calls, [2, 3, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(stats['count'], 5)
+        # The first view loads the user; the rest come from the user cache.
+        self.assertEqual(stats['queries_per_request'], 1 / 5 + 1)
+        self.assertGreater(stats['requests_per_sec'], 0)
+        self.assertGreater(stats['alloc_peak_kb'], 0)
+
+
+class ProfilingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.log = os.path.join(tempfile.mkdtemp(), 'profile.jsonl')
+
+    def read_log(self):
+        with open(self.log) as f:
+            return [json.loads(line) for line in f]
+
+    def test_requests_are_not_profiled_by_default(self):
+        with self.settings(REQUEST_PROFILING_LOG=self.log):
+            response = self.client.get('/login/', HTTP_X_PROFILE='1')
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_header_profiles_request_when_debug(self):
+        with self.settings(REQUEST_PROFILING_LOG=self.log, DEBUG=True):
+            response = self.client.get('/login/', HTTP_X_PROFILE='1')
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        [record] = self.read_log()
+        self.assertEqual((record['method'], record['view'], record['status']), ('GET', 'login', 200))
+        self.assertGreater(record['template_ms'], 0)
+        self.assertTrue(record['functions'])
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_counts_queries_and_report_aggregates(self):
+        self.client.force_login(CustomUser.objects.create_user(email="viewer@example.com", password="x"))
+        with self.settings(REQUEST_PROFILING=True, REQUEST_PROFILING_LOG=self.log):
+            self.client.get('/home/')
+            self.client.get('/home/')
+        records = self.read_log()
+        self.assertEqual([record['sql_count'] for record in records], [2, 1])
+
+        out = io.StringIO()
+        call_command('profile_report', log=self.log, stdout=out)
+        self.assertIn('GET home', out.getvalue())
+
+
+class RegistrationValidationTests(TestCase):
+
+    def test_form_reports_every_error_at_once(self):
+        from .forms import CustomUserCreationForm
+
+        data = dict(registration_payload(1), student_number='12', province='atlantis', birth_date='2999-01-01')
+        form = CustomUserCreationForm(data=data)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {'student_number', 'province', 'birth_date'})
+        # Both the min_length and the regex validator ran.
+        self.assertEqual(len(form.errors['student_number']), 2)
+
+    def test_form_instances_share_fields_without_leaking_data(self):
+        from .forms import CustomUserCreationForm
+
+        first = CustomUserCreationForm(data=registration_payload(1))
+        second = CustomUserCreationForm(data=dict(registration_payload(2), province='atlantis'))
+        self.assertIs(first.fields['province'], second.fields['province'])
+        self.assertTrue(first.is_valid())
+        self.assertFalse(second.is_valid())
+        self.assertEqual(first.cleaned_data['email'], 'learner1@example.com')
+
+    def test_api_validates_json_payload(self):
+        CustomUser.objects.create_user(email="learner1@example.com", password="x")
+        payload = dict(registration_payload(1), contact_number='12')
+        response = self.client.post('/api/register/validate/', json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertFalse(body['valid'])
+        self.assertEqual(set(body['errors']), {'email', 'contact_number'})
+        self.assertEqual(body['errors']['email'][0]['code'], 'unique')
+
+        response = self.client.post('/api/register/validate/', json.dumps(registration_payload(2)), content_type='application/json')
+        self.assertEqual(response.json(), {'valid': True, 'errors': {}})
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+    def test_api_rejects_non_object_body(self):
+        response = self.client.post('/api/register/validate/', '[1, 2]', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RegisterPageCachingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unbound_form_fragment_is_cached_but_csrf_token_is_not(self):
+        from django.test import Client
+
+        first = Client().get('/register/')
+        self.assertTemplateUsed(first, 'register_fields.html')
+        second = Client().get('/register/')
+        self.assertTemplateNotUsed(second, 'register_fields.html')
+        self.assertContains(second, 'name="nationality"')
+        self.assertNotEqual(first.context['csrf_token'], second.context['csrf_token'])
+        self.assertContains(second, str(second.context['csrf_token']))
+
+    def test_bound_form_is_rendered_with_its_values(self):
+        self.client.get('/register/')
+        response = self.client.post('/register/', dict(registration_payload(1), contact_number='12'))
+        self.assertTemplateUsed(response, 'register_fields.html')
+        self.assertContains(response, '<option value="gauteng" selected>Gauteng</option>')
+        self.assertContains(response, 'value="afghanistan"')
+
+    def test_precomputed_select_matches_stock_select(self):
+        from django import forms
+        from .widgets import PrecomputedSelect
+
+        choices = [('select', 'Select'), ('a&b', 'A & B'), ('c', 'C')]
+        for value in (None, 'a&b', 'c'):
+            stock = forms.Select(choices=choices).render('x', value, {'id': 'id_x'})
+            precomputed = PrecomputedSelect(choices=choices).render('x', value, {'id': 'id_x'})
+            self.assertHTMLEqual(precomputed, stock)
+
+
+class ReferenceTableTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Rows created by a test are rolled back; don't let them outlive it.
+        self.addCleanup(reference.invalidate, Province)
+
+    def test_choices_are_served_from_memory(self):
+        reference.choices(Province)
+        with self.assertNumQueries(0):
+            choices = reference.choices(Province)
+            gauteng = reference.get_by_code(Province, 'gauteng')
+        self.assertEqual(choices[0], reference.PLACEHOLDER)
+        self.assertIn(('gauteng', 'Gauteng'), choices)
+        self.assertEqual(reference.code_for(Province, gauteng.pk), 'gauteng')
+
+    def test_saving_a_row_invalidates_the_table(self):
+        before = reference.version()
+        Province.objects.create(code='offshore', name='Offshore')
+        self.assertNotEqual(reference.version(), before)
+        self.assertIsNotNone(reference.get_by_code(Province, 'offshore'))
+
+    def test_placeholder_and_unknown_codes_are_rejected(self):
+        from .forms import validate_registration
+
+        for code in ('select', 'atlantis'):
+            _, errors = validate_registration(dict(registration_payload(1), province=code))
+            self.assertIn('province', errors)
+
+
+class ReferenceTypeaheadTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_prefix_matches_any_word_of_name_or_code(self):
+        response = self.client.get('/api/reference/municipality/', {'q': 'matl'})
+        self.assertEqual([row['name'] for row in response.json()['results']],
+                         ['City of Matlosana Local Municipality-NW403'])
+        response = self.client.get('/api/reference/municipality/', {'q': 'NW3'})
+        self.assertEqual(response.json()['count'], 1)
+        response = self.client.get('/api/reference/nationality/', {'q': 'SOUTH af'})
+        self.assertIn('south africa', [row['code'] for row in response.json()['results']])
+
+    def test_pagination_and_province_filter(self):
+        first = self.client.get('/api/reference/nationality/', {'q': 's', 'page_size': 2}).json()
+        second = self.client.get('/api/reference/nationality/', {'q': 's', 'page_size': 2, 'page': 2}).json()
+        self.assertEqual(len(first['results']), 2)
+        self.assertTrue(first['has_next'])
+        self.assertNotEqual(first['results'], second['results'])
+        response = self.client.get('/api/reference/municipality/', {'province': 'gauteng'})
+        self.assertEqual(response.json()['count'], 0)
+        response = self.client.get('/api/reference/municipality/', {'province': 'north_west'})
+        self.assertEqual(response.json()['count'], 3)
+
+    def test_cache_headers_and_revalidation(self):
+        response = self.client.get('/api/reference/nationality/', {'q': 'a'})
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+        again = self.client.get('/api/reference/nationality/', {'q': 'a'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(self.client.get('/api/reference/unknown/').status_code, 404)
+
+    def test_form_accepts_name_as_well_as_code(self):
+        from .forms import validate_registration
+
+        cleaned, errors = validate_registration(dict(registration_payload(1), nationality='South Africa'))
+        self.assertNotIn('nationality', errors)
+        self.assertEqual(cleaned['nationality'].code, 'south africa')
+
+
+class LearnerSearchTests(TestCase):
+
+    def setUp(self):
+        create_learners(3)
+        self.staff = CustomUser.objects.create_user(email="staff@example.com", password="foo", is_staff=True,
+                                                    is_superuser=True)
+
+    def test_index_follows_saves_and_deletes(self):
+        from .search import SearchResults
+
+        learner = CustomUser.objects.get(email='learner1@example.com')
+        learner.first_name = 'Zanele'
+        learner.save()
+        self.assertEqual([user.pk for user in SearchResults('zan')[:10]], [learner.pk])
+        learner.profile.student_number = '77001122'
+        learner.profile.save()
+        self.assertEqual(SearchResults('7700').count(), 1)
+        learner.delete()
+        self.assertEqual(SearchResults('zanele').count(), 0)
+
+    def test_every_word_must_match_a_word_prefix(self):
+        from .search import SearchResults
+
+        self.assertEqual(SearchResults('learner1').count(), 1)
+        self.assertEqual(SearchResults('learner1 nobody').count(), 0)
+        self.assertEqual(SearchResults('').count(), 0)
+        self.assertEqual(SearchResults('"*:').count(), 0)
+
+    def test_staff_view_and_admin_changelist(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/staff/learners/search/', {'q': 'learner2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user.email for user in response.context['page']], ['learner2@example.com'])
+        response = self.client.get('/admin/user_app/customuser/', {'q': 'learner2'})
+        self.assertEqual([user.email for user in response.context['cl'].result_list], ['learner2@example.com'])
+
+    def test_search_requires_staff(self):
+        self.client.force_login(CustomUser.objects.get(email='learner0@example.com'))
+        self.assertEqual(self.client.get('/staff/learners/search/', {'q': 'x'}).status_code, 302)
+
+
+class AdminChangelistTests(TestCase):
+
+    def setUp(self):
+        create_learners(5)
+        self.staff = CustomUser.objects.create_superuser(email="admin@example.com", password="foo")
+        self.client.force_login(self.staff)
+
+    def test_changelist_filters_by_profile_facets(self):
+        gauteng = Province.objects.get(code='gauteng')
+        response = self.client.get('/admin/user_app/customuser/', {'province': gauteng.pk})
+        self.assertEqual(response.context['cl'].result_count, 5)
+        response = self.client.get('/admin/user_app/customuser/', {'employment_status': 'unemployed', 'is_active__exact': 1})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/admin/user_app/customuser/')
+        self.assertContains(response, 'Gauteng')
+        self.assertNotContains(response, '?email=')
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=2)
+    def test_count_stops_at_the_limit(self):
+        from .admin import EstimatedCountPaginator
+
+        self.assertEqual(EstimatedCountPaginator(CustomUser.objects.order_by('pk'), 2).count, CustomUser.objects.count())
+        self.assertEqual(EstimatedCountPaginator(CustomUser.objects.filter(is_staff=False).order_by('pk'), 2).count, 2)
+        response = self.client.get('/admin/user_app/customuser/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        cache.clear()
+        self.client.get('/admin/user_app/customuser/')
+        # Session, count and page; the user and the filter choices are cached.
+        with self.assertNumQueries(3):
+            self.client.get('/admin/user_app/customuser/')
+        create_learners(20, start=5)
+        with self.assertNumQueries(3):
+            self.client.get('/admin/user_app/customuser/')
+
+
+class SeedUsersTests(TestCase):
+
+    def test_generated_rows_pass_registration_validation(self):
+        from .forms import registration_schema
+        from .seeding import PROFILE_FIELDS, USER_FIELDS, make_generator
+
+        users, profiles, _ = make_generator(seed=7, chunk_size=50, password='x').chunk(0, 1, 50)
+        for user, profile in zip(users, profiles):
+            data = dict(zip(USER_FIELDS, user))
+            for name, value in zip(PROFILE_FIELDS, profile):
+                if name in reference.PROFILE_FIELDS:
+                    value = reference.code_for(reference.PROFILE_FIELDS[name], value)
+                data[name] = '' if value is None else str(value)
+            _, errors = registration_schema.clean(data)
+            self.assertEqual(errors, {}, data)
+
+    def test_same_seed_gives_same_rows(self):
+        from .seeding import make_generator
+
+        first = make_generator(seed=3, chunk_size=20, password='x').chunk(1, 100, 20)
+        second = make_generator(seed=3, chunk_size=20, password='x').chunk(1, 100, 20)
+        self.assertEqual(first[1], second[1])
+        self.assertEqual(first[2], second[2])
+
+    def test_seed_users_inserts_users_profiles_and_search_rows(self):
+        from .search import SearchResults
+        from .seeding import seed_users
+
+        self.assertEqual(seed_users(30, seed=1, chunk_size=10), 30)
+        user = CustomUser.objects.select_related('profile').order_by('pk').last()
+        self.assertTrue(user.check_password('seeded-password'))
+        self.assertEqual(SearchResults(user.profile.student_number).count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('seed_users', count=10, seed=1, chunk_size=10, stdout=io.StringIO())
+        # Dropping the indexes under existing learners is refused.
+        with self.assertRaisesMessage(CommandError, "empty database"):
+            call_command('seed_users', count=10, seed=1, start=30, chunk_size=10, defer_indexes=True,
+                         stdout=io.StringIO())
+
+
+class DeferredIndexSeedTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_deferred_indexes_are_rebuilt(self):
+        from django.db import connection
+        from .search import SearchResults
+
+        call_command('seed_users', count=20, seed=2, chunk_size=10, defer_indexes=True, stdout=io.StringIO())
+        user = CustomUser.objects.order_by('pk').last()
+        self.assertEqual(SearchResults(user.email).count(), 1)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'user_app_learnerprofile')
+        self.assertIn('profile_province_idx', constraints)
+        # The search triggers are back: later saves still reach the index.
+        user.first_name = 'Quintessa'
+        user.save()
+        self.assertEqual(SearchResults('quintessa').count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DerivedFieldsTests(TestCase):
+
+    def test_parse_sa_id(self):
+        import datetime
+        from .derived import parse_sa_id
+
+        today = datetime.date(2026, 10, 18)
+        self.assertEqual(parse_sa_id('0001150800082', today), (datetime.date(2000, 1, 15), 'female', True))
+        self.assertEqual(parse_sa_id('7005125800088', today), (datetime.date(1970, 5, 12), 'male', True))
+        self.assertIsNone(parse_sa_id('0001150800083', today))  # checksum
+        self.assertIsNone(parse_sa_id('0013150800089', today))  # month 13
+        self.assertIsNone(parse_sa_id('12345', today))
+
+    def test_register_derives_age_and_rejects_bad_id_numbers(self):
+        import datetime
+        from .derived import age_on
+        from .forms import validate_registration
+
+        self.client.post('/register/', dict(registration_payload(1), age='99', youth='no'))
+        profile = CustomUser.objects.get(email='learner1@example.com').profile
+        age = age_on(datetime.date(2000, 1, 15), datetime.date.today())
+        self.assertEqual((profile.age, profile.youth), (age, 'yes' if age <= 35 else 'no'))
+        self.assertEqual((profile.id_number_valid, profile.id_gender, profile.id_citizen), (True, 'female', True))
+
+        _, errors = validate_registration(dict(registration_payload(2), id_or_passport='0001150800083'))
+        self.assertEqual(set(errors), {'id_or_passport'})
+        _, errors = validate_registration(dict(registration_payload(2), birth_date='2000-01-16'))
+        self.assertEqual(set(errors), {'birth_date'})
+        _, errors = validate_registration(dict(registration_payload(2), id_type='passport', id_or_passport='0001150800083'))
+        self.assertEqual(errors, {})
+
+    def test_nightly_refresh_updates_only_stale_ages(self):
+        import datetime
+        from .derived import age_on, youth_for
+        from .models import LearnerProfile
+
+        create_learners(6)
+        birth_dates = [
+            datetime.date(2000, 2, 29), datetime.date(2001, 3, 1), datetime.date(1991, 2, 28),
+            datetime.date(1990, 3, 1), datetime.date(2011, 2, 28), datetime.date(1950, 1, 1),
+        ]
+        for profile, birth_date in zip(LearnerProfile.objects.order_by('pk'), birth_dates):
+            profile.birth_date = birth_date
+            profile.save()
+        for today in (datetime.date(2026, 2, 28), datetime.date(2028, 2, 29), datetime.date(2026, 3, 1)):
+            stdout = io.StringIO()
+            call_command('refresh_derived_fields', f'--date={today}', '--chunk-size=4', stdout=stdout)
+            for profile in LearnerProfile.objects.all():
+                age = age_on(profile.birth_date, today)
+                self.assertEqual((profile.age, profile.youth), (age, youth_for(age)), (profile.birth_date, today))
+        # Nothing is written when nothing changed.
+        stdout = io.StringIO()
+        call_command('refresh_derived_fields', '--date=2026-03-01', stdout=stdout)
+        self.assertIn("Updated the age of 0 profiles", stdout.getvalue())
+
+    def test_id_fields_are_backfilled_for_bulk_loaded_rows(self):
+        from .models import LearnerProfile
+
+        create_learners(3)
+        LearnerProfile.objects.update(id_number_valid=None, id_gender=None, age=None)
+        call_command('refresh_derived_fields', id_numbers=True, stdout=io.StringIO())
+        self.assertFalse(LearnerProfile.objects.exclude(id_number_valid=True, id_gender='female').exists())
+        self.assertFalse(LearnerProfile.objects.filter(age=None).exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LearnerReportTests(TestCase):
+
+    def setUp(self):
+        self.staff = CustomUser.objects.create_user(email="staff@example.com", password="foo", is_staff=True,
+                                                    is_superuser=True)
+
+    def assertMatchesRebuild(self):
+        from . import reporting
+
+        incremental = reporting.counts()
+        reporting.rebuild()
+        self.assertEqual(incremental, reporting.counts())
+        return incremental
+
+    def test_rebuild_counts_inside_its_transaction(self):
+        from . import reporting
+
+        create_learners(2)
+        with CaptureQueriesContext(connection) as queries:
+            reporting.rebuild()
+        sql = [query['sql'] for query in queries.captured_queries]
+        # The summary rows are deleted, taking the write lock, before the
+        # profiles are counted.
+        deleted = next(i for i, statement in enumerate(sql) if statement.startswith('DELETE'))
+        counted = next(i for i, statement in enumerate(sql) if 'user_app_learnerprofile' in statement)
+        self.assertLess(deleted, counted)
+        self.assertEqual(sum(reporting.counts().values()), 2)
+
+    def test_incremental_counts_match_a_full_rebuild(self):
+        from .models import LearnerProfile
+        from .seeding import seed_users
+
+        create_learners(4)
+        seed_users(30, seed=5, chunk_size=10)
+        self.client.post('/register/', registration_payload(10))
+        self.client.post('/register/', dict(registration_payload(11), province='limpopo', race='white'))
+        self.assertMatchesRebuild()
+
+        profiles = list(LearnerProfile.objects.order_by('pk')[:6])
+        profiles[0].province_id = Province.objects.get(code='free_state').pk
+        profiles[0].save()
+        profiles[1].gender = 'male'
+        profiles[1].save(update_fields=['gender'])
+        profiles[2].postal_code = '0001'
+        profiles[2].save(update_fields=['postal_code'])
+        profiles[3].learning_programe_name = ''
+        profiles[3].save()
+        profiles[4].user.delete()
+        profiles[5].delete()
+        counts = self.assertMatchesRebuild()
+        self.assertEqual(sum(counts.values()), LearnerProfile.objects.count())
+
+    def test_pivot_endpoint_json_and_csv(self):
+        create_learners(3)
+        self.client.post('/register/', dict(registration_payload(10), gender='male'))
+        self.client.force_login(self.staff)
+
+        response = self.client.get('/staff/reports/learners/', {'by': 'province,race', 'columns': 'gender'})
+        self.assertEqual(response.json(), {
+            'header': ['province', 'race', 'gender=female', 'gender=male', 'total'],
+            'rows': [['gauteng', 'african', 3, 1, 4]],
+            'total': 4,
+        })
+        response = self.client.get('/staff/reports/learners/', {'by': 'gender', 'gender': 'male', 'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response.content.decode().splitlines(), ['gender,learners', 'male,1'])
+        self.assertEqual(self.client.get('/staff/reports/learners/', {'by': 'email'}).status_code, 400)
+
+    def test_report_requires_staff(self):
+        create_learners(1)
+        self.client.force_login(CustomUser.objects.get(email='learner0@example.com'))
+        self.assertEqual(self.client.get('/staff/reports/learners/').status_code, 302)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ExpireTempPasswordsTests(TestCase):
+
+    def make_user(self, email, expires_in):
+        return CustomUser.objects.create_user(
+            email=email, password='temporary', must_change_password=True,
+            temporary_password_expires=timezone.now() + timezone.timedelta(hours=expires_in),
+        )
+
+    def test_only_accounts_past_the_grace_period_are_expired(self):
+        from .user_cache import get_cached_user
+
+        stale = [self.make_user(f'stale{i}@example.com', -24 * 30) for i in range(5)]
+        recent = self.make_user('recent@example.com', -1)
+        pending = self.make_user('pending@example.com', 1)
+        changed = self.make_user('changed@example.com', -24 * 30)
+        self.client.force_login(changed)
+        response = self.client.post('/change_password/', {
+            'old_password': 'temporary', 'new_password1': 'a-new-Passw0rd', 'new_password2': 'a-new-Passw0rd',
+        })
+        self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+        get_cached_user(stale[0].pk)
+
+        stdout = io.StringIO()
+        call_command('expire_temp_passwords', '--batch-size=2', '--remind', stdout=stdout)
+        self.assertIn("Expired 5 temporary passwords and queued 5 reminders", stdout.getvalue())
+        for user in stale:
+            user.refresh_from_db()
+            self.assertFalse(user.has_usable_password())
+            self.assertIsNone(user.temporary_password_expires)
+            self.assertTrue(user.must_change_password)
+        self.assertFalse(get_cached_user(stale[0].pk).has_usable_password())
+        for user in (recent, pending):
+            user.refresh_from_db()
+            self.assertTrue(user.check_password('temporary'))
+        changed.refresh_from_db()
+        self.assertTrue(changed.check_password('a-new-Passw0rd'))
+        self.assertFalse(changed.must_change_password)
+        self.assertIsNone(changed.temporary_password_expires)
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list('to_email', flat=True)),
+            sorted(user.email for user in stale),
+        )
+
+        stdout = io.StringIO()
+        call_command('expire_temp_passwords', stdout=stdout)
+        self.assertIn("Expired 0 temporary passwords and queued 0 reminders", stdout.getvalue())
+        self.assertEqual(OutboundEmail.objects.count(), 5)
+
+    def test_password_set_elsewhere_is_not_expired(self):
+        from django.contrib.auth.forms import AdminPasswordChangeForm
+        from .temp_passwords import expire_temporary_passwords
+
+        by_admin = self.make_user('admin-reset@example.com', -24 * 30)
+        form = AdminPasswordChangeForm(by_admin, {'password1': 'a-new-Passw0rd', 'password2': 'a-new-Passw0rd'})
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        by_command = self.make_user('command-reset@example.com', -24 * 30)
+        by_command.set_password('another-Passw0rd')
+        by_command.save(update_fields=['password'])
+
+        self.assertEqual(expire_temporary_passwords()['expired'], 0)
+        for user, password in ((by_admin, 'a-new-Passw0rd'), (by_command, 'another-Passw0rd')):
+            user.refresh_from_db()
+            self.assertTrue(user.check_password(password))
+            self.assertFalse(user.must_change_password)
+            self.assertIsNone(user.temporary_password_expires)
+
+
+@override_settings(ROOT_URLCONF='user_app.tests', PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncAuthViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_throttle_stats()
+
+    async def test_login_and_change_password(self):
+        await CustomUser.objects.acreate(email="learner@example.com", password=make_password("temporary"), must_change_password=True)
+        response = await self.async_client.get('/change_password/')
+        self.assertRedirects(response, '/login/?next=/change_password/', fetch_redirect_response=False)
+
+        response = await self.async_client.post('/login/', {'email': 'learner@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.post('/login/', {'email': 'learner@example.com', 'password': 'temporary'})
+        self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+
+        response = await self.async_client.post('/change_password/', {
+            'old_password': 'temporary', 'new_password1': 'a-new-Passw0rd', 'new_password2': 'a-new-Passw0rd',
+        })
+        self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+        user = await CustomUser.objects.aget()
+        self.assertTrue(user.check_password('a-new-Passw0rd'))
+        self.assertFalse(user.must_change_password)
+        # The session survived the password change.
+        response = await self.async_client.get('/change_password/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_sync_and_async_password_changes_agree(self):
+        for urlconf in ('user.urls', 'user_app.tests'):
+            with self.subTest(urlconf=urlconf), self.settings(ROOT_URLCONF=urlconf):
+                user = CustomUser.objects.create_user(
+                    email=f"{urlconf}@example.com", password="Temporary-pass-1", must_change_password=True,
+                    temporary_password_expires=timezone.now(),
+                )
+                self.client.force_login(user)
+                response = self.client.post('/change_password/', {
+                    'old_password': 'Temporary-pass-1', 'new_password1': 'Temporary-pass-1',
+                    'new_password2': 'Temporary-pass-1',
+                })
+                self.assertContains(response, "Old password cannot be the same as the new password.")
+                response = self.client.post('/change_password/', {
+                    'old_password': 'Temporary-pass-1', 'new_password1': 'a-new-Passw0rd', 'new_password2': 'a-new-Passw0rd',
+                })
+                self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+                user.refresh_from_db()
+                self.assertTrue(user.check_password('a-new-Passw0rd'))
+                self.assertFalse(user.must_change_password)
+                self.assertIsNone(user.temporary_password_expires)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': (10, 300), 'email': (3, 300)})
+    async def test_login_is_throttled(self):
+        for _ in range(3):
+            await self.async_client.post('/login/', {'email': 'unknown@example.com', 'password': 'wrong'})
+        response = await self.async_client.post('/login/', {'email': 'unknown@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(PASSWORD_HASHERS=['user_app.hashers.TunedPBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=2000)
+    async def test_login_upgrades_hash(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            await CustomUser.objects.acreate(email="learner@example.com", password=make_password("right"))
+        response = await self.async_client.post('/login/', {'email': 'learner@example.com', 'password': 'right'})
+        self.assertRedirects(response, '/home/', fetch_redirect_response=False)
+        self.assertTrue((await CustomUser.objects.aget()).password.startswith('pbkdf2_sha256$2000$'))
+
+    async def test_register_queues_temporary_password(self):
+        response = await self.async_client.post('/register/', registration_payload(1))
+        self.assertRedirects(response, '/login/', fetch_redirect_response=False)
+        user = await CustomUser.objects.select_related('profile').aget()
+        self.assertTrue(user.must_change_password)
+        self.assertEqual(user.profile.youth, 'yes')
+        email = await OutboundEmail.objects.aget()
+        self.assertEqual(email.to_email, 'learner1@example.com')
+
+    async def test_profiling_middleware_runs_async(self):
+        log = os.path.join(tempfile.mkdtemp(), 'profile.jsonl')
+        with self.settings(REQUEST_PROFILING=True, REQUEST_PROFILING_LOG=log):
+            response = await self.async_client.get('/login/')
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+
+@override_settings(SESSION_CACHED=True)
+class SessionStoreTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def saved_session(self, **data):
+        session = SessionStore()
+        session.update(data)
+        session.save()
+        return session.session_key
+
+    def test_unchanged_session_is_not_written(self):
+        key = self.saved_session(theme='dark')
+        session = SessionStore(key)
+        with self.assertNumQueries(0):
+            self.assertEqual(session['theme'], 'dark')
+            session['theme'] = 'dark'
+            session.save()
+        session['theme'] = 'light'
+        # The UPDATE, in a savepoint.
+        with self.assertNumQueries(3):
+            session.save()
+        cache.clear()
+        self.assertEqual(SessionStore(key)['theme'], 'light')
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_login_writes_the_session_once(self):
+        CustomUser.objects.create_user(email="learner@example.com", password="right")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/login/', {'email': 'learner@example.com', 'password': 'right', 'remember_me': 'on'})
+        writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE')) and 'django_session' in query['sql']]
+        self.assertEqual(len(writes), 1, writes)
+        cache.clear()
+        self.assertEqual(self.client.get('/change_password/').status_code, 200)
+
+    @override_settings(SESSION_CACHED=False)
+    def test_unshared_cache_is_not_used(self):
+        key = self.saved_session(theme='dark')
+        session = SessionStore(key)
+        with self.assertNumQueries(1):
+            self.assertEqual(session['theme'], 'dark')
+        with self.assertNumQueries(0):
+            session.save()
+        # A logout handled by another worker ends the session here too.
+        SessionStore(key).flush()
+        self.assertEqual(SessionStore(key).load(), {})
+        self.assertFalse(cache.has_key(session.cache_key))
+
+    @override_settings(SESSION_EXPIRY_REFRESH_INTERVAL=0)
+    def test_expiry_is_refreshed_after_the_interval(self):
+        session = SessionStore(self.saved_session(theme='dark'))
+        session.load()
+        with self.assertNumQueries(3):
+            session.save()
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        from django.contrib.sessions.models import Session
+
+        live = self.saved_session(theme='dark')
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{i}', session_data='', expire_date=timezone.now() - timezone.timedelta(days=i + 1))
+            for i in range(5)
+        )
+        stdout = io.StringIO()
+        with self.assertNumQueries(3 * 2 + 1):
+            call_command('purge_sessions', '--batch-size=2', stdout=stdout)
+        self.assertIn("Deleted 5 expired sessions", stdout.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [live])
+
+
+@override_settings(SQLITE_LOCK_RETRIES=2, SQLITE_LOCK_RETRY_DELAY=0)
+class SQLiteTuningTests(SimpleTestCase):
+
+    def setUp(self):
+        reset_lock_stats()
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        path = os.path.join(tempfile.mkdtemp(), 'tuned.sqlite3')
+        default = connections['default']
+        wrapper = default.__class__(dict(default.settings_dict, NAME=path), alias='tuned')
+        try:
+            with wrapper.cursor() as cursor:
+                values = {}
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size'):
+                    cursor.execute(f'PRAGMA {name}')
+                    values[name] = cursor.fetchone()[0]
+        finally:
+            wrapper.close()
+        self.assertEqual(values, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -65536})
+
+    def flaky(self, failures, message='database is locked'):
+        calls = []
+
+        @retry_on_lock
+        def write():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return 'written'
+        return write, calls
+
+    def test_lock_errors_are_retried(self):
+        write, calls = self.flaky(2)
+        self.assertEqual(write(), 'written')
+        self.assertEqual((len(calls), lock_stats()), (3, {'retries': 2, 'gave_up': 0}))
+
+        write, calls = self.flaky(3)
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(lock_stats()['gave_up'], 1)
+
+    def test_other_errors_are_not_retried(self):
+        write, calls = self.flaky(1, message='no such table: x')
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+class SQLiteLockRetryTransactionTests(TestCase):
+
+    @override_settings(SQLITE_LOCK_RETRY_DELAY=0)
+    def test_no_retry_inside_a_transaction(self):
+        calls = []
+
+        @retry_on_lock
+        def write():
+            calls.append(1)
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(SQLITE_LOCK_RETRY_DELAY=0)
+class RegistrationRetryTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_registration_is_inserted_again_after_a_lock(self):
+        from django.db.models.signals import post_save
+        from .models import LearnerProfile
+
+        attempts = []
+
+        def locked_once(sender, created, **kwargs):
+            attempts.append(created)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+
+        post_save.connect(locked_once, sender=LearnerProfile)
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/register/', registration_payload(1))
+        finally:
+            post_save.disconnect(locked_once, sender=LearnerProfile)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(attempts, [True, True])
+        # The retry inserts a new user rather than updating the one rolled back.
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "user_app_customuser"')
+        ])
+        user = CustomUser.objects.get(email=registration_payload(1)['email'])
+        self.assertTrue(LearnerProfile.objects.filter(pk=user.pk).exists())
+        self.assertEqual(list(LearnerChange.objects.order_by('pk').values_list('user_id', 'action')), [
+            (user.pk, 'inserted'), (user.pk, 'updated'),
+        ])
+        self.assertEqual(OutboundEmail.objects.filter(user=user).count(), 1)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_import_is_inserted_again_after_its_ids_were_taken(self):
+        import logging
+
+        locked = []
+
+        def lock_search_insert(execute, sql, params, many, context):
+            if not locked and sql.startswith('INSERT INTO "user_app_learnersearch"'):
+                locked.append(sql)
+                raise OperationalError('database is locked')
+            return execute(sql, params, many, context)
+
+        class ConcurrentWriter(logging.Handler):
+            # Another writer commits while the import waits to retry,
+            # taking the ids the rolled back attempt had assigned.
+            def emit(self, record):
+                CustomUser.objects.create_user(email="concurrent@example.com", password="foo")
+
+        logger = logging.getLogger('user_app.sqlite')
+        handler, level = ConcurrentWriter(logging.INFO), logger.level
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        try:
+            with connection.execute_wrapper(lock_search_insert):
+                stats = import_learners(
+                    [(2, registration_payload(1)), (3, registration_payload(2))], lambda *error: None, workers=1,
+                )
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(level)
+        self.assertTrue(locked)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(CustomUser.objects.count(), 3)
+        for user in CustomUser.objects.filter(email__startswith='learner').select_related('profile'):
+            self.assertEqual(user.profile.pk, user.pk)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ReadReplicaTests(TransactionTestCase):
+    """
+    The replica is a second SQLite file, brought up to date with the
+    primary by replicate().
+    """
+    serialized_rollback = True
+    alias = 'replica_test'
+
+    def setUp(self):
+        create_learners(2)
+        self.staff = CustomUser.objects.create_user(email="staff@example.com", password="foo", is_staff=True,
+                                                    is_superuser=True)
+        self.client.force_login(self.staff)
+        reset_replica_health()
+        self.addCleanup(reset_replica_health)
+
+    def add_replica(self, name):
+        connections.settings[self.alias] = dict(connections['default'].settings_dict, NAME=name)
+        replicas = override_settings(DATABASE_REPLICAS=[self.alias])
+        replicas.enable()
+
+        def remove():
+            replicas.disable()
+            connections[self.alias].close()
+            del connections[self.alias]
+            del connections.settings[self.alias]
+        self.addCleanup(remove)
+
+    def replicate(self):
+        target = sqlite3.connect(self.path)
+        try:
+            connections['default'].connection.backup(target)
+        finally:
+            target.close()
+
+    def setup_replica(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'replica.sqlite3')
+        self.replicate()
+        self.add_replica(self.path)
+
+    def searched(self, client, query='learner'):
+        response = client.get('/staff/learners/search/', {'q': query})
+        return [user.email for user in response.context['page']]
+
+    def test_designated_reads_use_the_replica(self):
+        self.setup_replica()
+        create_learners(1, start=5)
+
+        self.assertEqual(self.searched(self.client), ['learner0@example.com', 'learner1@example.com'])
+        response = self.client.get('/admin/user_app/customuser/', {'q': 'learner'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+        self.assertEqual(self.client.get('/staff/reports/learners/').json()['total'], 2)
+        export = b''.join(self.client.get('/export/learners/', {'fields': 'email'}).streaming_content)
+        self.assertNotIn(b'learner5@example.com', export)
+        # Everything else reads from the primary.
+        self.assertEqual(CustomUser.objects.filter(email__startswith='learner').count(), 3)
+
+        self.replicate()
+        self.assertIn('learner5@example.com', self.searched(self.client))
+        self.assertFalse(router.allow_migrate(self.alias, 'user_app'))
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1)
+    def test_estimated_count_reads_the_list_database(self):
+        from django.db.models import Max
+        from .admin import EstimatedCountPaginator
+
+        self.setup_replica()
+        create_learners(3, start=5)
+        replica = CustomUser.objects.using(self.alias)
+        last = replica.aggregate(last=Max('pk'))['last']
+        self.assertLess(last, CustomUser.objects.aggregate(last=Max('pk'))['last'])
+        self.assertEqual(EstimatedCountPaginator(replica.order_by('pk'), 2).count, last)
+
+    def test_writer_reads_its_own_writes(self):
+        self.setup_replica()
+        self.assertNotIn('replica_pin', self.client.get('/staff/learners/search/', {'q': 'x'}).cookies)
+
+        response = self.client.post('/change_password/', {
+            'old_password': 'foo', 'new_password1': 'a-new-Passw0rd', 'new_password2': 'a-new-Passw0rd',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies['replica_pin']['max-age'], 15)
+        create_learners(1, start=5)
+        self.assertIn('learner5@example.com', self.searched(self.client))
+
+        # Once the pin expires the client is back on the (stale) replica.
+        del self.client.cookies['replica_pin']
+        self.assertNotIn('learner5@example.com', self.searched(self.client))
+
+    def test_unavailable_replica_falls_back_to_the_primary(self):
+        self.add_replica(os.path.join(tempfile.gettempdir(), 'no-such-directory', 'replica.sqlite3'))
+        create_learners(1, start=5)
+
+        with self.assertLogs('user_app.routers', 'WARNING'):
+            self.assertIn('learner5@example.com', self.searched(self.client))
+        self.assertFalse(replica_healthy(self.alias))
+        # The failed probe is remembered; the next request doesn't repeat it.
+        with self.assertNoLogs('user_app.routers', 'WARNING'):
+            self.assertEqual(self.client.get('/staff/reports/learners/').json()['total'], 3)
+
+
+class ChangeJournalTests(TestCase):
+
+    def setUp(self):
+        create_learners(3)
+        self.output = os.path.join(tempfile.mkdtemp(), 'submission.csv')
+
+    def journal(self):
+        return list(LearnerChange.objects.order_by('pk').values_list('user_id', 'action'))
+
+    def export(self, *args, **options):
+        call_command('export_learners', '--since', 'funder', '--fields', 'email', '-o', self.output, *args,
+                     stderr=io.StringIO(), **options)
+        with open(self.output, newline='') as f:
+            return list(csv.reader(f))
+
+    def test_saves_and_bulk_writes_are_journalled(self):
+        from .derived import recompute_ages
+
+        LearnerChange.objects.all().delete()
+        user = CustomUser.objects.create_user(email="new@example.com", password="foo")
+        self.assertIsNotNone(user.created_at)
+        updated_at = user.updated_at
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        user.refresh_from_db()
+        self.assertEqual(user.updated_at, updated_at)
+        user.first_name = 'Zola'
+        user.save()
+        self.assertGreater(user.updated_at, updated_at)
+        learner = CustomUser.objects.get(email='learner0@example.com')
+        learner.profile.gender = 'male'
+        learner.profile.save(update_fields=['gender'])
+        learner_id = learner.pk
+        learner.delete()
+        self.assertEqual(self.journal(), [
+            (user.pk, 'inserted'), (user.pk, 'updated'), (learner_id, 'updated'),
+            (learner_id, 'updated'), (learner_id, 'deleted'),
+        ])
+
+        LearnerChange.objects.all().delete()
+        profile = CustomUser.objects.get(email='learner1@example.com').profile
+        profile.__class__.objects.filter(pk=profile.pk).update(age=1)
+        recompute_ages(profile.__class__, record=lambda ids: changes.record(ids, changes.UPDATED))
+        self.assertEqual(self.journal(), [(profile.pk, 'updated')])
+
+    def test_delta_exports_since_a_checkpoint(self):
+        first = self.export()
+        self.assertEqual(first[0], ['change', 'id', 'email'])
+        self.assertEqual([row[0] for row in first[1:]], ['inserted'] * 3)
+
+        learners = {user.email: user for user in CustomUser.objects.all()}
+        ids = {email: str(user.pk) for email, user in learners.items()}
+        learners['learner0@example.com'].first_name = 'Zola'
+        learners['learner0@example.com'].save()
+        learners['learner1@example.com'].delete()
+        create_learners(2, start=5)
+        CustomUser.objects.get(email='learner6@example.com').delete()
+        added = CustomUser.objects.get(email='learner5@example.com')
+
+        # However many learners there are: the checkpoint, the journal range,
+        # the changed learners and the checkpoint's progress.
+        with self.assertNumQueries(9):
+            second = self.export()
+        self.assertEqual(second[1:], [
+            ['updated', ids['learner0@example.com'], 'learner0@example.com'],
+            ['deleted', ids['learner1@example.com'], ''],
+            ['inserted', str(added.pk), 'learner5@example.com'],
+        ])
+        self.assertEqual(self.export(), [['change', 'id', 'email']])
+
+    def test_interrupted_export_resumes(self):
+        self.export()
+        for user in CustomUser.objects.order_by('pk'):
+            user.save()
+        checkpoint = changes.begin('funder')
+        chunks = changes.delta_chunks(checkpoint, ['id', 'email'], chunk_size=1)
+        last_user_id, rows = next(chunks)
+        with open(self.output, 'w', newline='') as f:
+            csv.writer(f).writerows([['change', 'id', 'email'], *rows])
+        changes.advance(checkpoint, last_user_id)
+        # Changed after the run began: left for the next run.
+        create_learners(1, start=5)
+
+        resumed = self.export()
+        self.assertEqual([row[2] for row in resumed[1:]], [f'learner{i}@example.com' for i in range(3)])
+        self.assertEqual([row[2] for row in self.export()[1:]], ['learner5@example.com'])
+
+    def test_interrupted_export_without_its_output_starts_over(self):
+        self.export()
+        for user in CustomUser.objects.order_by('pk'):
+            user.save()
+        checkpoint = changes.begin('funder')
+        last_user_id, _ = next(changes.delta_chunks(checkpoint, ['id', 'email'], chunk_size=2))
+        changes.advance(checkpoint, last_user_id)
+
+        # A new file: every learner of the run, not just the ones left.
+        os.remove(self.output)
+        rows = self.export()
+        self.assertEqual(rows[0], ['change', 'id', 'email'])
+        self.assertEqual([row[2] for row in rows[1:]], [f'learner{i}@example.com' for i in range(3)])
+        self.assertIsNone(ExportCheckpoint.objects.get(name='funder').resume_after)
+
+    def test_prune_keeps_what_a_checkpoint_still_needs(self):
+        self.assertEqual(changes.prune(), 0)
+        self.export()
+        create_learners(1, start=5)
+        changes.begin('other')
+        self.assertEqual(changes.prune(batch_size=2), 3)
+        self.assertEqual(self.journal(), [(CustomUser.objects.get(email='learner5@example.com').pk, 'inserted')])
+        self.assertEqual(ExportCheckpoint.objects.get(name='other').position, None)
@@ -0,0 +1,195 @@
+"""
+Login throttling.
+
+Failed logins are counted per client IP and per normalized email address in
+a sliding window (approximated from the current and previous fixed windows,
+which needs two cache keys instead of a list of timestamps). Once either
+count reaches its limit, EmailBackend rejects the attempt before looking the
+user up or hashing the password.
+
+The client IP is REMOTE_ADDR. Behind a reverse proxy that would put every
+client in the proxy's bucket, so connections from LOGIN_THROTTLE_TRUSTED_PROXIES
+are counted under the nearest X-Forwarded-For address that isn't one of
+them: the one the proxy itself appended, which the client can't forge.
+
+Counters live in the LOGIN_THROTTLE_CACHE_ALIAS cache. If that cache is
+unavailable the limiter falls back to an in-process store, so a cache outage
+weakens the throttle (per worker) rather than disabling it.
+"""
+import hashlib
+import ipaddress
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {'allowed': 0, 'blocked': 0, 'failures_recorded': 0, 'cache_errors': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def throttle_stats():
+    """
+    Allowed/blocked/failure counters for this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_throttle_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+class LocalStore:
+    """
+    The subset of the cache API the limiter needs, kept in process memory.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def _prune(self, now):
+        expired = [key for key, (_, expires) in self._data.items() if expires <= now]
+        for key in expired:
+            del self._data[key]
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            return {key: self._data[key][0] for key in keys if key in self._data and self._data[key][1] > now}
+
+    def incr_or_add(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) > 10000:
+                self._prune(now)
+            value, expires = self._data.get(key, (0, now + timeout))
+            if expires <= now:
+                value, expires = 0, now + timeout
+            self._data[key] = (value + 1, expires)
+
+
+_local_store = LocalStore()
+
+
+class SlidingWindowLimiter:
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, ident, now):
+        index = int(now // self.window)
+        current = f'throttle:{self.scope}:{ident}:{index}'
+        previous = f'throttle:{self.scope}:{ident}:{index - 1}'
+        return current, previous, (now % self.window) / self.window
+
+    def count(self, ident, now=None):
+        """
+        Estimated number of hits in the last ``window`` seconds.
+        """
+        current, previous, elapsed = self._keys(ident, now or time.time())
+        try:
+            values = caches[settings.LOGIN_THROTTLE_CACHE_ALIAS].get_many([current, previous])
+        except Exception as e:
+            _count('cache_errors')
+            logger.warning(f"Login throttle cache unavailable, using in-process counters. Error: {str(e)}")
+            values = _local_store.get_many([current, previous])
+        return values.get(current, 0) + values.get(previous, 0) * (1 - elapsed)
+
+    def hit(self, ident, now=None):
+        current, _, _ = self._keys(ident, now or time.time())
+        # Keep the key around for the next window too, when it becomes
+        # the "previous" count.
+        timeout = self.window * 2
+        try:
+            cache = caches[settings.LOGIN_THROTTLE_CACHE_ALIAS]
+            if not cache.add(current, 1, timeout):
+                cache.incr(current)
+        except Exception as e:
+            _count('cache_errors')
+            logger.warning(f"Login throttle cache unavailable, using in-process counters. Error: {str(e)}")
+            _local_store.incr_or_add(current, timeout)
+
+    def blocked(self, ident, now=None):
+        return self.count(ident, now) >= self.limit
+
+
+def _limiters():
+    return [
+        SlidingWindowLimiter(scope, limit, window)
+        for scope, (limit, window) in settings.LOGIN_THROTTLE_RATES.items()
+    ]
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def _trusted(address, proxies):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in proxy for proxy in proxies)
+
+
+def client_ip(request):
+    """
+    The address a login attempt is counted under; see the module docstring.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.LOGIN_THROTTLE_TRUSTED_PROXIES]
+    if not proxies or not _trusted(address, proxies):
+        return address
+    forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    for hop in reversed(forwarded):
+        if not _trusted(hop, proxies):
+            return hop
+    # Every hop is a proxy of ours: count the request under the first.
+    return forwarded[0] if forwarded else address
+
+
+def _identities(request, email):
+    ip = client_ip(request) if request is not None else ''
+    email = normalize_email(email)
+    return {
+        'ip': ip,
+        # Hashed so addresses don't end up in cache keys.
+        'email': hashlib.sha256(email.encode()).hexdigest() if email else '',
+    }
+
+
+def login_blocked(request, email):
+    """
+    Whether a login attempt for this client and email must be rejected.
+    Costs one cache round trip per scope and no database access.
+    """
+    identities = _identities(request, email)
+    for limiter in _limiters():
+        ident = identities[limiter.scope]
+        if ident and limiter.blocked(ident):
+            _count('blocked')
+            return True
+    _count('allowed')
+    return False
+
+
+def record_failed_login(request, email):
+    identities = _identities(request, email)
+    for limiter in _limiters():
+        ident = identities[limiter.scope]
+        if ident:
+            limiter.hit(ident)
+    _count('failures_recorded')
@@ -1,12 +1,38 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic import RedirectView
-from user_app.views import register, user_login, home, user_logout
+from user_app.views import register, user_login, home, user_logout, export_learners, validate_registration_api, reference_typeahead, learner_search, learner_report
+from user_app.views import ChangePasswordView, register_async, user_login_async, change_password_async
+
+
+def auth_urlpatterns(async_views):
+    """
+    The login, register and change_password routes: the native async views
+    when served over ASGI (settings.ASYNC_AUTH_VIEWS), the sync ones
+    otherwise.
+    """
+    if async_views:
+        return [
+            path('login/', user_login_async, name='login'),
+            path('register/', register_async, name='register'),
+            path('change_password/', change_password_async, name='change_password'),
+        ]
+    return [
+        path('login/', user_login, name='login'),
+        path('register/', register, name='register'),
+        path('change_password/', ChangePasswordView.as_view(), name='change_password'),
+    ]
+
 
 urlpatterns = [
     path('', RedirectView.as_view(url='login/')),
     path('home/', home, name='home'),
-    path('login/', user_login, name='login'),
-    path('register/', register, name='register'),
+    *auth_urlpatterns(settings.ASYNC_AUTH_VIEWS),
     path('logout/', user_logout, name='logout'),
+    path('export/learners/', export_learners, name='export_learners'),
+    path('staff/learners/search/', learner_search, name='learner_search'),
+    path('staff/reports/learners/', learner_report, name='learner_report'),
+    path('api/register/validate/', validate_registration_api, name='validate_registration'),
+    path('api/reference/<slug:kind>/', reference_typeahead, name='reference_typeahead'),
     # other URL patterns
 ]
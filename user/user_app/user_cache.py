@@ -0,0 +1,111 @@
+"""
+Versioned per-user cache behind EmailBackend.get_user.
+
+Every authenticated request resolves request.user from the session's user
+id. Instead of a primary-key query each time, the user is cached under
+``user:<pk>:<version>``. Invalidating a user just replaces its version, so
+a stale copy can never be read back even if deleting it raced with a reader.
+
+With the default local-memory cache every process has its own copy, so a
+change made in one worker is only seen by the others once USER_CACHE_TIMEOUT
+expires. Deployments with several workers should point USER_CACHE_ALIAS at a
+shared backend.
+
+Saves, deletes and group/permission changes invalidate through the signals in
+signals.py. Code that changes users with QuerySet.update() or bulk_update()
+must call invalidate_user() (or invalidate_users()) itself.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def _version_key(pk):
+    return f'user:{pk}:version'
+
+
+def _user_key(pk, version):
+    return f'user:{pk}:{version}'
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cache_stats():
+    """
+    Hit/miss/invalidation counters for this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def get_cached_user(pk):
+    """
+    Return the user with this primary key, from the cache when possible.
+    Raises DoesNotExist like objects.get().
+    """
+    cache = _cache()
+    version = cache.get(_version_key(pk))
+    if version is not None:
+        user = cache.get(_user_key(pk, version))
+        if user is not None:
+            _count('hits')
+            return user
+
+    _count('misses')
+    user = get_user_model().objects.get(pk=pk)
+    if version is None:
+        cache.add(_version_key(pk), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_version_key(pk))
+    if version is not None:
+        cache.set(_user_key(pk, version), user, timeout=settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def _bump_version(pk):
+    _cache().set(_version_key(pk), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_user(pk):
+    """
+    Drop the cached copy of a user. The version is bumped straight away and
+    again once the surrounding transaction commits, so a reader that cached
+    the pre-commit row in between is not served afterwards.
+    """
+    _count('invalidations')
+    _bump_version(pk)
+    transaction.on_commit(lambda: _bump_version(pk))
+
+
+def invalidate_users(pks):
+    """
+    invalidate_user() for many users, with one cache round trip each time.
+    """
+    pks = list(pks)
+    with _stats_lock:
+        _stats['invalidations'] += len(pks)
+
+    def bump():
+        _cache().set_many({_version_key(pk): uuid.uuid4().hex for pk in pks}, timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
@@ -0,0 +1,136 @@
+"""
+Compiled validation for large forms.
+
+Building a Django form deep-copies every field (widgets and choices lists
+included) and validation goes through a BoundField and widget per field.
+CompiledSchema runs the same checks from a table built once per form class:
+
+- each form field's to_python, its required check and its validators
+- choices checked against a precomputed set instead of the choices list
+- the validators of the model field the value is stored in (max_length and
+  so on), which ModelForm would otherwise run through Model.full_clean()
+- cross-field checks, which a form would run in clean()
+
+All validators of a field run, and every field is checked, so one pass
+reports every error. Nothing here builds widgets, so the same schema serves
+the HTML form and the JSON validation API.
+
+SharedFields removes the other per-instance cost, the deep copy of the
+form's fields.
+"""
+from django import forms
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+
+
+class SharedFields(dict):
+    """
+    ``base_fields`` for a form whose instances never modify their fields.
+    Form.__init__ deep-copies base_fields into ``self.fields``; this copy
+    shares the Field objects instead, which skips copying every widget and
+    choices list on every instantiation.
+    """
+    def __deepcopy__(self, memo):
+        return dict(self)
+
+
+class CompiledField:
+    __slots__ = ('name', 'field', 'required', 'choices', 'validators')
+
+    def __init__(self, name, field, model_field=None):
+        self.name = name
+        self.field = field
+        self.required = field.required
+        self.choices = None
+        if type(field) is forms.ChoiceField:
+            # Static choices only; subclasses (reference data, typed
+            # choices) validate themselves.
+            self.choices = frozenset(str(key) for key, _ in field.choices)
+        validators = list(field.validators)
+        if model_field is not None:
+            validators += [v for v in model_field.validators if v not in validators]
+        self.validators = tuple(validators)
+
+    def clean(self, value):
+        """
+        Return the cleaned value, or raise a ValidationError carrying every
+        error for this field.
+        """
+        field = self.field
+        value = field.to_python(value)
+        if value in field.empty_values:
+            if self.required:
+                raise ValidationError(field.error_messages['required'], code='required')
+            return value
+        if self.choices is not None:
+            if value not in self.choices:
+                raise ValidationError(
+                    field.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+                )
+        else:
+            field.validate(value)
+
+        errors = []
+        for validator in self.validators:
+            try:
+                validator(value)
+            except ValidationError as e:
+                if hasattr(e, 'code') and e.code in field.error_messages:
+                    e.message = field.error_messages[e.code]
+                errors.extend(e.error_list)
+        if errors:
+            raise ValidationError(errors)
+        return value
+
+
+class CompiledSchema:
+
+    def __init__(self, form_class, models=(), checks=()):
+        """
+        Compile ``form_class.base_fields``. Each field is also checked with
+        the validators of the first model in ``models`` that has a field of
+        the same name. ``checks`` are cross-field checks, called with the
+        cleaned data once the fields are clean; each returns a
+        ``{field: message}`` dict of errors.
+        """
+        self.fields = tuple(
+            CompiledField(name, field, self._model_field(models, name))
+            for name, field in form_class.base_fields.items()
+        )
+        self.checks = tuple(checks)
+
+    @staticmethod
+    def _model_field(models, name):
+        for model in models:
+            try:
+                return model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+        return None
+
+    def clean(self, data):
+        """
+        Validate a mapping of raw values (a QueryDict or decoded JSON) and
+        return ``(cleaned_data, errors)``, where ``errors`` maps field names
+        to lists of ValidationError.
+        """
+        cleaned, errors = {}, {}
+        for compiled in self.fields:
+            try:
+                cleaned[compiled.name] = compiled.clean(data.get(compiled.name))
+            except ValidationError as e:
+                errors[compiled.name] = e.error_list
+        for check in self.checks:
+            for name, message in check(cleaned).items():
+                errors.setdefault(name, []).append(ValidationError(message, code='invalid'))
+                cleaned.pop(name, None)
+        return cleaned, errors
+
+
+def errors_as_json(errors):
+    """
+    ``{field: [{'message': ..., 'code': ...}]}`` for CompiledSchema.clean() errors.
+    """
+    return {
+        name: [{'message': message, 'code': error.code or ''} for error in error_list for message in error]
+        for name, error_list in errors.items()
+    }
@@ -1,48 +1,150 @@
-from django.contrib.auth import authenticate, login, update_session_auth_hash, get_user_model
-from django.contrib.auth.forms import PasswordChangeForm
-from django.contrib.auth.views import PasswordChangeView
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.contrib.auth import alogin, aupdate_session_auth_hash, authenticate, login, update_session_auth_hash, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.views import PasswordChangeView, redirect_to_login
 from django.contrib import messages
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from .forms import CustomUserCreationForm
+from . import reference, reporting
+from .authentication import aauthenticate
+from .forms import ChangePasswordForm, CustomUserCreationForm, validate_registration
+from .hashers import amake_password, run_hasher
+from .validation import errors_as_json
+from .mail import queue_mail
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import never_cache
+from django.views.decorators.debug import sensitive_post_parameters
+from django.views.decorators.http import condition, require_GET, require_POST
+from .exports import export_response, parse_fields
+from .routers import read_alias, use_replica
+from .search import SearchResults
+from .sqlite import retry_on_lock
+from django.core.paginator import Paginator
+from .models import CustomUser, Municipality, Province
+import csv
+import json
 import logging
 
 # Now you can use the logger
 logger = logging.getLogger(__name__)
 
+def _temporary_password(user):
+    """
+    Mark a new user as needing to change the temporary password it will be
+    sent, and return that password unhashed.
+    """
+    temporary_password = get_user_model().objects.make_random_password()
+    user.must_change_password = True
+    user.temporary_password_expires = timezone.now() + timezone.timedelta(hours=1)
+    return temporary_password
+
+@retry_on_lock
+def _save_registration(user, temporary_password):
+    # Queue the email with the temporary password in the same transaction
+    # as the user row; send_queued_mail delivers it
+    subject = "Your Temporary Password"
+    html_message = render_to_string('temp_password.html', {'user': user, 'temporary_password': temporary_password})
+    plain_message = strip_tags(html_message) 
+    
+    with transaction.atomic():
+        # A retry inserts the rows again: the rolled back attempt left its
+        # ids on the instances.
+        user.pk = None
+        user._state.adding = True
+        user.save()
+        profile = user.profile
+        profile.user = user
+        profile._state.adding = True
+        profile.save()
+        queue_mail(subject, plain_message, user.email, html_message=html_message, from_email='systemsprogramming@gmail.com', user=user)
+    logger.info(f"Email queued for {user.email}")
+
+def _render_register(request, form):
+    return render(request, 'register.html', {
+        'form': form,
+        'fragment_timeout': settings.REGISTER_FORM_CACHE_TIMEOUT,
+        'reference_version': reference.version(),
+    })
+
 def register(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             user = form.save(commit=False)
-            temporary_password = get_user_model().objects.make_random_password()
+            temporary_password = _temporary_password(user)
             user.set_password(temporary_password)
-            user.must_change_password = True
-            user.temporary_password_expires = timezone.now() + timezone.timedelta(hours=1)
-            user.save()
-            
-            # Send email with temporary password
-            subject = "Your Temporary Password"
-            html_message = render_to_string('temp_password.html', {'user': user, 'temporary_password': temporary_password})
-            plain_message = strip_tags(html_message) 
-            
-            try:
-                send_mail(subject, plain_message, 'systemsprogramming@gmail.com', [user.email], html_message=html_message)
-                logger.info(f"Email sent successfully to {user.email}")
-            except Exception as e:
-                logger.error(f"Failed to send email to {user.email}. Error: {str(e)}")
+            _save_registration(user, temporary_password)
             
             messages.success(request, 'You have successfully registered. Please check your email for the temporary password.')
             
             return redirect('login')
     else:
         form = CustomUserCreationForm()
-    return render(request, 'register.html', {'form': form})
+    return _render_register(request, form)
+
+@require_POST
+def validate_registration_api(request):
+    """
+    Validate a JSON registration payload with the same rules as the
+    registration form, without rendering anything or creating a user.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+    cleaned_data, errors = validate_registration(payload)
+    return JsonResponse({'valid': not errors, 'errors': errors_as_json(errors)})
+
+def _typeahead_etag(request, kind):
+    model = reference.TYPEAHEAD_MODELS.get(kind)
+    if model is None:
+        return None
+    return reference.version([model, Province] if model is Municipality else [model])
+
+@require_GET
+@condition(etag_func=_typeahead_etag)
+def reference_typeahead(request, kind):
+    """
+    Paginated rows of a reference table whose name or code has a word
+    starting with ``q``, from the in-memory prefix index. Municipalities can
+    be narrowed to a ``province`` code.
+    """
+    model = reference.TYPEAHEAD_MODELS.get(kind)
+    if model is None:
+        raise Http404(f"No typeahead for {kind}")
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = int(request.GET.get('page_size', settings.REFERENCE_TYPEAHEAD_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': 'page and page_size must be integers.'}, status=400)
+    page_size = min(max(page_size, 1), settings.REFERENCE_TYPEAHEAD_MAX_PAGE_SIZE)
+
+    rows = reference.search(model, request.GET.get('q', ''))
+    province = reference.get_by_code(Province, request.GET.get('province', ''))
+    if model is Municipality and province is not None:
+        rows = [row for row in rows if row.province_id == province.pk]
+    start = (page - 1) * page_size
+    response = JsonResponse({
+        'results': [{'code': row.code, 'name': row.name} for row in rows[start:start + page_size]],
+        'page': page,
+        'count': len(rows),
+        'has_next': start + page_size < len(rows),
+    })
+    patch_cache_control(response, public=True, max_age=settings.REFERENCE_TYPEAHEAD_MAX_AGE)
+    return response
+
+def _temporary_password_expired(user):
+    return user.must_change_password and user.temporary_password_expires is not None and user.temporary_password_expires < timezone.now()
 
 def user_login(request):
     if request.method == 'POST':
@@ -60,35 +162,99 @@ def user_login(request):
                 request.session.set_expiry(0)
             
             # Check if the user needs to change their password and if the temporary password has expired
-            if user.must_change_password and user.temporary_password_expires is not None and user.temporary_password_expires < timezone.now():
+            if _temporary_password_expired(user):
                 messages.warning(request, 'Your temporary password has expired. Please change it.')
                 return redirect('change_password')
             else:
                 return redirect('home')
             
+        elif getattr(request, 'login_throttled', False):
+            return render(request, 'login.html', {'error': 'Too many failed login attempts. Please try again later.'}, status=429)
         else:
             return render(request, 'login.html', {'error': 'Invalid login credentials. Please try again.'})
     
     return render(request, 'login.html')
 
-def change_password(request):
+@retry_on_lock
+def _save_new_password(user, encoded):
+    """
+    Store a changed password for either change_password view. The temporary
+    password, if any, is gone: keep expire_temp_passwords away from the new
+    one.
+    """
+    user.password = encoded
+    user.must_change_password = False
+    user.temporary_password_expires = None
+    user.save(update_fields=['password', 'must_change_password', 'temporary_password_expires', 'updated_at'])
+
+async def _arender(request, template_name, context=None, status=None):
+    # The auth and messages context processors read request.user and the
+    # session, and the register form reads reference tables: render where
+    # the ORM is allowed.
+    return await sync_to_async(render)(request, template_name, context, status=status)
+
+async def register_async(request):
+    """
+    register() for the ASGI server. The temporary password is hashed on
+    the hash executor; the form's lookups and the transaction that saves
+    the user and queues its email run in one thread hop each.
+    """
     if request.method == 'POST':
-        form = PasswordChangeForm(request.user, request.POST)
-        if form.is_valid():
-            # Check if old password is different from new password
-            if form.cleaned_data['old_password'] == form.cleaned_data['new_password']:
-                return render(request, 'change_password.html', {'form': form, 'error': 'Old password cannot be the same as the new password.'})
-
-            user = form.save()
-            # Update must_change_password attribute only if it's True
-            if request.user.must_change_password:
-                request.user.must_change_password = False
-                request.user.save()
-            update_session_auth_hash(request, user)
+        form = CustomUserCreationForm(request.POST)
+        if await sync_to_async(form.is_valid)():
+            user = form.save(commit=False)
+            temporary_password = _temporary_password(user)
+            user.password = await amake_password(temporary_password)
+            await sync_to_async(_save_registration)(user, temporary_password)
+            messages.success(request, 'You have successfully registered. Please check your email for the temporary password.')
+            return redirect('login')
+    else:
+        form = CustomUserCreationForm()
+    return await sync_to_async(_render_register)(request, form)
+
+async def user_login_async(request):
+    """
+    user_login() for the ASGI server; see aauthenticate().
+    """
+    if request.method == 'POST':
+        user = await aauthenticate(request, request.POST.get('email'), request.POST.get('password'))
+        if user is not None:
+            await alogin(request, user)
+            if request.POST.get('remember_me'):
+                request.session.modified = True
+            else:
+                request.session.set_expiry(0)
+            if _temporary_password_expired(user):
+                messages.warning(request, 'Your temporary password has expired. Please change it.')
+                return redirect('change_password')
+            return redirect('home')
+        elif getattr(request, 'login_throttled', False):
+            return await _arender(request, 'login.html', {'error': 'Too many failed login attempts. Please try again later.'}, status=429)
+        return await _arender(request, 'login.html', {'error': 'Invalid login credentials. Please try again.'})
+    return await _arender(request, 'login.html')
+
+@sensitive_post_parameters()
+@never_cache
+async def change_password_async(request):
+    """
+    ChangePasswordView for the ASGI server. Checking the old password and
+    hashing the new one happen on the hash executor.
+    """
+    # update_session_auth_hash() compares against request.user; resolved
+    # lazily after the password changes it would no longer match.
+    request.user = user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if request.method == 'POST':
+        form = ChangePasswordForm(user, request.POST)
+        if await run_hasher(form.is_valid):
+            encoded = await amake_password(form.cleaned_data['new_password1'])
+            await sync_to_async(_save_new_password)(user, encoded)
+            await aupdate_session_auth_hash(request, user)
             return redirect('home')
     else:
-        form = PasswordChangeForm(request.user)
-    return render(request, 'change_password.html', {'form': form})
+        form = ChangePasswordForm(user)
+    return await _arender(request, 'change_password.html', {'form': form})
 
 def home(request):
     return render(request, 'home.html')
@@ -97,6 +263,66 @@ def home(request):
 def user_logout(request):
     return render(request, 'logout.html')
 
+@staff_member_required
+def export_learners(request):
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in ('csv', 'xlsx'):
+        return HttpResponseBadRequest('format must be csv or xlsx')
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    # Streamed after the view returns, so the database is chosen here.
+    return export_response(CustomUser.objects.using(read_alias()), fields, file_format)
+
 class ChangePasswordView(PasswordChangeView):
+    form_class = ChangePasswordForm
     template_name = 'change_password.html'
     success_url = reverse_lazy('home')
+
+    def form_valid(self, form):
+        # Hash once; only the save is retried if the database is locked.
+        _save_new_password(form.user, make_password(form.cleaned_data['new_password1']))
+        update_session_auth_hash(self.request, form.user)
+        return HttpResponseRedirect(self.get_success_url())
+
+@staff_member_required
+@use_replica
+def learner_search(request):
+    """
+    Learners matching ``q`` by name, email or identifier, best match first.
+    """
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), settings.LEARNER_SEARCH_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'learner_search.html', {'query': query, 'page': page})
+
+
+@staff_member_required
+@require_GET
+@use_replica
+def learner_report(request):
+    """
+    Learner counts for funders from the report summary: grouped by the
+    comma-separated dimensions in ``by``, spread across the values of
+    ``columns`` if given, and filtered by any dimension passed as a
+    parameter. ``format`` is json (the default) or csv.
+    """
+    file_format = request.GET.get('format', 'json')
+    if file_format not in ('json', 'csv'):
+        return JsonResponse({'error': 'format must be json or csv.'}, status=400)
+    by = [name.strip() for name in request.GET.get('by', 'province').split(',') if name.strip()]
+    filters = {name: request.GET[name] for name in reporting.DIMENSIONS if name in request.GET}
+    try:
+        header, rows = reporting.pivot(by, request.GET.get('columns') or None, filters)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if file_format == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="learner_report.csv"'
+        writer = csv.writer(response)
+        writer.writerow(header)
+        writer.writerows(rows)
+        return response
+    return JsonResponse({'header': header, 'rows': rows, 'total': sum(row[-1] for row in rows)})
@@ -0,0 +1,88 @@
+from django import forms
+from django.forms.utils import flatatt
+from django.utils.choices import CallableChoiceIterator
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+
+class PrecomputedSelect(forms.Select):
+    """
+    A Select that builds the markup of its <option>s once, from its choices,
+    and reuses it for every render; only the selected option changes. The
+    stock Select renders a template per option, which is most of the cost of
+    the long choice lists on the registration form.
+
+    Flat choices only: no optgroups and no multiple selection.
+    """
+    def options_markup(self):
+        """
+        ``(value, html, selected_html)`` per choice, rebuilt if the choices
+        are replaced.
+        """
+        choices = self.choices
+        if isinstance(choices, CallableChoiceIterator):
+            # Choices from a callable (reference tables) are rebuilt only
+            # when the callable returns a different list.
+            choices = choices.func()
+        cached = self.__dict__.get('_options_markup')
+        if cached is None or cached[0] is not choices:
+            markup = [
+                (
+                    str(value),
+                    format_html('<option value="{}">{}</option>', value, label),
+                    format_html('<option value="{}" selected>{}</option>', value, label),
+                )
+                for value, label in choices
+            ]
+            cached = self._options_markup = (choices, markup)
+        return cached[1]
+
+    def render(self, name, value, attrs=None, renderer=None):
+        selected = self.format_value(value)
+        options = []
+        for option_value, html, selected_html in self.options_markup():
+            if option_value in selected:
+                options.append(selected_html)
+                selected = ()
+            else:
+                options.append(html)
+        final_attrs = self.build_attrs(self.attrs, attrs)
+        return mark_safe(
+            format_html('<select name="{}"{}>\n', name, flatatt(final_attrs))
+            + '\n'.join(options)
+            + '\n</select>'
+        )
+
+
+class TypeaheadInput(forms.TextInput):
+    """
+    A text input for a reference-table code, with suggestions fetched from
+    the typeahead API as the user types (static/js/typeahead.js) instead of
+    every row rendered as an <option>. ``depends_on`` names another field
+    whose value narrows the suggestions (municipalities by province).
+
+    Without JavaScript the user types the name; ReferenceChoiceField accepts
+    it as well as the code.
+    """
+    def __init__(self, url, depends_on=None, attrs=None):
+        attrs = {'autocomplete': 'off', **(attrs or {})}
+        super().__init__(attrs)
+        self.url = url
+        self.depends_on = depends_on
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        widget_attrs = context['widget']['attrs']
+        widget_attrs['data-typeahead'] = self.url
+        if self.depends_on:
+            widget_attrs['data-typeahead-filter'] = self.depends_on
+        if widget_attrs.get('id'):
+            widget_attrs['list'] = widget_attrs['id'] + '_options'
+        return context
+
+    def render(self, name, value, attrs=None, renderer=None):
+        html = super().render(name, value, attrs, renderer)
+        final_attrs = self.build_attrs(self.attrs, attrs)
+        if not final_attrs.get('id'):
+            return html
+        return html + format_html('<datalist id="{}_options"></datalist>', final_attrs['id'])